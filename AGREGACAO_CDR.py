@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+# ==============================
+# CUBO DE AGREGAÇÃO (data × hora × grupo × disposition)
+# ==============================
+# O cubo guarda só estatísticas aditivas (contagens, somas e somas dos quadrados),
+# então qualquer recorte (por hora, por grupo, total...) sai somando linhas do
+# cubo, sem voltar ao cdr, e cubos de arquivos/dias diferentes podem ser somados
+# (somar_cubos). Médias, desvios e taxas são calculados depois da consolidação.
+# A data fica na chave para o baseline histórico (BASELINE_CDR) observar cada dia
+# separadamente mesmo quando a execução cobre vários dias.
+CHAVES_CUBO = ["data", "hora", "ResourceGroupDesc", "Disposition_Desc"]
+
+# flag do cdr -> coluna de soma no cubo
+# (o SLA sai do histograma de ring time do SLA_CDR, para qualquer limite)
+FLAGS_CUBO = {
+    "atendida": "atendidas",
+}
+
+# prefixo no cubo -> métrica de tempo do cdr (soma e quantidade de não nulos)
+TEMPOS_CUBO = {
+    "ring": "ring_time_sec",
+    "talk": "talk_time_sec",
+    "wrap": "wrap_time_sec",
+    "duracao": "call_duration_sec",
+}
+
+def montar_cubo(cdr: pd.DataFrame) -> pd.DataFrame:
+    """Uma passada sobre o cdr: contagens e somas por data × hora × grupo × disposition"""
+    agrupador = cdr.groupby(CHAVES_CUBO, observed=True, dropna=False, sort=True)
+    codigos = agrupador.ngroup().to_numpy()
+    cubo = agrupador.size().rename("total_chamadas").to_frame()
+    n_grupos = len(cubo)
+
+    # bincount acumula em float64 mesmo com colunas int8/float32
+    for flag, coluna in FLAGS_CUBO.items():
+        cubo[coluna] = np.bincount(codigos, weights=cdr[flag].to_numpy(), minlength=n_grupos).astype("int64")
+
+    for prefixo, metrica in TEMPOS_CUBO.items():
+        valores = cdr[metrica].to_numpy(dtype="float64", na_value=np.nan)
+        validos = ~np.isnan(valores)
+        valores = np.where(validos, valores, 0.0)
+        cubo[f"{prefixo}_soma"] = np.bincount(codigos, weights=valores, minlength=n_grupos)
+        cubo[f"{prefixo}_soma_quad"] = np.bincount(codigos, weights=valores * valores, minlength=n_grupos)
+        cubo[f"{prefixo}_qtd"] = np.bincount(codigos, weights=validos, minlength=n_grupos).astype("int64")
+
+    return cubo.reset_index()
+
+def somar_cubos(cubos) -> pd.DataFrame:
+    """Junta cubos parciais (ex.: um por arquivo) em um só"""
+    cubos = [c for c in cubos if c is not None]
+    if len(cubos) == 1:
+        return cubos[0]
+    return (
+        pd.concat(cubos, ignore_index=True)
+          .groupby(CHAVES_CUBO, observed=True, dropna=False, sort=True)
+          .sum()
+          .reset_index()
+    )
+
+def consolidar_cubo(cubo: pd.DataFrame, chaves, dropna=False) -> pd.DataFrame:
+    """Soma o cubo nas chaves pedidas e calcula média e desvio padrão dos tempos
+    (<prefixo>_medio e <prefixo>_desvio)"""
+    colunas_soma = [c for c in cubo.columns if c not in CHAVES_CUBO]
+    if chaves:
+        resultado = (
+            cubo.groupby(chaves, observed=True, dropna=dropna)[colunas_soma]
+                .sum()
+                .reset_index()
+        )
+    else:
+        resultado = cubo[colunas_soma].sum().to_frame().T
+
+    for prefixo in TEMPOS_CUBO:
+        qtd = resultado[f"{prefixo}_qtd"]
+        divisor = qtd.where(qtd > 0, 1)
+        media = np.where(qtd > 0, resultado[f"{prefixo}_soma"] / divisor, np.nan)
+        variancia = resultado[f"{prefixo}_soma_quad"] / divisor - media ** 2
+        resultado[f"{prefixo}_medio"] = media
+        # clip: arredondamento pode deixar a variância levemente negativa
+        resultado[f"{prefixo}_desvio"] = np.sqrt(np.clip(variancia, 0, None))
+
+    return resultado
@@ -0,0 +1,212 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from AGREGACAO_CDR import consolidar_cubo
+
+# ==============================
+# BASELINE HISTÓRICO (dia da semana × hora × grupo)
+# ==============================
+# Para cada chave guarda só (observações, média, M2) de cada métrica diária,
+# atualizados ao fim de cada execução com a fórmula de Welford/Chan para juntar
+# estatísticas. Cada dia novo entra a partir do cubo da execução, sem reler
+# arquivos antigos. As anomalias do dia são pontuadas contra o baseline
+# anterior à atualização, então um dia ruim não desloca a própria referência.
+#
+# Níveis guardados no mesmo arquivo (sentinelas nas chaves):
+#   hora × grupo | hora (grupo = TODOS_GRUPOS) | grupo (hora = HORA_DIA) | dia
+TODOS_GRUPOS = "(TODOS)"
+HORA_DIA = -1
+CHAVES_BASELINE = ["dia_semana", "hora", "ResourceGroupDesc"]
+
+# prefixo no baseline -> métrica observada por dia
+METRICAS_BASELINE = {
+    "volume": "total_chamadas",
+    "taxa": "taxa_atendimento",
+}
+
+# Piso do desvio: evita z infinito quando o histórico ainda é constante
+DESVIO_MINIMO = {
+    "volume": 1.0,
+    "taxa": 0.01,
+}
+
+# Janela móvel aproximada: acima disso o histórico antigo perde peso na mesma
+# proporção (8 observações = 8 semanas para cada dia da semana)
+JANELA_MAX_OBSERVACOES = 8
+
+# Observações mínimas da chave para pontuar anomalias contra o histórico
+MIN_OBSERVACOES_BASELINE = 4
+
+# Os níveis "grupo" e "dia" somam o dia inteiro: data a que faltam horas que o
+# histórico do mesmo dia da semana tem (dia corrente, arquivos horários ainda não
+# chegaram) não é comparada com dias completos nesses níveis
+NIVEIS_DIA_INTEIRO = ["grupo", "dia"]
+
+VERSAO_BASELINE = 1
+
+NIVEIS = {
+    "hora×grupo": ["data", "hora", "ResourceGroupDesc"],
+    "hora": ["data", "hora"],
+    "grupo": ["data", "ResourceGroupDesc"],
+    "dia": ["data"],
+}
+
+def observacoes_diarias(cubo: pd.DataFrame) -> pd.DataFrame:
+    """Volume e taxa de atendimento de cada data nos quatro níveis do baseline"""
+    partes = []
+    for nivel, chaves in NIVEIS.items():
+        obs = consolidar_cubo(cubo, chaves)[chaves + ["total_chamadas", "atendidas"]]
+        if "hora" not in chaves:
+            obs["hora"] = HORA_DIA
+        if "ResourceGroupDesc" not in chaves:
+            obs["ResourceGroupDesc"] = TODOS_GRUPOS
+        obs["nivel"] = nivel
+        partes.append(obs)
+
+    obs = pd.concat(partes, ignore_index=True)
+    # Linhas sem CallStartDt válido não têm data/hora e ficam fora do baseline
+    obs = obs.dropna(subset=["data", "hora"])
+    obs["hora"] = obs["hora"].astype("int64")
+    obs["ResourceGroupDesc"] = obs["ResourceGroupDesc"].astype(str)
+    obs["data"] = obs["data"].astype("datetime64[ms]")
+    obs["dia_semana"] = obs["data"].dt.dayofweek  # 0 = segunda
+    obs["taxa_atendimento"] = obs["atendidas"] / obs["total_chamadas"]
+    return obs[["data", "nivel"] + CHAVES_BASELINE + ["total_chamadas", "atendidas", "taxa_atendimento"]]
+
+def _caminhos(pasta: Path):
+    return pasta / "baseline.parquet", pasta / "dias_incorporados.json"
+
+def carregar_baseline(pasta: Path):
+    """(baseline, dias já incorporados); baseline vazio se não existir ou for de outra versão"""
+    caminho_baseline, caminho_dias = _caminhos(pasta)
+    try:
+        controle = json.loads(caminho_dias.read_text(encoding="utf-8"))
+        if controle.get("versao") == VERSAO_BASELINE and caminho_baseline.exists():
+            return pd.read_parquet(caminho_baseline), set(controle["dias"])
+    except (FileNotFoundError, ValueError):
+        pass
+    tipos = {"dia_semana": "int32", "hora": "int64", "ResourceGroupDesc": "object", "observacoes": "int64"}
+    for prefixo in METRICAS_BASELINE:
+        tipos.update({f"{prefixo}_media": "float64", f"{prefixo}_m2": "float64"})
+    return pd.DataFrame({col: pd.Series(dtype=tipo) for col, tipo in tipos.items()}), set()
+
+def _estatisticas_lote(obs: pd.DataFrame) -> pd.DataFrame:
+    """(observações, média, M2) por chave das observações novas"""
+    agrupado = obs.groupby(CHAVES_BASELINE)
+    lote = agrupado.size().rename("observacoes").to_frame()
+    for prefixo, metrica in METRICAS_BASELINE.items():
+        lote[f"{prefixo}_media"] = agrupado[metrica].mean()
+        lote[f"{prefixo}_m2"] = agrupado[metrica].var(ddof=0) * lote["observacoes"]
+    return lote.reset_index()
+
+def juntar_estatisticas(baseline: pd.DataFrame, lote: pd.DataFrame, janela=JANELA_MAX_OBSERVACOES) -> pd.DataFrame:
+    """Soma (observações, média, M2) de baseline e lote chave a chave (Welford/Chan)"""
+    juntos = baseline.merge(lote, on=CHAVES_BASELINE, how="outer", suffixes=("_a", "_b"))
+    n_a = juntos["observacoes_a"].fillna(0).astype("float64")
+    n_b = juntos["observacoes_b"].fillna(0).astype("float64")
+
+    # histórico além da janela é reescalado: mantém média/variância, reduz o peso
+    if janela:
+        n_a_janela = np.minimum(n_a, np.maximum(janela - n_b, 0))
+        escala = np.where(n_a > 0, n_a_janela / n_a.where(n_a > 0, 1), 0.0)
+        n_a = n_a_janela
+    else:
+        escala = 1.0
+
+    n = n_a + n_b
+    resultado = juntos[CHAVES_BASELINE].copy()
+    resultado["observacoes"] = n.astype("int64")
+    for prefixo in METRICAS_BASELINE:
+        media_a = juntos[f"{prefixo}_media_a"].astype("float64").fillna(0.0)
+        media_b = juntos[f"{prefixo}_media_b"].astype("float64").fillna(0.0)
+        m2_a = juntos[f"{prefixo}_m2_a"].astype("float64").fillna(0.0) * escala
+        m2_b = juntos[f"{prefixo}_m2_b"].astype("float64").fillna(0.0)
+        delta = media_b - media_a
+        resultado[f"{prefixo}_media"] = np.where(n_b > 0, media_a + delta * n_b / n.where(n > 0, 1), media_a)
+        resultado[f"{prefixo}_m2"] = m2_a + m2_b + delta ** 2 * n_a * n_b / n.where(n > 0, 1)
+    return resultado
+
+def datas_incompletas(obs: pd.DataFrame, baseline: pd.DataFrame) -> set:
+    """Datas sem alguma hora que o baseline do mesmo dia da semana tem (com histórico suficiente)"""
+    esperadas = baseline.loc[
+        (baseline["ResourceGroupDesc"] == TODOS_GRUPOS)
+        & (baseline["hora"] != HORA_DIA)
+        & (baseline["observacoes"] >= MIN_OBSERVACOES_BASELINE),
+        ["dia_semana", "hora"],
+    ].astype("int64")
+    datas = obs[["data", "dia_semana"]].drop_duplicates().astype({"dia_semana": "int64"})
+    presentes = obs.loc[obs["nivel"] == "hora", ["data", "hora"]]
+    faltando = (
+        datas.merge(esperadas, on="dia_semana")
+             .merge(presentes, on=["data", "hora"], how="left", indicator=True)
+    )
+    return set(faltando.loc[faltando["_merge"] == "left_only", "data"])
+
+def pontuar_observacoes(obs: pd.DataFrame, baseline: pd.DataFrame, volume_k: float, taxa_z: float) -> pd.DataFrame:
+    """z-score de cada observação do dia contra o baseline da sua chave (níveis do dia inteiro
+    só para datas completas)"""
+    resultado = obs.merge(baseline, on=CHAVES_BASELINE, how="left")
+    resultado["observacoes"] = resultado["observacoes"].fillna(0).astype("int64")
+    n = resultado["observacoes"]
+    incompleta = resultado["nivel"].isin(NIVEIS_DIA_INTEIRO) & resultado["data"].isin(datas_incompletas(obs, baseline))
+    suficiente = (n >= MIN_OBSERVACOES_BASELINE) & ~incompleta
+
+    for prefixo, metrica in METRICAS_BASELINE.items():
+        media = resultado[f"{prefixo}_media"].astype("float64")
+        # desvio amostral (n - 1) a partir do M2
+        desvio = np.sqrt(resultado[f"{prefixo}_m2"].astype("float64") / (n - 1).where(n > 1))
+        desvio = np.maximum(desvio, DESVIO_MINIMO[prefixo])
+        resultado[f"{prefixo}_media_hist"] = media
+        resultado[f"{prefixo}_desvio_hist"] = desvio
+        resultado[f"z_{prefixo}_hist"] = ((resultado[metrica] - media) / desvio).where(suficiente)
+
+    resultado["anomalia_volume_hist"] = resultado["z_volume_hist"].abs() >= volume_k
+    resultado["anomalia_taxa_hist"] = resultado["z_taxa_hist"] <= taxa_z
+    resultado["flag_anomalia_hist"] = resultado["anomalia_volume_hist"] | resultado["anomalia_taxa_hist"]
+
+    resultado["motivo_anomalia"] = np.select(
+        [incompleta, ~suficiente], ["DIA_INCOMPLETO; ", "HISTORICO_INSUFICIENTE; "], ""
+    )
+    resultado.loc[resultado["anomalia_volume_hist"], "motivo_anomalia"] += "VOLUME_FORA_DO_HISTORICO; "
+    resultado.loc[resultado["anomalia_taxa_hist"], "motivo_anomalia"] += "TAXA_ABAIXO_DO_HISTORICO; "
+    resultado["motivo_anomalia"] = resultado["motivo_anomalia"].str.strip()
+
+    colunas = ["data", "nivel"] + CHAVES_BASELINE + ["total_chamadas", "taxa_atendimento", "observacoes"]
+    for prefixo in METRICAS_BASELINE:
+        colunas += [f"{prefixo}_media_hist", f"{prefixo}_desvio_hist", f"z_{prefixo}_hist"]
+    colunas += ["anomalia_volume_hist", "anomalia_taxa_hist", "flag_anomalia_hist", "motivo_anomalia"]
+    resultado = resultado[colunas].rename(columns={"observacoes": "dias_historico"})
+    resultado["data"] = resultado["data"].dt.date
+    return resultado
+
+def atualizar_baseline(pasta: Path, obs: pd.DataFrame, ate_data=None) -> list:
+    """Incorpora ao baseline as datas ainda não incorporadas (anteriores a ate_data, se informada).
+
+    Retorna as datas incorporadas nesta chamada.
+    """
+    baseline, dias = carregar_baseline(pasta)
+    datas = obs["data"].dt.strftime("%Y-%m-%d")
+    novas = ~datas.isin(dias)
+    if ate_data is not None:
+        novas &= obs["data"] < pd.Timestamp(ate_data)
+    if not novas.any():
+        return []
+
+    baseline = juntar_estatisticas(baseline, _estatisticas_lote(obs[novas]))
+    incorporadas = sorted(datas[novas].unique())
+
+    pasta.mkdir(parents=True, exist_ok=True)
+    caminho_baseline, caminho_dias = _caminhos(pasta)
+    # gravação atômica dos dois arquivos: o controle só muda depois do parquet
+    temp = caminho_baseline.with_suffix(".tmp")
+    baseline.to_parquet(temp, index=False)
+    os.replace(temp, caminho_baseline)
+    temp = caminho_dias.with_suffix(".tmp")
+    controle = {"versao": VERSAO_BASELINE, "dias": sorted(dias | set(incorporadas))}
+    temp.write_text(json.dumps(controle, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(temp, caminho_dias)
+    return incorporadas
@@ -0,0 +1,167 @@
+import argparse
+import datetime
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from GERADOR_CDR import PARAMETROS_PADRAO, gerar_bases_raw
+
+# ==============================
+# BENCHMARK DO PIPELINE
+# ==============================
+# Para cada volume: gera (ou reaproveita) BASES_RAW sintéticas, roda o
+# TRATA_DADOS e o IMPORTADOR_BQ (com o ClienteBigQueryFalso) em processos
+# separados sobre uma pasta própria (CDR_BASE_DIR) e lê os logs por etapa de
+# cada um. O resultado é acumulado em resultado_benchmark.csv e comparado com a
+# execução anterior do mesmo volume/modo para deixar regressões visíveis.
+BASE_DIR = Path(__file__).resolve().parent
+PASTA_BENCHMARK = BASE_DIR / "benchmark"
+ARQUIVO_RESULTADO = PASTA_BENCHMARK / "resultado_benchmark.csv"
+
+TAMANHOS_PADRAO = [1_000_000, 10_000_000, 50_000_000]
+
+# variação de tempo (vs. execução anterior) a partir da qual a etapa é sinalizada
+LIMITE_REGRESSAO = 0.10
+
+COMANDO_IMPORTADOR = (
+    "import sys; "
+    "from IMPORTADOR_BQ import importar_csv_para_bigquery; "
+    "from BIGQUERY_FALSO import ClienteBigQueryFalso; "
+    "sys.exit(0 if importar_csv_para_bigquery(cliente=ClienteBigQueryFalso(), notificar=False) else 1)"
+)
+
+def preparar_bases(pasta_trabalho: Path, linhas: int, parametros: dict):
+    """Gera as BASES_RAW do volume pedido; reaproveita se já foram geradas com os mesmos parâmetros"""
+    pasta_raw = pasta_trabalho / "BASES_RAW"
+    esperado = {**PARAMETROS_PADRAO, **parametros, "linhas": linhas}
+    resumo_anterior = pasta_raw / "gerador_cdr.json"
+    if resumo_anterior.exists():
+        resumo = json.loads(resumo_anterior.read_text(encoding="utf-8"))
+        if all(resumo.get(k) == v for k, v in esperado.items()):
+            print(f"   ♻️  Reaproveitando BASES_RAW já gerada ({linhas:,} linhas)")
+            return
+        shutil.rmtree(pasta_raw)
+
+    print(f"   🧪 Gerando {linhas:,} linhas...")
+    t0 = time.perf_counter()
+    gerar_bases_raw(pasta_raw, **esperado)
+    print(f"   ✓ Geração em {time.perf_counter() - t0:.1f}s")
+
+def rodar_etapa(nome: str, comando, pasta_trabalho: Path, env: dict):
+    """Roda um componente do pipeline em outro processo; a saída vai para <pasta>/<nome>.log"""
+    arquivo_log = pasta_trabalho / f"{nome}.log"
+    t0 = time.perf_counter()
+    with open(arquivo_log, "w", encoding="utf-8") as log:
+        retorno = subprocess.run(comando, cwd=BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    if retorno.returncode != 0:
+        raise RuntimeError(f"{nome} terminou com código {retorno.returncode} (ver {arquivo_log})")
+    return time.perf_counter() - t0
+
+def etapas_do_log(caminho_json: Path, componente: str, linhas: int):
+    """Etapas do log JSON do componente, com linhas/s sobre o volume gerado, e a linha TOTAL"""
+    log = json.loads(caminho_json.read_text(encoding="utf-8"))
+    etapas = [(e["etapa"], e["tempo_s"], e["rss_pico_mb"]) for e in log["etapas"]]
+    etapas.append(("TOTAL", log["tempo_total_s"], log["rss_pico_mb"]))
+    return [
+        {
+            "componente": componente,
+            "etapa": etapa,
+            "tempo_s": tempo,
+            "linhas_por_s": round(linhas / tempo) if tempo else None,
+            "rss_pico_mb": rss,
+        }
+        for etapa, tempo, rss in etapas
+    ]
+
+def comparar_com_anterior(resultado: pd.DataFrame, historico: pd.DataFrame) -> pd.DataFrame:
+    """Variação de tempo de cada etapa contra a última execução com o mesmo volume e modo"""
+    chaves = ["linhas", "modo", "componente", "etapa"]
+    if historico.empty:
+        resultado["variacao_tempo_pct"] = None
+        return resultado
+    anterior = (
+        historico.sort_values("data_execucao")
+                 .groupby(chaves, as_index=False)
+                 .last()[chaves + ["tempo_s"]]
+                 .rename(columns={"tempo_s": "tempo_anterior_s"})
+    )
+    resultado = resultado.merge(anterior, on=chaves, how="left")
+    resultado["variacao_tempo_pct"] = ((resultado["tempo_s"] / resultado["tempo_anterior_s"] - 1) * 100).round(1)
+    return resultado.drop(columns="tempo_anterior_s")
+
+def executar_benchmark(linhas: int, streaming=False, importador=True, manter_cache=False, parametros=None):
+    """Mede um volume: geração (fora da medição), TRATA_DADOS e IMPORTADOR_BQ"""
+    modo = "streaming" if streaming else "memoria"
+    pasta_trabalho = PASTA_BENCHMARK / f"{linhas}"
+    pasta_trabalho.mkdir(parents=True, exist_ok=True)
+    print(f"\n📏 Benchmark com {linhas:,} linhas (modo {modo})")
+
+    preparar_bases(pasta_trabalho, linhas, parametros or {})
+
+    # execução a frio: sem o cache da leitura incremental nem o índice de chaves de execuções anteriores
+    if not manter_cache:
+        shutil.rmtree(pasta_trabalho / "cache_cdr", ignore_errors=True)
+        shutil.rmtree(pasta_trabalho / "indice_chaves", ignore_errors=True)
+
+    env = {**os.environ, "CDR_BASE_DIR": str(pasta_trabalho), "CDR_MODO_STREAMING": "1" if streaming else "0"}
+
+    print("   ⚙️  TRATA_DADOS...")
+    rodar_etapa("trata_dados", [sys.executable, "TRATA_DADOS.py"], pasta_trabalho, env)
+    linhas_resultado = etapas_do_log(pasta_trabalho / "BASE_TRATADA" / "log_execucao.json", "TRATA_DADOS", linhas)
+
+    if importador:
+        print("   📤 IMPORTADOR_BQ (client falso)...")
+        rodar_etapa("importador_bq", [sys.executable, "-c", COMANDO_IMPORTADOR], pasta_trabalho, env)
+        linhas_resultado += etapas_do_log(pasta_trabalho / "BASE_TRATADA" / "log_importacao.json", "IMPORTADOR_BQ", linhas)
+
+    resultado = pd.DataFrame(linhas_resultado)
+    resultado.insert(0, "data_execucao", datetime.datetime.now().isoformat(timespec="seconds"))
+    resultado.insert(1, "linhas", linhas)
+    resultado.insert(2, "modo", modo)
+    return resultado
+
+def imprimir_resultado(resultado: pd.DataFrame):
+    for componente, etapas in resultado.groupby("componente", sort=False):
+        print(f"\n   📊 {componente}")
+        for _, e in etapas.iterrows():
+            variacao = ""
+            if pd.notna(e["variacao_tempo_pct"]):
+                alerta = " ⚠️" if e["variacao_tempo_pct"] > LIMITE_REGRESSAO * 100 else ""
+                variacao = f"  ({e['variacao_tempo_pct']:+.1f}%{alerta})"
+            linhas_s = f"{e['linhas_por_s']:>12,.0f} linhas/s" if pd.notna(e["linhas_por_s"]) else " " * 20
+            print(f"      • {e['etapa']:<36} {e['tempo_s']:>9.2f}s {linhas_s}  pico {e['rss_pico_mb']:>8,.0f} MB{variacao}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline (TRATA_DADOS + IMPORTADOR_BQ) com CDR sintético")
+    parser.add_argument("--linhas", type=int, nargs="+", default=TAMANHOS_PADRAO, help="volumes a medir")
+    parser.add_argument("--streaming", action="store_true", help="roda o TRATA_DADOS em MODO_STREAMING")
+    parser.add_argument("--sem-importador", action="store_true", help="mede só o TRATA_DADOS")
+    parser.add_argument("--manter-cache", action="store_true", help="não apaga o cache da leitura incremental")
+    parser.add_argument("--semente", type=int, default=PARAMETROS_PADRAO["semente"])
+    args = parser.parse_args()
+
+    PASTA_BENCHMARK.mkdir(exist_ok=True)
+    historico = pd.read_csv(ARQUIVO_RESULTADO) if ARQUIVO_RESULTADO.exists() else pd.DataFrame()
+
+    for linhas in args.linhas:
+        resultado = executar_benchmark(
+            linhas,
+            streaming=args.streaming,
+            importador=not args.sem_importador,
+            manter_cache=args.manter_cache,
+            parametros={"semente": args.semente},
+        )
+        resultado = comparar_com_anterior(resultado, historico)
+        imprimir_resultado(resultado)
+        resultado.to_csv(ARQUIVO_RESULTADO, mode="a", header=not ARQUIVO_RESULTADO.exists(), index=False, encoding="utf-8")
+
+    print(f"\n✓ Resultados acumulados em: {ARQUIVO_RESULTADO}")
+
+if __name__ == "__main__":
+    main()
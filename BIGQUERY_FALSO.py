@@ -0,0 +1,163 @@
+import io
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.api_core.exceptions import BadRequest, NotFound
+
+# ==============================
+# CLIENT FALSO DO BIGQUERY (em processo)
+# ==============================
+# Implementa só o que o IMPORTADOR_BQ usa (dataset, tabela e load jobs), sem
+# rede e sem credenciais, para medir e testar a importação offline. Os loads
+# serializam o DataFrame em parquet como o client real faz antes do envio, então
+# o custo de conversão entra na medição. Como no client real, o load devolve o
+# job logo após o envio e ele termina em segundo plano: latencia_job_s simula o
+# tempo do job no serviço (jobs simultâneos correm em paralelo) e falhar_jobs
+# (números dos jobs, a partir de 0) ou taxa_falha fazem o job terminar com erro,
+# para testar o fallback e a carga concorrente.
+
+@dataclass
+class TabelaFalsa:
+    table_id: str
+    schema: list = field(default_factory=list)
+    num_rows: int = 0
+    num_bytes: int = 0
+
+class JobFalso:
+    """Load job em segundo plano (result() espera o fim e devolve o próprio job, como no client real)"""
+
+    def __init__(self, numero: int, destino: str, linhas: int, bytes_enviados: int):
+        self.job_id = f"job_falso_{numero:06d}"
+        self.destination = destino
+        self.output_rows = linhas
+        self.bytes_enviados = bytes_enviados
+        self.segundos = None
+        self.state = "RUNNING"
+        self.error_result = None
+        self._concluido = threading.Event()
+
+    def _concluir(self, segundos: float, erro: Exception = None):
+        self.segundos = segundos
+        self.error_result = erro
+        self.state = "DONE"
+        self._concluido.set()
+
+    def done(self) -> bool:
+        return self._concluido.is_set()
+
+    def result(self, timeout=None):
+        if not self._concluido.wait(timeout):
+            raise TimeoutError(f"{self.job_id} não terminou em {timeout}s")
+        if self.error_result is not None:
+            raise self.error_result
+        return self
+
+class ClienteBigQueryFalso:
+    """Substitui bigquery.Client em importar_csv_para_bigquery(cliente=...)"""
+
+    def __init__(self, project="projeto-falso", latencia_job_s=0.0, falhar_jobs=(), taxa_falha=0.0, semente=42):
+        self.project = project
+        self.latencia_job_s = latencia_job_s
+        self.falhar_jobs = set(falhar_jobs)
+        self.taxa_falha = taxa_falha
+        self._rng = random.Random(semente)
+        self.datasets = set()
+        self.tabelas = {}
+        self.jobs = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _id(ref) -> str:
+        # aceita texto "projeto.dataset.tabela" ou objetos Dataset/Table do bigquery
+        if isinstance(ref, str):
+            return ref
+        for atributo in ("full_table_id", "full_dataset_id"):
+            valor = getattr(ref, atributo, None)
+            if valor:
+                return valor.replace(":", ".")
+        return f"{ref.project}.{ref.dataset_id}" + (f".{ref.table_id}" if hasattr(ref, "table_id") else "")
+
+    # ---------- datasets ----------
+    def get_dataset(self, ref):
+        dataset_id = self._id(ref)
+        if dataset_id not in self.datasets:
+            raise NotFound(f"Dataset {dataset_id} não encontrado")
+        return dataset_id
+
+    def create_dataset(self, dataset, exists_ok=False):
+        self.datasets.add(self._id(dataset))
+        return dataset
+
+    # ---------- tabelas ----------
+    def get_table(self, ref) -> TabelaFalsa:
+        table_id = self._id(ref)
+        if table_id not in self.tabelas:
+            raise NotFound(f"Tabela {table_id} não encontrada")
+        return self.tabelas[table_id]
+
+    def create_table(self, table, exists_ok=False) -> TabelaFalsa:
+        table_id = self._id(table)
+        with self._lock:
+            self.tabelas[table_id] = TabelaFalsa(table_id, list(getattr(table, "schema", []) or []))
+            return self.tabelas[table_id]
+
+    def delete_table(self, ref, not_found_ok=False):
+        table_id = self._id(ref)
+        with self._lock:
+            if table_id not in self.tabelas:
+                if not_found_ok:
+                    return
+                raise NotFound(f"Tabela {table_id} não encontrada")
+            del self.tabelas[table_id]
+
+    # ---------- load jobs ----------
+    def _registrar_load(self, ref, linhas: int, bytes_enviados: int, t_inicio: float, erro: Exception = None) -> JobFalso:
+        table_id = self._id(ref)
+        with self._lock:
+            numero = len(self.jobs)
+            falha = numero in self.falhar_jobs or (self.taxa_falha and self._rng.random() < self.taxa_falha)
+            job = JobFalso(numero, table_id, linhas, bytes_enviados)
+            self.jobs.append(job)
+
+        def concluir():
+            if falha or erro is not None:
+                job._concluir(time.perf_counter() - t_inicio, erro or BadRequest(f"{job.job_id}: falha simulada"))
+                return
+            with self._lock:
+                # WRITE_APPEND em tabela inexistente cria a tabela, como no BigQuery
+                tabela = self.tabelas.setdefault(table_id, TabelaFalsa(table_id))
+                tabela.num_rows += linhas
+                tabela.num_bytes += bytes_enviados
+            job._concluir(time.perf_counter() - t_inicio)
+
+        if self.latencia_job_s:
+            temporizador = threading.Timer(self.latencia_job_s, concluir)
+            temporizador.daemon = True
+            temporizador.start()
+        else:
+            concluir()
+        return job
+
+    def load_table_from_dataframe(self, dataframe, destination, job_config=None, location=None, **kwargs) -> JobFalso:
+        t_inicio = time.perf_counter()
+        buffer = io.BytesIO()
+        pq.write_table(pa.Table.from_pandas(dataframe, preserve_index=False), buffer)
+        return self._registrar_load(destination, len(dataframe), buffer.tell(), t_inicio)
+
+    def load_table_from_file(self, file_obj, destination, job_config=None, location=None, **kwargs) -> JobFalso:
+        t_inicio = time.perf_counter()
+        conteudo = file_obj.read()
+        if getattr(job_config, "source_format", None) == "PARQUET":
+            # parquet: linhas pelo rodapé; colunas fora do schema da tabela fazem o job falhar
+            schema = pq.read_schema(io.BytesIO(conteudo))
+            tabela = self.tabelas.get(self._id(destination))
+            esperadas = [c.name for c in tabela.schema] if tabela is not None and tabela.schema else schema.names
+            erro = None if schema.names == esperadas else BadRequest(f"colunas do parquet diferentes do schema: {schema.names}")
+            linhas = pq.read_metadata(io.BytesIO(conteudo)).num_rows
+            return self._registrar_load(destination, linhas, len(conteudo), t_inicio, erro=erro)
+        linhas = conteudo.count(b"\n") - (getattr(job_config, "skip_leading_rows", 0) or 0)
+        return self._registrar_load(destination, max(linhas, 0), len(conteudo), t_inicio)
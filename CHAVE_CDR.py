@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# ==============================
+# CHAVE LÓGICA (CallId + SeqNum) EMPACOTADA EM INT64
+# ==============================
+# Layout: [bit de sinal = 0][CallId: 47 bits][SeqNum: 16 bits]
+# O maior valor de cada campo é reservado como sentinela de "ausente",
+# então chaves com parte ausente continuam distintas entre si.
+#
+# Valor que não cabe no layout (CallId ≥ 2^47 - 1, SeqNum ≥ 65535 ou negativo)
+# não interrompe o tratamento: a linha recebe uma chave larga, hash de 63 bits do
+# par (CallId, SeqNum) com o bit de sinal ligado. Chave larga é sempre negativa,
+# então não colide com as empacotadas (entre si, a chance é ~n²/2^64). O hash não
+# volta para CallId/SeqNum: o texto dessas chaves vem das próprias colunas.
+BITS_SEQNUM = 16
+BITS_CALLID = 47
+
+SENTINELA_SEQNUM = (1 << BITS_SEQNUM) - 1
+SENTINELA_CALLID = (1 << BITS_CALLID) - 1
+
+TEXTO_SEM_CALLID = "SEM_CALLID"
+TEXTO_SEM_SEQNUM = "SEM_SEQNUM"
+PREFIXO_CHAVE_LARGA = "LARGA_"
+
+_BIT_SINAL = np.uint64(1 << 63)
+
+def _misturar(x: np.ndarray) -> np.ndarray:
+    """splitmix64: espalha os bits (uint64, com estouro modular)"""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def _valores_campo(serie: pd.Series, sentinela: int):
+    """(inteiros do campo com nulo trocado pela sentinela, máscara dos valores fora da faixa do layout)"""
+    serie = serie.astype("Int64")
+    valores = serie.to_numpy(dtype="int64", na_value=sentinela)
+    presentes = serie.notna().to_numpy()
+    return valores, presentes & ((valores < 0) | (valores >= sentinela))
+
+def empacotar_chave(callid: pd.Series, seqnum: pd.Series) -> pd.Series:
+    """Gera a chave int64 a partir de CallId e SeqNum (chave larga, negativa, onde algum valor não cabe)"""
+    v_callid, callid_fora = _valores_campo(callid, SENTINELA_CALLID)
+    v_seqnum, seqnum_fora = _valores_campo(seqnum, SENTINELA_SEQNUM)
+    chave = (v_callid << BITS_SEQNUM) | v_seqnum
+
+    larga = callid_fora | seqnum_fora
+    if larga.any():
+        with np.errstate(over="ignore"):
+            h = _misturar(_misturar(v_callid[larga].view("uint64")) ^ v_seqnum[larga].view("uint64"))
+        chave[larga] = (h | _BIT_SINAL).view("int64")
+    return pd.Series(chave, index=callid.index, dtype="int64")
+
+def chave_larga(chave: pd.Series) -> pd.Series:
+    """True onde a chave é larga (CallId/SeqNum fora da faixa do layout)"""
+    return chave < 0
+
+def desempacotar_chave(chave: pd.Series):
+    """Recupera (CallId, SeqNum) como Int64, com as sentinelas (e as chaves largas) voltando a nulo"""
+    valores = chave.to_numpy(dtype="int64")
+    v_callid = valores >> BITS_SEQNUM
+    v_seqnum = valores & SENTINELA_SEQNUM
+    larga = valores < 0
+
+    callid = pd.array(v_callid, dtype="Int64")
+    callid[(v_callid == SENTINELA_CALLID) | larga] = pd.NA
+    seqnum = pd.array(v_seqnum, dtype="Int64")
+    seqnum[(v_seqnum == SENTINELA_SEQNUM) | larga] = pd.NA
+    return pd.Series(callid, index=chave.index), pd.Series(seqnum, index=chave.index)
+
+def chave_para_texto(chave: pd.Series, callid: pd.Series = None, seqnum: pd.Series = None) -> pd.Series:
+    """Forma texto 'CallId_SeqNum' (usada só na exportação)
+
+    Chave larga usa as colunas callid/seqnum da mesma linha, se informadas;
+    sem elas, sai como 'LARGA_<valor da chave>'.
+    """
+    larga = chave_larga(chave)
+    v_callid, v_seqnum = desempacotar_chave(chave)
+    if callid is not None and larga.any():
+        v_callid = v_callid.mask(larga, callid.astype("Int64"))
+        v_seqnum = v_seqnum.mask(larga, seqnum.astype("Int64"))
+        larga = pd.Series(False, index=chave.index)
+
+    texto_callid = pc.fill_null(pc.cast(pa.array(v_callid), pa.string()), TEXTO_SEM_CALLID)
+    texto_seqnum = pc.fill_null(pc.cast(pa.array(v_seqnum), pa.string()), TEXTO_SEM_SEQNUM)
+    texto = pd.Series(
+        pd.arrays.ArrowStringArray(pc.binary_join_element_wise(texto_callid, texto_seqnum, "_")), index=chave.index
+    )
+    if larga.any():
+        texto[larga] = PREFIXO_CHAVE_LARGA + chave[larga].astype(str)
+    return texto
@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+
+# ==============================
+# CONCORRÊNCIA E OCUPAÇÃO (varredura dos intervalos das chamadas)
+# ==============================
+# Cada chamada vira até três intervalos [início, fim): tocando, em conversa e em
+# pós-atendimento. Cada intervalo vira dois eventos, +1 no início e -1 no fim, em
+# segundos cheios (ceil: a chamada conta em cada segundo exato em que está em
+# andamento). Os eventos ficam esparsos, um por série (grupo × estado) × segundo
+# com delta != 0, numa chave int64 (série << 32 | segundo) ordenada. O acumulado é
+# uma lista de blocos ordenados de tamanhos decrescentes: o bloco de um lote só é
+# intercalado com os vizinhos de tamanho parecido, então somar um lote custa
+# O(lote · log) amortizado, não o tamanho do acumulado. A soma acumulada dos
+# deltas de cada série reconstrói as chamadas simultâneas entre um evento e outro.
+
+# estado -> (coluna de início, colunas de fim: a primeira preenchida)
+# chamada não atendida fica tocando até o CallEndDt
+ESTADOS_CONCORRENCIA = {
+    "ring": ("TimePhoneStartingRinging", ["AnswerDt", "CallEndDt"]),
+    "talk": ("AnswerDt", ["CallEndDt"]),
+    "wrap": ("CallEndDt", ["WrapEndDt"]),
+}
+
+# ocupação do atendimento = em conversa + em pós-atendimento
+ESTADO_OCUPACAO = "ocupado"
+ESTADOS_OCUPACAO = ["talk", "wrap"]
+
+TODOS_GRUPOS = "(TODOS)"
+
+NS_POR_SEGUNDO = 1_000_000_000
+BITS_SEGUNDO = 32
+
+COLUNAS_CURVA = ["ResourceGroupDesc", "estado", "inicio", "pico", "media"]
+
+def _segundos(datas: pd.Series) -> np.ndarray:
+    """Segundo cheio (ceil, epoch) de cada data; -1 onde a data é nula"""
+    valores = datas.to_numpy(dtype="datetime64[ns]").astype("int64")
+    nulos = np.isnat(datas.to_numpy(dtype="datetime64[ns]"))
+    return np.where(nulos, -1, -(-valores // NS_POR_SEGUNDO))
+
+def _reduzir(chaves: np.ndarray, deltas: np.ndarray) -> dict:
+    """Bloco ordenado: uma chave por série × segundo, deltas somados, sem delta zero"""
+    if len(chaves) == 0:
+        return {"chave": np.empty(0, dtype="int64"), "delta": np.empty(0, dtype="int32")}
+    # blocos já ordenados concatenados são runs: a ordenação estável (timsort) os intercala
+    ordem = np.argsort(chaves, kind="stable")
+    chaves, deltas = chaves[ordem], deltas[ordem]
+    inicios = np.flatnonzero(np.r_[True, chaves[1:] != chaves[:-1]])
+    soma = np.add.reduceat(deltas, inicios)
+    mantidos = soma != 0
+    return {"chave": chaves[inicios][mantidos], "delta": soma[mantidos].astype("int32")}
+
+def _compactar(blocos: list) -> list:
+    """Intercala o último bloco com o anterior enquanto o anterior não for mais que o dobro dele"""
+    while len(blocos) > 1 and len(blocos[-2]["chave"]) <= 2 * len(blocos[-1]["chave"]):
+        ultimo, anterior = blocos.pop(), blocos.pop()
+        blocos.append(_reduzir(
+            np.concatenate([anterior["chave"], ultimo["chave"]]),
+            np.concatenate([anterior["delta"], ultimo["delta"]]),
+        ))
+    return blocos
+
+def montar_eventos_concorrencia(cdr: pd.DataFrame) -> dict:
+    """Eventos de um lote: {"series": {(grupo, estado): id}, "blocos": [bloco ordenado]}"""
+    grupos = cdr["ResourceGroupDesc"].astype("category")
+    codigos = grupos.cat.codes.to_numpy().astype("int64")
+    nomes_grupos = [str(g) for g in grupos.cat.categories]
+
+    series = {}
+    chaves, deltas = [], []
+    for i_estado, (estado, (coluna_inicio, colunas_fim)) in enumerate(ESTADOS_CONCORRENCIA.items()):
+        fim = cdr[colunas_fim[0]]
+        for coluna in colunas_fim[1:]:
+            fim = fim.fillna(cdr[coluna])
+        inicio, fim = _segundos(cdr[coluna_inicio]), _segundos(fim)
+        # intervalo que não passa por nenhum segundo cheio não conta, nem chamada sem grupo
+        validos = (inicio >= 0) & (fim > inicio) & (codigos >= 0)
+        serie = codigos[validos] * len(ESTADOS_CONCORRENCIA) + i_estado
+        chaves.append(np.left_shift(np.tile(serie, 2), BITS_SEGUNDO) | np.concatenate([inicio[validos], fim[validos]]))
+        deltas.append(np.repeat(np.array([1, -1], dtype="int32"), int(validos.sum())))
+        for codigo in np.unique(codigos[validos]):
+            series[(nomes_grupos[codigo], estado)] = int(codigo) * len(ESTADOS_CONCORRENCIA) + i_estado
+
+    return {"series": series, "blocos": [_reduzir(np.concatenate(chaves), np.concatenate(deltas))]}
+
+def somar_eventos(acumulado: dict, novo: dict) -> dict:
+    """Soma os eventos de um lote aos acumulados (in-place): renumera as séries do lote e intercala o bloco"""
+    mapa = np.zeros(max(novo["series"].values(), default=-1) + 1, dtype="int64")
+    for nome, id_novo in novo["series"].items():
+        mapa[id_novo] = acumulado["series"].setdefault(nome, len(acumulado["series"]))
+    mascara = (1 << BITS_SEGUNDO) - 1
+    for bloco in novo["blocos"]:
+        chave = np.left_shift(mapa[bloco["chave"] >> BITS_SEGUNDO], BITS_SEGUNDO) | (bloco["chave"] & mascara)
+        # renumerar pode tirar a ordem entre séries: reduz (ordena) de novo só este bloco
+        acumulado["blocos"].append(_reduzir(chave, bloco["delta"]))
+        _compactar(acumulado["blocos"])
+    return acumulado
+
+def total_eventos(eventos: dict) -> int:
+    return sum(len(bloco["chave"]) for bloco in eventos["blocos"])
+
+def _eventos_com_totais(eventos: dict):
+    """Séries [(grupo, estado)] e bloco único com o estado de ocupação (talk + wrap) e o total de todos os grupos"""
+    bloco = _reduzir(
+        np.concatenate([b["chave"] for b in eventos["blocos"]] or [np.empty(0, dtype="int64")]),
+        np.concatenate([b["delta"] for b in eventos["blocos"]] or [np.empty(0, dtype="int32")]),
+    )
+    alvos = {}
+    for (grupo, estado) in eventos["series"]:
+        estados = [estado] + ([ESTADO_OCUPACAO] if estado in ESTADOS_OCUPACAO else [])
+        for nome_grupo in (grupo, TODOS_GRUPOS):
+            for nome_estado in estados:
+                alvos.setdefault((nome_grupo, nome_estado), len(alvos))
+
+    chaves, deltas = [], []
+    mascara = (1 << BITS_SEGUNDO) - 1
+    for (grupo, estado), id_serie in eventos["series"].items():
+        # bloco ordenado: os eventos da série são um trecho contíguo
+        de, ate = np.searchsorted(bloco["chave"], [id_serie << BITS_SEGUNDO, (id_serie + 1) << BITS_SEGUNDO])
+        segundos, delta = bloco["chave"][de:ate] & mascara, bloco["delta"][de:ate]
+        estados = [estado] + ([ESTADO_OCUPACAO] if estado in ESTADOS_OCUPACAO else [])
+        for nome_grupo in (grupo, TODOS_GRUPOS):
+            for nome_estado in estados:
+                chaves.append(np.left_shift(alvos[(nome_grupo, nome_estado)], BITS_SEGUNDO) | segundos)
+                deltas.append(delta)
+    total = _reduzir(
+        np.concatenate(chaves or [np.empty(0, dtype="int64")]),
+        np.concatenate(deltas or [np.empty(0, dtype="int32")]),
+    )
+    return alvos, total
+
+def _janelas_serie(segundos: np.ndarray, delta: np.ndarray, bordas: np.ndarray, resolucao_s: int):
+    """Pico e soma do nível em cada janela [bordas[k], bordas[k+1]) a partir dos eventos da série"""
+    nivel = np.cumsum(delta, dtype="int64")
+    # integral do nível até cada evento (o nível é constante entre dois eventos)
+    integral = np.concatenate([[0], np.cumsum(nivel[:-1] * np.diff(segundos))])
+
+    anterior = np.searchsorted(segundos, bordas, side="right") - 1
+    tem_anterior = anterior >= 0
+    anterior = np.maximum(anterior, 0)
+    nivel_borda = np.where(tem_anterior, nivel[anterior], 0)
+    integral_borda = np.where(tem_anterior, integral[anterior] + nivel[anterior] * (bordas - segundos[anterior]), 0)
+
+    # pico: nível no início da janela ou logo após qualquer evento dentro dela
+    pico = nivel_borda[:-1].copy()
+    janela = (segundos - bordas[0]) // resolucao_s
+    inicios = np.flatnonzero(np.r_[True, janela[1:] != janela[:-1]])
+    pico[janela[inicios]] = np.maximum(pico[janela[inicios]], np.maximum.reduceat(nivel, inicios))
+    return pico, np.diff(integral_borda)
+
+def curva_concorrencia(eventos: dict, resolucao_s=60) -> pd.DataFrame:
+    """Pico e média de chamadas simultâneas por grupo × estado em janelas de resolucao_s
+    segundos (divisor de 3600), cobrindo as horas cheias do período dos eventos"""
+    series, bloco = _eventos_com_totais(eventos)
+    if len(bloco["chave"]) == 0:
+        # nenhuma chamada com intervalo válido
+        return pd.DataFrame({
+            "ResourceGroupDesc": pd.Series(dtype=object), "estado": pd.Series(dtype=object),
+            "inicio": pd.Series(dtype="datetime64[ns]"), "pico": pd.Series(dtype="int64"),
+            "media": pd.Series(dtype="float64"),
+        })
+
+    mascara = (1 << BITS_SEGUNDO) - 1
+    segundos = bloco["chave"] & mascara
+    id_serie = bloco["chave"] >> BITS_SEGUNDO
+
+    # período: das horas do primeiro ao último segundo com evento em qualquer série
+    t0 = segundos.min() // 3600 * 3600
+    n_janelas = (segundos.max() // 3600 * 3600 + 3600 - t0) // resolucao_s
+    bordas = t0 + np.arange(n_janelas + 1) * resolucao_s
+    inicio_janelas = pd.to_datetime(bordas[:-1], unit="s")
+
+    partes = []
+    for (grupo, estado), id_alvo in sorted(series.items()):
+        de, ate = np.searchsorted(id_serie, [id_alvo, id_alvo + 1])
+        if de == ate:
+            continue
+        pico, soma = _janelas_serie(segundos[de:ate], bloco["delta"][de:ate], bordas, resolucao_s)
+        partes.append(pd.DataFrame({
+            "ResourceGroupDesc": grupo,
+            "estado": estado,
+            "inicio": inicio_janelas,
+            "pico": pico,
+            "media": (soma / resolucao_s).round(3),
+        }))
+    return pd.concat(partes, ignore_index=True)[COLUNAS_CURVA]
+
+def ocupacao_por_hora(curva: pd.DataFrame) -> pd.DataFrame:
+    """Pico e média de chamadas simultâneas por data × hora × grupo (uma coluna por estado)"""
+    curva = curva.assign(data=curva["inicio"].dt.date, hora=curva["inicio"].dt.hour)
+    resumo = (
+        curva.groupby(["data", "hora", "ResourceGroupDesc", "estado"], sort=True)
+             .agg(pico=("pico", "max"), media=("media", "mean"))
+             .unstack("estado")
+    )
+    resumo.columns = [f"{metrica}_{estado}" for metrica, estado in resumo.columns]
+    estados = list(ESTADOS_CONCORRENCIA) + [ESTADO_OCUPACAO]
+    ordem = [f"{metrica}_{estado}" for estado in estados for metrica in ("pico", "media")]
+    return resumo.reindex(columns=ordem).round(3).reset_index()
@@ -0,0 +1,188 @@
+import argparse
+import datetime
+import json
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+
+from LEITURA_CDR import COLUNAS
+
+# ==============================
+# GERADOR DE CDR SINTÉTICO
+# ==============================
+# Gera arquivos horários no layout exato do Aspect (13 colunas de COLUNAS,
+# sem cabeçalho, separados por ';', datas com milissegundos e 'NULL' como nulo),
+# para medir o pipeline sem depender de exportações reais.
+PARAMETROS_PADRAO = {
+    "linhas": 1_000_000,
+    "data": "2025-07-29",
+    "hora_inicial": 8,
+    "hora_final": 23,
+    "taxa_atendimento": 0.40,
+    "ring_medio_seg": 12.0,        # ring time (lognormal) das atendidas
+    "talk_medio_seg": 140.0,       # talk time (lognormal)
+    "wrap_medio_seg": 20.0,        # wrap time (exponencial)
+    "abandono_medio_seg": 30.0,    # duração das não atendidas (exponencial)
+    "grupos": 12,
+    "dispositions": 20,
+    "densidade_nulos": 0.05,       # chance de NULL nos campos de texto opcionais
+    "taxa_malformadas": 0.0005,    # fração de linhas com nº de campos errado
+    "semente": 42,
+    "linhas_por_bloco": 1_000_000,
+}
+
+# CallIds de cada data começam em (dias desde DATA_BASE_CALLID) × CALLIDS_POR_DIA + 1:
+# bases de datas diferentes geradas em chamadas separadas não repetem chaves
+DATA_BASE_CALLID = datetime.date(2000, 1, 1)
+CALLIDS_POR_DIA = 1_000_000_000
+
+DISPOSITIONS_BASE = [
+    "Atendida", "Caixa Postal", "Ocupado", "Não Atende", "Abandono",
+    "Número Inválido", "Transferida", "Promessa de Pagamento", "Recado", "Sem Interesse",
+]
+
+def nomes_grupos(qtd: int):
+    return [f"GRUPO_{i:02d}" for i in range(1, qtd + 1)]
+
+def nomes_dispositions(qtd: int):
+    nomes = DISPOSITIONS_BASE[:qtd]
+    return nomes + [f"Disposition {i:02d}" for i in range(len(nomes) + 1, qtd + 1)]
+
+def distribuir_por_hora(linhas: int, horas):
+    """Volume por hora com pico no fim da manhã e no meio da tarde"""
+    horas = np.asarray(horas)
+    pesos = 1.0 + np.exp(-((horas - 10.5) ** 2) / 4) + 0.8 * np.exp(-((horas - 15) ** 2) / 6)
+    volume = np.floor(linhas * pesos / pesos.sum()).astype("int64")
+    volume[: linhas - volume.sum()] += 1
+    return volume
+
+def _lognormal(rng, media, tamanho, sigma=0.8):
+    """Amostra lognormal com a média pedida"""
+    return rng.lognormal(np.log(media) - sigma ** 2 / 2, sigma, tamanho)
+
+# '000'..'999' para montar a parte de milissegundos sem formatar linha a linha
+TEXTO_MILISSEGUNDOS = pa.array([f"{i:03d}" for i in range(1000)])
+
+def _texto_data(instantes: np.ndarray, validos: np.ndarray = None) -> pa.Array:
+    """datetime64[ms] -> 'AAAA-MM-DD HH:MM:SS.mmm', com 'NULL' fora de validos"""
+    # strftime linha a linha é o gargalo: formata cada segundo do intervalo uma
+    # vez e monta o texto por índice (segundo) + sufixo (milissegundo)
+    segundos = instantes.astype("datetime64[s]")
+    primeiro = segundos.min()
+    todos_segundos = np.arange(primeiro, segundos.max() + np.timedelta64(1, "s"))
+    texto_segundos = pc.strftime(pa.array(todos_segundos), format="%Y-%m-%d %H:%M:%S")
+    indices_segundo = pa.array((segundos - primeiro).astype("int64"))
+    indices_milis = pa.array((instantes - segundos).astype("int64"))
+    texto = pc.binary_join_element_wise(
+        pc.take(texto_segundos, indices_segundo),
+        pc.take(TEXTO_MILISSEGUNDOS, indices_milis),
+        "."
+    )
+    if validos is None:
+        return texto
+    return pc.if_else(pa.array(validos), texto, "NULL")
+
+def _texto_opcional(rng, valores: np.ndarray, densidade_nulos: float, nulo="NULL") -> pa.Array:
+    nulos = rng.random(len(valores)) < densidade_nulos
+    return pc.if_else(pa.array(nulos), nulo, pa.array(valores.astype(str)))
+
+def gerar_bloco(rng, inicio_hora: np.datetime64, tamanho: int, primeiro_callid: int, parametros: dict) -> pa.Table:
+    """Gera um bloco de chamadas de uma hora como tabela só de texto"""
+    p = parametros
+    ms = lambda segundos: (np.asarray(segundos) * 1000).astype("int64").astype("timedelta64[ms]")
+
+    inicio = inicio_hora + rng.integers(0, 3_600_000, tamanho).astype("timedelta64[ms]")
+    ring_inicio = inicio + ms(rng.uniform(0, 3, tamanho))
+    atendida = rng.random(tamanho) < p["taxa_atendimento"]
+
+    atendimento = ring_inicio + ms(_lognormal(rng, p["ring_medio_seg"], tamanho))
+    fim_atendida = atendimento + ms(_lognormal(rng, p["talk_medio_seg"], tamanho))
+    fim_nao_atendida = ring_inicio + ms(rng.exponential(p["abandono_medio_seg"], tamanho))
+    fim = np.where(atendida, fim_atendida, fim_nao_atendida)
+    wrap_fim = fim + ms(rng.exponential(p["wrap_medio_seg"], tamanho))
+
+    grupos = np.array(nomes_grupos(p["grupos"]))
+    dispositions = np.array(nomes_dispositions(p["dispositions"]))
+    codigo_disp = rng.integers(0, len(dispositions), tamanho)
+
+    colunas = {
+        "CallStartDt": _texto_data(inicio),
+        "SeqNum": pa.array(rng.integers(1, 4, tamanho).astype(str)),
+        "CallId": pa.array(np.arange(primeiro_callid, primeiro_callid + tamanho).astype(str)),
+        "DetectionDt": _texto_data(inicio),
+        "AnswerDt": _texto_data(atendimento, atendida),
+        "WrapEndDt": _texto_data(wrap_fim, atendida),
+        "CallInsertDt": _texto_data(inicio),
+        "CallEndDt": _texto_data(fim),
+        "TimePhoneStartingRinging": _texto_data(ring_inicio),
+        "DialedNum": _texto_opcional(rng, 5511_0000_0000 + rng.integers(0, 10 ** 8, tamanho), p["densidade_nulos"]),
+        "Disp_c": _texto_opcional(rng, codigo_disp + 1, p["densidade_nulos"]),
+        "Disposition_Desc": _texto_opcional(rng, dispositions[codigo_disp], p["densidade_nulos"]),
+        # grupo ausente vem como campo vazio no fim da linha, como no export do Aspect
+        "ResourceGroupDesc": _texto_opcional(rng, grupos[rng.integers(0, len(grupos), tamanho)], p["densidade_nulos"], nulo=""),
+    }
+    return pa.table([colunas[c] for c in COLUNAS], names=COLUNAS)
+
+def linhas_malformadas(rng, tabela: pa.Table, qtd: int):
+    """Linhas com campos a menos (cortadas) ou a mais, a partir de linhas válidas"""
+    linhas = []
+    for i in rng.integers(0, tabela.num_rows, qtd):
+        campos = [tabela[c][int(i)].as_py() for c in COLUNAS]
+        if rng.random() < 0.5:
+            campos = campos[: rng.integers(1, len(COLUNAS) - 1)]
+        else:
+            campos = campos + ["EXTRA"] * int(rng.integers(1, 3))
+        linhas.append(";".join(campos))
+    return linhas
+
+def gerar_bases_raw(pasta: Path, **parametros) -> dict:
+    """Gera um arquivo cdr_AAAAMMDD_HH.csv por hora em pasta. Retorna o resumo da geração"""
+    p = {**PARAMETROS_PADRAO, **parametros}
+    rng = np.random.default_rng(p["semente"])
+    pasta.mkdir(parents=True, exist_ok=True)
+
+    data = datetime.date.fromisoformat(p["data"])
+    horas = list(range(p["hora_inicial"], p["hora_final"] + 1))
+    opcoes = pv.WriteOptions(include_header=False, delimiter=";", quoting_style="none")
+
+    if p["linhas"] > CALLIDS_POR_DIA:
+        raise ValueError(f"linhas={p['linhas']:,} passa de CALLIDS_POR_DIA={CALLIDS_POR_DIA:,}")
+    callid = (data - DATA_BASE_CALLID).days * CALLIDS_POR_DIA + 1
+    total_malformadas = 0
+    for hora, volume in zip(horas, distribuir_por_hora(p["linhas"], horas)):
+        inicio_hora = np.datetime64(f"{data.isoformat()}T{hora:02d}:00:00", "ms")
+        arquivo = pasta / f"cdr_{data:%Y%m%d}_{hora:02d}.csv"
+
+        with open(arquivo, "wb") as f:
+            for inicio_bloco in range(0, int(volume), p["linhas_por_bloco"]):
+                tamanho = min(p["linhas_por_bloco"], int(volume) - inicio_bloco)
+                tabela = gerar_bloco(rng, inicio_hora, tamanho, callid, p)
+                callid += tamanho
+                pv.write_csv(tabela, f, opcoes)
+
+                qtd_malformadas = int(rng.binomial(tamanho, p["taxa_malformadas"]))
+                if qtd_malformadas:
+                    f.write(("\n".join(linhas_malformadas(rng, tabela, qtd_malformadas)) + "\n").encode("utf-8"))
+                    total_malformadas += qtd_malformadas
+
+    resumo = {**p, "arquivos": len(horas), "linhas_malformadas": total_malformadas}
+    (pasta / "gerador_cdr.json").write_text(json.dumps(resumo, indent=2, ensure_ascii=False), encoding="utf-8")
+    return resumo
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera arquivos CDR sintéticos (layout Aspect) para testes de performance")
+    parser.add_argument("pasta", type=Path, help="pasta de saída (ex.: BASES_RAW)")
+    for nome, padrao in PARAMETROS_PADRAO.items():
+        parser.add_argument(f"--{nome.replace('_', '-')}", type=type(padrao), default=padrao)
+    args = parser.parse_args()
+
+    parametros = {nome: getattr(args, nome) for nome in PARAMETROS_PADRAO}
+    print(f"🧪 Gerando {parametros['linhas']:,} linhas em {args.pasta}...")
+    resumo = gerar_bases_raw(args.pasta, **parametros)
+    print(f"   ✓ {resumo['arquivos']} arquivo(s), {resumo['linhas_malformadas']:,} linha(s) malformada(s)")
+
+if __name__ == "__main__":
+    main()
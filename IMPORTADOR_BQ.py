@@ -1,5 +1,7 @@
 import warnings
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from google.cloud import bigquery
 from google.oauth2 import service_account
 from google.api_core.exceptions import NotFound
@@ -16,11 +18,19 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import shutil
 import tempfile
+from collections import deque
 from tqdm import tqdm
 
+# Mesma política de nulos (TOKENS_NULOS) e mesma conversão de datas da leitura do CDR
+from LEITURA_CDR import OPCOES_NULOS_PANDAS, converter_datas
+from INSTRUMENTACAO import MedidorEtapas, registrar_saida
+from INDICE_CSV import (
+    indexar_csv, ler_chunk_csv, ler_metadados_csv, contar_registros_csv, contar_registros_parquet
+)
+
 # ==================== CONFIGURAÇÕES ==================== #
 try:
-    BASE_DIR = Path(__file__).resolve().parent
+    BASE_DIR = Path(os.environ.get("CDR_BASE_DIR") or Path(__file__).resolve().parent)
 except NameError:
     BASE_DIR = Path.cwd()
 
@@ -29,6 +39,8 @@ BASE_TRATADA_DIR = BASE_DIR / "BASE_TRATADA"
 ARQUIVOS_DIR = BASE_DIR / "ARQUIVOS"
 
 CSV_PATH = BASE_TRATADA_DIR / "base_tratada.csv"
+# Parquet gravado pelo TRATA_DADOS junto com o CSV (contagem de linhas pelos rodapés)
+PARQUET_TRATADO_DIR = BASE_TRATADA_DIR / "base_tratada_parquet"
 JSON_KEY_PATH = ARQUIVOS_DIR / "chave_gcp.json"
 EMAIL_ENV_PATH = ARQUIVOS_DIR / "dados_email.env"
 
@@ -43,22 +55,30 @@ LOCATION = "southamerica-east1"
 
 CHUNK_SIZE = 500_000
 
-# ==================== INICIALIZAÇÃO ==================== #
+# Pipeline processamento → upload: workers que leem/tipam os chunks e limite de
+# chunks em memória ao mesmo tempo (processando, prontos ou em envio)
+WORKERS_PROCESSAMENTO = 4
+MAX_CHUNKS_EM_MEMORIA = 8
 
-if not CSV_PATH.exists():
-    raise FileNotFoundError(f"CSV não encontrado: {CSV_PATH}")
-if not JSON_KEY_PATH.exists():
-    raise FileNotFoundError(f"Chave GCP não encontrada: {JSON_KEY_PATH}")
-if not EMAIL_ENV_PATH.exists():
-    raise FileNotFoundError(f".env de email não encontrado: {EMAIL_ENV_PATH}")
+# Arquivos acima de LIMITE_LINHAS_CACHE: com CARGA_PARQUET_DIRETA cada worker grava o
+# chunk já tipado em parquet (nomes e tipos do schema da tabela) e o arquivo sobe
+# direto como SourceFormat.PARQUET; sem ela, o CSV é copiado para um cache parquet
+# bruto e cada chunk passa de novo pelo pandas e pelo load_table_from_dataframe
+LIMITE_LINHAS_CACHE = 1_000_000
+CARGA_PARQUET_DIRETA = True
 
-# Carrega variáveis do .env do email
-load_dotenv(dotenv_path=EMAIL_ENV_PATH)
-warnings.filterwarnings("ignore", category=UserWarning, module="pandas")
+# Load jobs simultâneos no BigQuery (1 = um chunk por vez, esperando cada job terminar)
+MAX_JOBS_SIMULTANEOS = 4
+
+# Log das fases da importação (mesmo formato do log_execucao do TRATA_DADOS)
+ARQUIVO_LOG_IMPORTACAO = BASE_TRATADA_DIR / "log_importacao.json"
+ARQUIVO_LOG_IMPORTACAO_ETAPAS = BASE_TRATADA_DIR / "log_importacao_etapas.csv"
+# Um registro por load job (chunk, linhas, método, tempo de envio e até a conclusão)
+ARQUIVO_LOG_IMPORTACAO_JOBS = BASE_TRATADA_DIR / "log_importacao_jobs.csv"
 
-# BigQuery Client
-credentials = service_account.Credentials.from_service_account_file(JSON_KEY_PATH)
-client = bigquery.Client(credentials=credentials, project=PROJECT_ID)
+# ==================== INICIALIZAÇÃO ==================== #
+
+warnings.filterwarnings("ignore", category=UserWarning, module="pandas")
 
 # Config do Email
 load_dotenv(dotenv_path=EMAIL_ENV_PATH)
@@ -66,25 +86,22 @@ EMAIL_REMETENTE = os.getenv("EMAIL")
 EMAIL_SENHA = os.getenv("CHAVE_ACESSO")
 
 # Local do Cachê
-BASE_DIR = Path(__file__).resolve().parent
 CACHE_DIR = BASE_DIR / "cache_chunks"
 CACHE_DIR.mkdir(exist_ok=True)
 
+def criar_cliente_bigquery():
+    """Cria o client do BigQuery com a chave de serviço do projeto"""
+    if not JSON_KEY_PATH.exists():
+        raise FileNotFoundError(f"Chave GCP não encontrada: {JSON_KEY_PATH}")
+    credentials = service_account.Credentials.from_service_account_file(JSON_KEY_PATH)
+    return bigquery.Client(credentials=credentials, project=PROJECT_ID)
+
 # ==================== FUNÇÕES AUXILIARES ==================== #
 
 def normalize_column_name(name):
     """Normaliza nomes de colunas para padrão BigQuery"""
     return re.sub(r'\W+', '_', name).strip('_').upper()
 
-def normalizar_nulos(df: pd.DataFrame) -> pd.DataFrame:
-    """Remove valores vazios e substitui por None"""
-    for col in df.columns:
-        df[col] = df[col].replace(
-            ["", " ", "None", "none", "NONE", "NaN", "nan", "NAN", "NaT", "nat", "NAT", "<NA>"],
-            None
-        )
-    return df
-
 def salvar_csv_seguro(df, temp_file):
     """Salva CSV com limpeza de caracteres especiais"""
     import unicodedata
@@ -217,6 +234,28 @@ def gerar_schema_bq(colunas, tipos_detectados):
         schema.append(bigquery.SchemaField(col_normalized, tipo))
     return schema
 
+# Tipo do BigQuery -> tipo do parquet que o load converte sem ambiguidade
+# (timestamp sem fuso vira DATETIME, como no load_table_from_dataframe)
+TIPOS_ARROW = {
+    "INT64": pa.int64(),
+    "FLOAT64": pa.float64(),
+    "DATE": pa.date32(),
+    "DATETIME": pa.timestamp("us"),
+    "STRING": pa.string(),
+}
+
+def gerar_schema_arrow(colunas, tipos_detectados):
+    """Schema do parquet com os mesmos nomes e tipos do schema do BigQuery"""
+    return pa.schema([
+        (normalize_column_name(col), TIPOS_ARROW[tipos_detectados.get(normalize_column_name(col), "STRING")])
+        for col in colunas
+    ])
+
+def gravar_parquet_carga(df, schema_arrow, caminho):
+    """Grava o chunk tipado no schema da tabela (ArrowInvalid/ArrowTypeError se alguma coluna não converter)"""
+    tabela = pa.Table.from_pandas(df, schema=schema_arrow, preserve_index=False, safe=False)
+    pq.write_table(tabela, caminho, compression="snappy")
+
 def aplicar_tipos_no_df(df, tipos_detectados):
     """Aplica conversões de tipo no DataFrame"""
     df_converted = df.copy()
@@ -233,25 +272,55 @@ def aplicar_tipos_no_df(df, tipos_detectados):
                 df_converted[col] = pd.to_numeric(df_converted[col], errors='coerce').astype('float64')
             
             elif tipo == "DATE":
-                df_converted[col] = pd.to_datetime(df_converted[col], errors='coerce').dt.date
+                df_converted[col] = converter_datas(df_converted[col])[0].dt.date
             
             elif tipo == "DATETIME":
-                df_converted[col] = pd.to_datetime(df_converted[col], errors='coerce')
+                df_converted[col] = converter_datas(df_converted[col])[0]
             
-            else:  # STRING
-                df_converted[col] = df_converted[col].astype(str).replace(['nan', 'None', 'NaT'], None)
+            else:  # STRING (o dtype string mantém os nulos do parse como nulo)
+                df_converted[col] = df_converted[col].astype("string")
         
         except Exception as e:
             print(f"⚠️ Erro ao converter '{col}' para {tipo}: {e}. Usando STRING.")
-            df_converted[col] = df_converted[col].astype(str).replace(['nan', 'None', 'NaT'], None)
+            df_converted[col] = df_converted[col].astype("string")
     
     return df_converted
 
+def contar_linhas_csv():
+    """Total de registros do CSV e de onde veio a contagem, sem decodificar o arquivo em Python.
+
+    Ordem: metadados gravados pelo TRATA_DADOS (válidos só se o CSV não mudou depois),
+    rodapés do parquet tratado (se gravado depois do CSV) e, por último, uma varredura
+    binária das quebras de linha fora de aspas.
+    """
+    metadados = ler_metadados_csv(CSV_PATH)
+    if metadados is not None:
+        return metadados["registros"], "metadados"
+
+    arquivos_parquet = list(PARQUET_TRATADO_DIR.rglob("*.parquet")) if PARQUET_TRATADO_DIR.exists() else []
+    if arquivos_parquet and max(a.stat().st_mtime for a in arquivos_parquet) >= CSV_PATH.stat().st_mtime:
+        return contar_registros_parquet(PARQUET_TRATADO_DIR), "rodapés parquet"
+
+    return contar_registros_csv(CSV_PATH), "varredura binária"
+
 # ==================== IMPORTAÇÃO PRINCIPAL ==================== #
 
-def importar_csv_para_bigquery():
-    """Função principal de importação"""
+def importar_csv_para_bigquery(cliente=None, notificar=True):
+    """Função principal de importação.
+
+    cliente: client do BigQuery já criado (ex.: ClienteBigQueryFalso do BIGQUERY_FALSO);
+    notificar=False não envia os emails de conclusão/erro.
+    """
+    if not CSV_PATH.exists():
+        raise FileNotFoundError(f"CSV não encontrado: {CSV_PATH}")
+    if notificar and not EMAIL_ENV_PATH.exists():
+        raise FileNotFoundError(f".env de email não encontrado: {EMAIL_ENV_PATH}")
+
+    client = cliente or criar_cliente_bigquery()
+    medidor = MedidorEtapas()
+    contexto_log = {"tabela": f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}", "chunk_size": CHUNK_SIZE, "sucesso": False}
     inicio = datetime.now()
+    jobs_log = []
     
     print("=" * 70)
     print("IMPORTAÇÃO CSV → BIGQUERY")
@@ -260,13 +329,15 @@ def importar_csv_para_bigquery():
     
     try:
         # ========== 1. LEITURA E ANÁLISE DO CSV ========== #
+        registro = medidor.iniciar("1. amostra e tipos")
         print(f"📂 Lendo CSV: {CSV_PATH}")
         
         # Lê primeiras 10k linhas para detectar tipos
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
-            df_sample = pd.read_csv(CSV_PATH, nrows=10000, low_memory=False)
+            df_sample = pd.read_csv(CSV_PATH, nrows=10000, low_memory=False, **OPCOES_NULOS_PANDAS)
         print(f"✅ Amostra carregada: {len(df_sample):,} linhas, {len(df_sample.columns)} colunas")
+        registrar_saida(registro, df_sample)
         
         # Detecta tipos
         print("\n🔍 Detectando tipos de dados...")
@@ -277,14 +348,21 @@ def importar_csv_para_bigquery():
             print(f"  - {col}: {tipo}")
         
         # Conta total de linhas
+        registro = medidor.iniciar("1.1 contagem de linhas")
         print(f"\n📊 Contando linhas do arquivo...")
-        total_linhas = sum(1 for _ in open(CSV_PATH, encoding='utf-8')) - 1
-        print(f"ℹ️ Total de linhas: {total_linhas:,}")
-        
-        num_chunks = (total_linhas // CHUNK_SIZE) + 1
+        total_linhas, origem_contagem = contar_linhas_csv()
+        print(f"ℹ️ Total de linhas: {total_linhas:,} ({origem_contagem})")
+        registrar_saida(registro, linhas=total_linhas)
+        contexto_log["linhas"] = total_linhas
+        contexto_log["origem_contagem"] = origem_contagem
+        
+        # divisão arredondada para cima: sem chunk vazio no fim quando total_linhas é múltiplo de CHUNK_SIZE
+        num_chunks = -(-total_linhas // CHUNK_SIZE)
         print(f"📦 Serão processados {num_chunks} chunks de {CHUNK_SIZE:,} linhas")
+        contexto_log["chunks"] = num_chunks
         
         # ========== 2. PREPARAÇÃO BIGQUERY ========== #
+        medidor.iniciar("2. preparação bigquery")
         print(f"\n🔧 Preparando BigQuery...")
         
         # Cria dataset se não existir
@@ -315,9 +393,20 @@ def importar_csv_para_bigquery():
         print(f"✅ Tabela '{table_ref}' criada no BigQuery")
         
         # ========== 3. CACHE LOCAL ========== #
-        usar_cache = total_linhas > 1_000_000
+        usar_cache = total_linhas > LIMITE_LINHAS_CACHE and not CARGA_PARQUET_DIRETA
+        carga_parquet = total_linhas > LIMITE_LINHAS_CACHE and CARGA_PARQUET_DIRETA
+        contexto_log["usar_cache"] = usar_cache
+        contexto_log["carga_parquet_direta"] = carga_parquet
+        
+        if carga_parquet:
+            # Parquet tipado gravado pelos workers na pasta do cachê (um arquivo por chunk)
+            if CACHE_DIR.exists():
+                shutil.rmtree(CACHE_DIR)
+            CACHE_DIR.mkdir(exist_ok=True)
+            schema_arrow = gerar_schema_arrow(df_sample.columns, tipos_detectados)
         
         if usar_cache:
+            medidor.iniciar("3. cache local", linhas_entrada=total_linhas)
             print(f"\n💾 Criando cache local (arquivo grande: {total_linhas:,} linhas)")
             
             # Remove o cachê antigo
@@ -328,7 +417,7 @@ def importar_csv_para_bigquery():
             # Lê CSV em chunks e salva como parquet
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore")
-                reader = pd.read_csv(CSV_PATH, chunksize=CHUNK_SIZE, low_memory=False)
+                reader = pd.read_csv(CSV_PATH, chunksize=CHUNK_SIZE, low_memory=False, **OPCOES_NULOS_PANDAS)
             
             for i, chunk in enumerate(reader):
                 cache_file = CACHE_DIR / f"part-{i:05d}.parquet"
@@ -336,34 +425,41 @@ def importar_csv_para_bigquery():
                 print(f"  💾 Cache chunk {i+1}/{num_chunks} salvo")
             
             print("✅ Cache local criado")
-        
-        # ========== 4. PROCESSAMENTO PARALELO ========== #
+        else:
+            # Índice de offsets: cada chunk é lido direto da sua fatia do arquivo
+            registro = medidor.iniciar("3. índice de offsets", linhas_entrada=total_linhas)
+            print("\n🗂️ Indexando offsets dos chunks...")
+            cabecalho_csv, offsets_chunks, linhas_indexadas = indexar_csv(CSV_PATH, CHUNK_SIZE)
+            num_chunks = len(offsets_chunks)
+            contexto_log["chunks"] = num_chunks
+            print(f"✅ Índice criado: {num_chunks} chunk(s)")
+            registrar_saida(registro, linhas=linhas_indexadas)
+        
+        # ========== 4. PROCESSAMENTO + UPLOAD (PIPELINE) ========== #
         print(f"\nℹ️ A importação de {TABLE_ID} será feita em {total_linhas:,} linhas, divididas em {num_chunks} chunks")
         print("-" * 50)
         
-        # FASE 1: Processamento paralelo
-        print(f"🔄 FASE 1: Processamento paralelo de {num_chunks} chunk(s)...\n")
-        
-        from concurrent.futures import ThreadPoolExecutor, as_completed
+        # Os workers processam os próximos chunks enquanto os anteriores são enviados;
+        # só MAX_CHUNKS_EM_MEMORIA chunks ficam entre a leitura e a conclusão do load job
+        registro = medidor.iniciar("4. processamento + upload", linhas_entrada=total_linhas)
+        print(f"🔄 Pipeline: {WORKERS_PROCESSAMENTO} worker(s) de processamento, até {MAX_CHUNKS_EM_MEMORIA} chunk(s) em memória, "
+              f"até {MAX_JOBS_SIMULTANEOS} load job(s) simultâneo(s)\n")
         
-        chunks_processados = {}  # Dicionário para armazenar chunks processados: {idx: dataframe}
+        from concurrent.futures import ThreadPoolExecutor
         
         def processar_chunk(chunk_idx):
-            """Processa um chunk e retorna o DataFrame processado"""
-            barra_proc.write(f"➡️  Processando chunk {chunk_idx + 1}/{num_chunks}")
+            """Processa um chunk: {"linhas", "df", "arquivo"} (arquivo = parquet tipado na carga direta) ou None se vazio"""
+            barra.write(f"➡️  Processando chunk {chunk_idx + 1}/{num_chunks}")
             
             # Carrega chunk
             if usar_cache:
                 cache_file = CACHE_DIR / f"part-{chunk_idx:05d}.parquet"
                 df = pd.read_parquet(cache_file)
             else:
-                skiprows = chunk_idx * CHUNK_SIZE
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    df = pd.read_csv(CSV_PATH, skiprows=range(1, skiprows + 1), nrows=CHUNK_SIZE, low_memory=False)
+                inicio_chunk, fim_chunk = offsets_chunks[chunk_idx]
+                df = ler_chunk_csv(CSV_PATH, cabecalho_csv, inicio_chunk, fim_chunk, **OPCOES_NULOS_PANDAS)
             
             if df.empty:
-                barra_proc.write(f"⚠️ Chunk {chunk_idx + 1} vazio")
                 return chunk_idx, None
             
             # Normaliza colunas
@@ -372,116 +468,188 @@ def importar_csv_para_bigquery():
             # Aplica tipos
             df = aplicar_tipos_no_df(df, tipos_detectados)
             
-            # Normaliza nulos
-            df = normalizar_nulos(df)
+            barra.write(f"✅ Chunk {chunk_idx + 1}/{num_chunks} processado ({len(df):,} linhas)")
             
-            barra_proc.write(f"✅ Chunk {chunk_idx + 1}/{num_chunks} processado ({len(df):,} linhas)")
+            if carga_parquet:
+                # Grava uma vez no schema da tabela; o DataFrame sai da memória aqui
+                arquivo = CACHE_DIR / f"carga-{chunk_idx:05d}.parquet"
+                try:
+                    gravar_parquet_carga(df, schema_arrow, arquivo)
+                except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                    # Parquet fora do schema não sobe: o chunk vai direto para o fallback CSV
+                    barra.write(f"⚠️ Chunk {chunk_idx + 1} não converteu para o schema da tabela: {e}")
+                    return chunk_idx, {"linhas": len(df), "df": df, "arquivo": None, "erro": e}
+                return chunk_idx, {"linhas": len(df), "df": None, "arquivo": arquivo, "erro": None}
             
-            return chunk_idx, df
-        
-        # Barra de progresso para processamento
-        barra_proc = tqdm(
-            total=num_chunks,
-            desc="📊 Processando",
-            bar_format="{desc}: {bar} {percentage:3.0f}% ({n_fmt}/{total_fmt})",
-            ncols=70
-        )
+            return chunk_idx, {"linhas": len(df), "df": df, "arquivo": None, "erro": None}
         
-        # Executa processamento em paralelo (4 workers)
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            futures = {executor.submit(processar_chunk, i): i for i in range(num_chunks)}
+        def enviar_fallback_csv(chunk_idx, df):
+            """Reenvia o chunk como CSV (todas as colunas STRING) após erro no load do DataFrame"""
+            barra.write(f"⚠️ Erro no load do chunk {chunk_idx + 1}. Tentando fallback CSV...")
             
-            for future in as_completed(futures):
-                try:
-                    chunk_idx, df = future.result()
-                    chunks_processados[chunk_idx] = df
-                    barra_proc.update(1)
-                except Exception as e:
-                    barra_proc.close()
-                    print(f"\n❌ ERRO no processamento do chunk: {e}")
-                    raise
-        
-        barra_proc.close()
-        print(f"\n✅ Processamento paralelo concluído! {len(chunks_processados)} chunks prontos\n")
-        
-        # FASE 2: Upload sequencial
-        print("-" * 50)
-        print(f"📤 FASE 2: Upload sequencial para BigQuery...\n")
-        
-        barra_upload = tqdm(
-            total=num_chunks,
-            desc="📊 Enviando",
-            bar_format="{desc}: {bar} {percentage:3.0f}% ({n_fmt}/{total_fmt})",
-            ncols=70
-        )
-        
-        # Envia chunks na ordem (0, 1, 2, 3...)
-        for chunk_idx in range(num_chunks):
-            df = chunks_processados.get(chunk_idx)
+            # ========== FALLBACK CSV (caso dê erro) ========== #
+            for col in df.columns:
+                df[col] = df[col].astype("string")
             
-            if df is None:
-                barra_upload.write(f"⚠️ Chunk {chunk_idx + 1} vazio, pulando...")
-                barra_upload.update(1)
-                continue
+            # Recria tabela como STRING (apenas no primeiro chunk)
+            if chunk_idx == 0:
+                client.delete_table(table_ref, not_found_ok=True)
+                schema_string = [bigquery.SchemaField(col, "STRING") for col in df.columns]
+                table = bigquery.Table(table_ref, schema=schema_string)
+                client.create_table(table)
+                barra.write("♻️ Tabela recriada com tipos STRING para fallback")
             
-            try:
-                barra_upload.write(f"📤 Enviando chunk {chunk_idx + 1}/{num_chunks} para BigQuery...")
-                
+            # Salva como CSV temporário
+            with tempfile.NamedTemporaryFile(suffix=".csv", delete=False, mode='w', encoding='utf-8') as tmp:
+                temp_path = tmp.name
+            
+            salvar_csv_seguro(df, temp_path)
+            
+            # Upload CSV
+            with open(temp_path, "rb") as f:
                 job_config = bigquery.LoadJobConfig(
-                    write_disposition=bigquery.WriteDisposition.WRITE_APPEND
+                    source_format=bigquery.SourceFormat.CSV,
+                    skip_leading_rows=1,
+                    write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+                    allow_quoted_newlines=True,
+                    autodetect=False
                 )
                 
-                job = client.load_table_from_dataframe(
-                    df, table_ref, 
-                    job_config=job_config,
-                    location=LOCATION
-                )
+                job = client.load_table_from_file(f, table_ref, job_config=job_config, location=LOCATION)
                 job.result()
-                
-                barra_upload.write(f"✅ Chunk {chunk_idx + 1}/{num_chunks} enviado com sucesso ({len(df):,} linhas)")
             
+            os.remove(temp_path)
+            barra.write(f"✅ Chunk {chunk_idx + 1} enviado via CSV fallback")
+        
+        def submeter_chunk(chunk_idx, carga):
+            """Envia o chunk e cria o load job (WRITE_APPEND) sem esperar o fim dele"""
+            barra.write(f"📤 Enviando chunk {chunk_idx + 1}/{num_chunks} para BigQuery...")
+            pendente = {"chunk": chunk_idx, "carga": carga, "job": None, "erro": carga["erro"], "t_inicio": time.perf_counter()}
+            if pendente["erro"] is not None:
+                pendente["envio_s"] = 0.0
+                return pendente
+            try:
+                if carga["arquivo"] is not None:
+                    # Parquet já no schema da tabela: sobe o arquivo, sem passar pelo pandas
+                    job_config = bigquery.LoadJobConfig(
+                        source_format=bigquery.SourceFormat.PARQUET,
+                        write_disposition=bigquery.WriteDisposition.WRITE_APPEND
+                    )
+                    with open(carga["arquivo"], "rb") as f:
+                        pendente["job"] = client.load_table_from_file(f, table_ref, job_config=job_config, location=LOCATION)
+                else:
+                    job_config = bigquery.LoadJobConfig(
+                        write_disposition=bigquery.WriteDisposition.WRITE_APPEND
+                    )
+                    
+                    pendente["job"] = client.load_table_from_dataframe(
+                        carga["df"], table_ref, 
+                        job_config=job_config,
+                        location=LOCATION
+                    )
             except Exception as e:
-                barra_upload.write(f"⚠️ Erro no upload DataFrame. Tentando fallback CSV...")
-                
-                # ========== FALLBACK CSV (caso dê erro) ========== #
-                for col in df.columns:
-                    df[col] = df[col].astype(str).replace(['nan', 'None', 'NaT', '<NA>'], None)
-                
-                # Recria tabela como STRING (apenas no primeiro chunk)
-                if chunk_idx == 0:
-                    client.delete_table(table_ref, not_found_ok=True)
-                    schema_string = [bigquery.SchemaField(col, "STRING") for col in df.columns]
-                    table = bigquery.Table(table_ref, schema=schema_string)
-                    client.create_table(table)
-                    barra_upload.write("♻️ Tabela recriada com tipos STRING para fallback")
+                pendente["erro"] = e
+            pendente["envio_s"] = time.perf_counter() - pendente["t_inicio"]
+            return pendente
+        
+        def concluir_chunk(pendente):
+            """Espera o load job do chunk (fallback CSV se falhou) e registra o tempo dele"""
+            chunk_idx, carga = pendente["chunk"], pendente["carga"]
+            metodo = "parquet" if carga["arquivo"] is not None else "dataframe"
+            if pendente["erro"] is None:
+                try:
+                    pendente["job"].result()
+                except Exception as e:
+                    pendente["erro"] = e
+            if pendente["erro"] is not None:
+                metodo = "fallback csv"
+                df = carga["df"] if carga["df"] is not None else pd.read_parquet(carga["arquivo"])
+                enviar_fallback_csv(chunk_idx, df)
+            if carga["arquivo"] is not None:
+                carga["arquivo"].unlink(missing_ok=True)
+            
+            conclusao_s = time.perf_counter() - pendente["t_inicio"]
+            jobs_log.append({
+                "chunk": chunk_idx + 1,
+                "linhas": carga["linhas"],
+                "metodo": metodo,
+                "job_id": getattr(pendente["job"], "job_id", None),
+                "envio_s": round(pendente["envio_s"], 3),
+                "conclusao_s": round(conclusao_s, 3),
+                "erro": None if pendente["erro"] is None else str(pendente["erro"]),
+            })
+            if metodo != "fallback csv":
+                barra.write(f"✅ Chunk {chunk_idx + 1}/{num_chunks} enviado com sucesso via {metodo} "
+                            f"({carga['linhas']:,} linhas, envio {pendente['envio_s']:.1f}s, total {conclusao_s:.1f}s)")
+        
+        barra = tqdm(
+            total=num_chunks,
+            desc="📊 Importando",
+            bar_format="{desc}: {bar} {percentage:3.0f}% ({n_fmt}/{total_fmt})",
+            ncols=70
+        )
+        
+        em_andamento = {}  # {idx: future} dos chunks submetidos ao processamento e ainda não enviados
+        pendentes = deque()  # load jobs em andamento, na ordem dos chunks
+        proximo_chunk = 0
+        linhas_processadas = 0
+        espera_processamento_s = 0.0
+        tempo_upload_s = 0.0
+        
+        with ThreadPoolExecutor(max_workers=WORKERS_PROCESSAMENTO) as executor:
+            for chunk_idx in range(num_chunks):
+                # chunks em memória = em processamento/prontos + os que estão em load job
+                limite_janela = max(chunk_idx + 1, chunk_idx + MAX_CHUNKS_EM_MEMORIA - len(pendentes))
+                while proximo_chunk < min(num_chunks, limite_janela):
+                    em_andamento[proximo_chunk] = executor.submit(processar_chunk, proximo_chunk)
+                    proximo_chunk += 1
                 
-                # Salva como CSV temporário
-                with tempfile.NamedTemporaryFile(suffix=".csv", delete=False, mode='w', encoding='utf-8') as tmp:
-                    temp_path = tmp.name
+                t_espera = time.perf_counter()
+                try:
+                    _, carga = em_andamento.pop(chunk_idx).result()
+                except Exception as e:
+                    for future in em_andamento.values():
+                        future.cancel()
+                    barra.close()
+                    print(f"\n❌ ERRO no processamento do chunk {chunk_idx + 1}: {e}")
+                    raise
+                espera_processamento_s += time.perf_counter() - t_espera
                 
-                salvar_csv_seguro(df, temp_path)
+                if carga is None:
+                    barra.write(f"⚠️ Chunk {chunk_idx + 1} vazio, pulando...")
+                    barra.update(1)
+                    continue
                 
-                # Upload CSV
-                with open(temp_path, "rb") as f:
-                    job_config = bigquery.LoadJobConfig(
-                        source_format=bigquery.SourceFormat.CSV,
-                        skip_leading_rows=1,
-                        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
-                        allow_quoted_newlines=True,
-                        autodetect=False
-                    )
-                    
-                    job = client.load_table_from_file(f, table_ref, job_config=job_config, location=LOCATION)
-                    job.result()
+                linhas_processadas += carga["linhas"]
+                t_upload = time.perf_counter()
+                pendentes.append(submeter_chunk(chunk_idx, carga))
+                del carga
                 
-                os.remove(temp_path)
-                barra_upload.write(f"✅ Chunk {chunk_idx + 1} enviado via CSV fallback")
+                # O chunk 0 é confirmado antes dos demais: o fallback dele recria a tabela.
+                # Depois, até MAX_JOBS_SIMULTANEOS jobs (nunca acima de MAX_CHUNKS_EM_MEMORIA: chunk
+                # em load job ainda está em memória); a conclusão é conferida na ordem dos chunks
+                limite_jobs = 1 if chunk_idx == 0 else min(MAX_JOBS_SIMULTANEOS, MAX_CHUNKS_EM_MEMORIA)
+                while len(pendentes) >= limite_jobs:
+                    concluir_chunk(pendentes.popleft())
+                    barra.update(1)
+                tempo_upload_s += time.perf_counter() - t_upload
             
-            barra_upload.update(1)
-        
-        barra_upload.close()
+            t_upload = time.perf_counter()
+            while pendentes:
+                concluir_chunk(pendentes.popleft())
+                barra.update(1)
+            tempo_upload_s += time.perf_counter() - t_upload
+
+        barra.close()
+        registrar_saida(registro, linhas=linhas_processadas)
+        # espera alta = processamento é o gargalo; upload alto = envio é o gargalo
+        contexto_log["espera_processamento_s"] = round(espera_processamento_s, 3)
+        contexto_log["tempo_upload_s"] = round(tempo_upload_s, 3)
+        print(f"\n✅ Pipeline concluído: {linhas_processadas:,} linhas "
+              f"(espera por processamento {espera_processamento_s:.1f}s, upload {tempo_upload_s:.1f}s)")
         
         # ========== 5. FINALIZAÇÃO ========== #
+        medidor.encerrar()
         fim = datetime.now()
         duracao = fim - inicio
         
@@ -497,6 +665,11 @@ def importar_csv_para_bigquery():
         print(f"💾 Tamanho: {table_final.num_bytes / 1024 / 1024:.2f} MB")
         print(f"📍 Tabela: {table_ref}")
         print("-" * 50)
+        registro["linhas_saida"] = table_final.num_rows
+        contexto_log["sucesso"] = True
+        
+        if not notificar:
+            return True
         
         # Envia email de sucesso
         mensagem = f"""
@@ -525,6 +698,10 @@ def importar_csv_para_bigquery():
         print(f"❌ Erro: {e}")
         print("-" * 50)
         traceback.print_exc()
+        contexto_log["erro"] = str(e)
+        
+        if not notificar:
+            return False
         
         # Envia email de erro
         mensagem = f"""
@@ -543,6 +720,10 @@ def importar_csv_para_bigquery():
         return False
     
     finally:
+        medidor.salvar(ARQUIVO_LOG_IMPORTACAO, ARQUIVO_LOG_IMPORTACAO_ETAPAS, contexto=contexto_log)
+        if jobs_log:
+            pd.DataFrame(jobs_log).to_csv(ARQUIVO_LOG_IMPORTACAO_JOBS, index=False, encoding="utf-8-sig")
+        
         # Limpa cache
         if CACHE_DIR.exists():
             try:
@@ -0,0 +1,236 @@
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from LEITURA_CDR import hash_arquivo
+
+# ==============================
+# ÍNDICE PERSISTENTE DAS CHAVES JÁ PROCESSADAS
+# ==============================
+# Guarda em disco as chaves int64 (CallId + SeqNum, ver CHAVE_CDR) dos arquivos já
+# incorporados em execuções anteriores, para marcar ou descartar chave repetida
+# que chega em outro arquivo (export sobreposto, mesma hora enviada de novo).
+#
+# Cada segmento é um .npy com as chaves ordenadas (e, em paralelo, o id do arquivo
+# de origem de cada uma), lido por mmap, com um filtro de Bloom na frente: a maior
+# parte das chaves novas é descartada pelo filtro sem tocar no segmento, e só as
+# candidatas fazem a busca binária. Os segmentos são juntados por tamanho (o mais
+# novo entra no anterior enquanto for ao menos METADE dele), então ficam O(log n)
+# segmentos à medida que o histórico cresce.
+#
+# O manifesto registra os arquivos incorporados (nome -> id, tamanho/mtime e hash
+# do conteúdo). Arquivo com o mesmo conteúdo (ex.: só um touch) não é conferido de
+# novo; arquivo alterado ganha um id novo e as chaves da versão anterior deixam de
+# valer (nem contra ele mesmo nem contra os outros) e saem na próxima junção.
+VERSAO_INDICE = 2
+
+BITS_POR_CHAVE = 10    # ~1% de falso positivo com NUM_HASHES = 7
+NUM_HASHES = 7
+
+# chaves conferidas por vez (limita a memória dos hashes temporários)
+BLOCO_CONSULTA = 1_000_000
+
+_SEMENTE_H2 = np.uint64(0x9E3779B97F4A7C15)
+
+def _misturar(x: np.ndarray) -> np.ndarray:
+    """splitmix64: espalha os bits de cada chave (uint64, com estouro modular)"""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def _posicoes_bloom(chaves: np.ndarray, bits: int) -> np.ndarray:
+    """Matriz NUM_HASHES × n com as posições de cada chave no filtro (hash duplo)"""
+    x = chaves.astype("int64").view("uint64")
+    h1 = _misturar(x)
+    h2 = _misturar(x ^ _SEMENTE_H2) | np.uint64(1)
+    i = np.arange(NUM_HASHES, dtype="uint64")[:, None]
+    return (h1[None, :] + i * h2[None, :]) & np.uint64(bits - 1)
+
+def montar_bloom(chaves: np.ndarray) -> np.ndarray:
+    """Filtro de Bloom (palavras uint64, tamanho potência de 2) das chaves"""
+    bits = 1 << max(6, int(np.ceil(np.log2(max(len(chaves), 1) * BITS_POR_CHAVE))))
+    filtro = np.zeros(bits // 64, dtype="uint64")
+    for inicio in range(0, len(chaves), BLOCO_CONSULTA):
+        posicoes = _posicoes_bloom(chaves[inicio:inicio + BLOCO_CONSULTA], bits).ravel()
+        np.bitwise_or.at(filtro, posicoes >> np.uint64(6), np.uint64(1) << (posicoes & np.uint64(63)))
+    return filtro
+
+def consultar_bloom(filtro: np.ndarray, chaves: np.ndarray) -> np.ndarray:
+    """True onde a chave PODE estar no conjunto (False = certamente não está)"""
+    posicoes = _posicoes_bloom(chaves, len(filtro) * 64)
+    palavras = np.asarray(filtro[(posicoes >> np.uint64(6)).ravel()]).reshape(posicoes.shape)
+    return ((palavras >> (posicoes & np.uint64(63))) & np.uint64(1)).all(axis=0).astype(bool)
+
+def assinatura_arquivo(caminho: Path) -> str:
+    """Tamanho + mtime: identifica a versão do arquivo sem ler o conteúdo"""
+    stat = caminho.stat()
+    return f"{stat.st_size}:{stat.st_mtime}"
+
+class IndiceChaves:
+    """Índice em disco das chaves já processadas (segmentos ordenados com o arquivo de origem + filtro de Bloom)"""
+
+    def __init__(self, pasta: Path):
+        self.pasta = Path(pasta)
+        self.caminho_manifesto = self.pasta / "indice.json"
+        self.arquivos = {}    # nome -> {"id", "assinatura", "hash"}
+        self.segmentos = []   # [{"nome", "chaves"}], do mais antigo para o mais novo
+        self.removidos = set()   # ids de versões substituídas (chaves que não valem mais)
+        self.proximo_id = 0
+        self.pendentes = {}   # arquivo -> (versão, chaves) a gravar em salvar()
+        self._alterado = False
+        self._abertos = {}
+
+        try:
+            manifesto = json.loads(self.caminho_manifesto.read_text(encoding="utf-8"))
+            if manifesto.get("versao") == VERSAO_INDICE:
+                self.arquivos = manifesto["arquivos"]
+                self.segmentos = manifesto["segmentos"]
+                self.removidos = set(manifesto["removidos"])
+                self.proximo_id = manifesto["proximo_id"]
+        except (FileNotFoundError, ValueError):
+            pass
+
+    @property
+    def total_chaves(self) -> int:
+        return sum(s["chaves"] for s in self.segmentos)
+
+    def versao_arquivo(self, caminho: Path) -> dict:
+        """{"assinatura", "hash"} do arquivo; o hash só é calculado se tamanho/mtime mudaram"""
+        caminho = Path(caminho)
+        assinatura = assinatura_arquivo(caminho)
+        entrada = self.arquivos.get(caminho.name)
+        if entrada is not None and entrada["assinatura"] == assinatura:
+            return {"assinatura": assinatura, "hash": entrada["hash"]}
+        return {"assinatura": assinatura, "hash": hash_arquivo(caminho)}
+
+    def arquivo_incorporado(self, nome: str, versao: dict) -> bool:
+        """True se o arquivo já está no índice com o mesmo conteúdo (tamanho/mtime novos são só registrados)"""
+        entrada = self.arquivos.get(nome)
+        if entrada is None or entrada["hash"] != versao["hash"]:
+            return False
+        if entrada["assinatura"] != versao["assinatura"]:
+            entrada["assinatura"] = versao["assinatura"]
+            self._alterado = True
+        return True
+
+    def _segmento(self, nome: str):
+        """(chaves ordenadas, id do arquivo de cada chave, filtro de Bloom) do segmento, por mmap"""
+        if nome not in self._abertos:
+            self._abertos[nome] = tuple(
+                np.load(self.pasta / f"{nome}{sufixo}", mmap_mode="r")
+                for sufixo in (".npy", ".arquivos.npy", ".bloom.npy")
+            )
+        return self._abertos[nome]
+
+    def _ids_invalidos(self, ignorar=None) -> np.ndarray:
+        """Ids cujas chaves não contam: versões removidas, versões a substituir e o próprio arquivo conferido"""
+        invalidos = set(self.removidos)
+        for nome in list(self.pendentes) + ([ignorar] if ignorar else []):
+            if nome in self.arquivos:
+                invalidos.add(self.arquivos[nome]["id"])
+        return np.array(sorted(invalidos), dtype="int32")
+
+    def contem(self, chaves: np.ndarray, ignorar: str = None) -> np.ndarray:
+        """True para cada chave que já está em algum segmento gravado, vinda de uma versão
+        ainda válida de outro arquivo (ignorar = nome do arquivo conferido)"""
+        chaves = np.asarray(chaves, dtype="int64")
+        invalidos = self._ids_invalidos(ignorar)
+        vistas = np.zeros(len(chaves), dtype=bool)
+        for segmento in self.segmentos:
+            ordenadas, origens, filtro = self._segmento(segmento["nome"])
+            for inicio in range(0, len(chaves), BLOCO_CONSULTA):
+                bloco = slice(inicio, inicio + BLOCO_CONSULTA)
+                pendentes = np.flatnonzero(~vistas[bloco]) + inicio
+                candidatas = pendentes[consultar_bloom(filtro, chaves[pendentes])]
+                if len(candidatas) == 0:
+                    continue
+                # busca binária em ordem crescente: acesso sequencial às páginas do mmap
+                candidatas = candidatas[np.argsort(chaves[candidatas], kind="stable")]
+                de = np.searchsorted(ordenadas, chaves[candidatas], side="left")
+                ate = np.searchsorted(ordenadas, chaves[candidatas], side="right")
+                # a mesma chave pode ter vindo de mais de um arquivo: confere a origem de cada ocorrência
+                ocorrencias = ate - de
+                dona = np.repeat(candidatas, ocorrencias)
+                posicao = np.repeat(de - np.cumsum(ocorrencias) + ocorrencias, ocorrencias) + np.arange(ocorrencias.sum())
+                valida = ~np.isin(np.asarray(origens[posicao]), invalidos)
+                vistas[dona[valida]] = True
+        return vistas
+
+    def adicionar(self, nome: str, versao, chaves: np.ndarray):
+        """Registra as chaves da versão atual do arquivo (gravadas no próximo salvar; substituem as anteriores)"""
+        self.pendentes[nome] = (versao, np.asarray(chaves, dtype="int64"))
+
+    def _gravar_segmento(self, nome: str, chaves: np.ndarray, origens: np.ndarray):
+        for sufixo, dados in ((".npy", chaves), (".arquivos.npy", origens), (".bloom.npy", montar_bloom(chaves))):
+            temp = self.pasta / f"{nome}{sufixo}.tmp"
+            with open(temp, "wb") as f:
+                np.save(f, dados)
+            os.replace(temp, self.pasta / f"{nome}{sufixo}")
+
+    def _proximo_nome(self) -> str:
+        numeros = [int(s["nome"].split("-")[1]) for s in self.segmentos]
+        return f"segmento-{max(numeros, default=0) + 1:06d}"
+
+    def salvar(self) -> int:
+        """Grava as chaves pendentes como novo segmento, junta segmentos e atualiza o manifesto.
+
+        Retorna a quantidade de chaves gravadas no índice.
+        """
+        if not self.pendentes and not self._alterado:
+            return 0
+        self.pasta.mkdir(parents=True, exist_ok=True)
+
+        # cada arquivo pendente ganha um id novo; o da versão anterior deixa de valer
+        partes_chaves, partes_origens = [], []
+        for nome, (versao, chaves) in self.pendentes.items():
+            if nome in self.arquivos:
+                self.removidos.add(self.arquivos[nome]["id"])
+            self.arquivos[nome] = {"id": self.proximo_id, **(versao or {})}
+            chaves = np.unique(chaves)
+            partes_chaves.append(chaves)
+            partes_origens.append(np.full(len(chaves), self.proximo_id, dtype="int32"))
+            self.proximo_id += 1
+        self.pendentes = {}
+        self._alterado = False
+
+        chaves = np.concatenate(partes_chaves) if partes_chaves else np.array([], dtype="int64")
+        removidos = []
+        if len(chaves) > 0:
+            ordem = np.argsort(chaves, kind="stable")
+            novo = {"nome": self._proximo_nome(), "chaves": int(len(chaves))}
+            self._gravar_segmento(novo["nome"], chaves[ordem], np.concatenate(partes_origens)[ordem])
+            self.segmentos.append(novo)
+
+            # junção por tamanho: mantém O(log n) segmentos e descarta as chaves de versões substituídas
+            invalidos = np.array(sorted(self.removidos), dtype="int32")
+            while len(self.segmentos) > 1 and self.segmentos[-1]["chaves"] * 2 >= self.segmentos[-2]["chaves"]:
+                anterior, ultimo = self.segmentos[-2], self.segmentos[-1]
+                juntas = np.concatenate([self._segmento(anterior["nome"])[0], self._segmento(ultimo["nome"])[0]])
+                origens = np.concatenate([self._segmento(anterior["nome"])[1], self._segmento(ultimo["nome"])[1]])
+                validas = ~np.isin(origens, invalidos)
+                juntas, origens = juntas[validas], origens[validas]
+                ordem = np.argsort(juntas, kind="stable")
+                novo = {"nome": self._proximo_nome(), "chaves": int(len(juntas))}
+                self._gravar_segmento(novo["nome"], juntas[ordem], origens[ordem])
+                self.segmentos[-2:] = [novo]
+                removidos += [anterior["nome"], ultimo["nome"]]
+
+        # manifesto atômico: os segmentos antigos só saem depois de trocados no manifesto
+        manifesto = {
+            "versao": VERSAO_INDICE,
+            "arquivos": self.arquivos,
+            "removidos": sorted(self.removidos),
+            "proximo_id": self.proximo_id,
+            "segmentos": self.segmentos,
+        }
+        temp = self.caminho_manifesto.with_suffix(".tmp")
+        temp.write_text(json.dumps(manifesto, indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(temp, self.caminho_manifesto)
+
+        for nome in removidos:
+            self._abertos.pop(nome, None)
+            for sufixo in (".npy", ".arquivos.npy", ".bloom.npy"):
+                (self.pasta / f"{nome}{sufixo}").unlink(missing_ok=True)
+        return int(len(chaves))
@@ -0,0 +1,155 @@
+import io
+import json
+import os
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from INDICE_CHAVES import assinatura_arquivo
+
+# ==============================
+# ÍNDICE DE OFFSETS DO CSV (leitura direta de cada chunk)
+# ==============================
+# Uma passada binária pelo arquivo, em blocos, guarda o offset em bytes do fim
+# de cada chunk de registros. Um "\n" só encerra registro fora de aspas: a
+# paridade das aspas vistas até ali (aspas escapadas "" não mudam a paridade)
+# separa quebra de linha real de quebra dentro de campo. Com o índice, cada
+# worker lê só a sua fatia (seek + read), em vez de reler o arquivo desde o
+# início com skiprows, e o I/O total fica linear no tamanho do arquivo.
+BLOCO_LEITURA_BYTES = 16 * 1024 * 1024
+
+ASPAS = ord('"')
+QUEBRA = ord("\n")
+
+# Metadados gravados ao lado do CSV tratado (<arquivo>.meta.json): a contagem de
+# registros só vale enquanto o CSV tiver o tamanho/mtime registrados
+VERSAO_METADADOS = 1
+
+def _quebras_do_bloco(dados: bytes, dentro_aspas: int):
+    """(offsets no bloco das quebras fora de aspas, estado das aspas no fim do bloco)"""
+    arr = np.frombuffer(dados, dtype=np.uint8)
+    quebras = np.flatnonzero(arr == QUEBRA)
+    aspas = np.flatnonzero(arr == ASPAS)
+    if len(aspas) == 0:
+        return (quebras if dentro_aspas == 0 else quebras[:0]), dentro_aspas
+    # paridade das aspas antes de cada quebra (aspas escapadas "" somam 2)
+    antes = np.searchsorted(aspas, quebras)
+    return quebras[(antes + dentro_aspas) % 2 == 0], (len(aspas) + dentro_aspas) % 2
+
+def _varrer_quebras(caminho, bloco=BLOCO_LEITURA_BYTES):
+    """Gera, por bloco lido, os offsets absolutos das quebras que encerram registro (fora de aspas)"""
+    dentro_aspas = 0
+    posicao = 0
+    with open(caminho, "rb") as f:
+        while True:
+            dados = f.read(bloco)
+            if not dados:
+                break
+            quebras, dentro_aspas = _quebras_do_bloco(dados, dentro_aspas)
+            yield posicao + quebras
+            posicao += len(dados)
+
+def _termina_em_quebra(caminho) -> bool:
+    """True se o último byte do arquivo é "\n" (ou o arquivo está vazio)"""
+    with open(caminho, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+def contar_registros_csv(caminho, bloco=BLOCO_LEITURA_BYTES) -> int:
+    """Registros do CSV (sem o cabeçalho), sem decodificar o texto e sem contar quebras entre aspas"""
+    quebras = 0
+    dentro_aspas = 0
+    with open(caminho, "rb") as f:
+        while True:
+            dados = f.read(bloco)
+            if not dados:
+                break
+            if dentro_aspas == 0 and b'"' not in dados:
+                # bloco sem aspas (o caso comum): contagem direta em C
+                quebras += dados.count(b"\n")
+            else:
+                posicoes, dentro_aspas = _quebras_do_bloco(dados, dentro_aspas)
+                quebras += len(posicoes)
+    # último registro sem "\n" no fim do arquivo também conta
+    return max(quebras - 1 + (0 if _termina_em_quebra(caminho) else 1), 0)
+
+def indexar_csv(caminho, linhas_por_chunk, bloco=BLOCO_LEITURA_BYTES):
+    """(bytes do cabeçalho, [(início, fim)] em bytes de cada chunk, total de registros)"""
+    fins_chunk = []     # offset logo após o último registro de cada chunk completo
+    fim_cabecalho = None
+    quebras = 0         # quebras de registro vistas (a primeira fecha o cabeçalho)
+
+    for posicoes in _varrer_quebras(caminho, bloco):
+        # quebra número q (0 = cabeçalho) fecha o registro q; chunk c termina no registro (c + 1) × linhas_por_chunk
+        numeros = quebras + np.arange(len(posicoes))
+        if fim_cabecalho is None and len(posicoes):
+            fim_cabecalho = int(posicoes[0]) + 1
+        fechamentos = posicoes[(numeros > 0) & (numeros % linhas_por_chunk == 0)]
+        fins_chunk.extend((fechamentos + 1).tolist())
+        quebras += len(posicoes)
+
+    tamanho = Path(caminho).stat().st_size
+    if fim_cabecalho is None:
+        # arquivo vazio ou só com o cabeçalho (sem quebra final)
+        with open(caminho, "rb") as f:
+            return f.read(), [], 0
+
+    registros = quebras - 1 + (0 if _termina_em_quebra(caminho) else 1)
+    if tamanho > (fins_chunk[-1] if fins_chunk else fim_cabecalho):
+        fins_chunk.append(tamanho)
+    inicios = [fim_cabecalho] + fins_chunk[:-1]
+
+    with open(caminho, "rb") as f:
+        cabecalho = f.read(fim_cabecalho)
+    return cabecalho, list(zip(inicios, fins_chunk)), registros
+
+def ler_chunk_csv(caminho, cabecalho: bytes, inicio: int, fim: int, **opcoes) -> pd.DataFrame:
+    """Lê só os registros entre os offsets [inicio, fim) (com o cabeçalho na frente)"""
+    with open(caminho, "rb") as f:
+        f.seek(inicio)
+        dados = f.read(fim - inicio)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return pd.read_csv(io.BytesIO(cabecalho + dados), low_memory=False, **opcoes)
+
+# ==============================
+# CONTAGEM DE REGISTROS SEM VARRER O CSV
+# ==============================
+def caminho_metadados(caminho) -> Path:
+    caminho = Path(caminho)
+    return caminho.with_name(caminho.name + ".meta.json")
+
+def ler_metadados_csv(caminho):
+    """Metadados do CSV ({"registros", "colunas", ...}) ou None se ausentes ou desatualizados"""
+    try:
+        metadados = json.loads(caminho_metadados(caminho).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+    if metadados.get("versao") != VERSAO_METADADOS or not Path(caminho).exists():
+        return None
+    if metadados.get("assinatura") != assinatura_arquivo(Path(caminho)):
+        return None
+    return metadados
+
+def salvar_metadados_csv(caminho, registros: int, colunas):
+    """Grava a contagem de registros ao lado do CSV recém-gravado (assinatura do arquivo atual)"""
+    destino = caminho_metadados(caminho)
+    metadados = {
+        "versao": VERSAO_METADADOS,
+        "registros": int(registros),
+        "colunas": [str(c) for c in colunas],
+        "assinatura": assinatura_arquivo(Path(caminho)),
+    }
+    temp = destino.with_suffix(".tmp")
+    temp.write_text(json.dumps(metadados, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(temp, destino)
+
+def contar_registros_parquet(pasta) -> int:
+    """Soma das linhas dos rodapés dos arquivos parquet da pasta (sem ler os dados)"""
+    return sum(pq.read_metadata(arquivo).num_rows for arquivo in Path(pasta).rglob("*.parquet"))
@@ -0,0 +1,169 @@
+import cProfile
+import datetime
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+import psutil
+
+# ==============================
+# INSTRUMENTAÇÃO POR ETAPA
+# ==============================
+# Cada etapa registra tempo de relógio, CPU (do processo e dos workers já
+# encerrados), linhas de entrada/saída, pico de RSS (processo + filhos,
+# amostrado em segundo plano) e memória do DataFrame de saída.
+INTERVALO_AMOSTRA_RSS = 0.05  # segundos
+
+def rss_mb(processo: psutil.Process) -> float:
+    """RSS do processo somado ao dos processos filhos (workers de leitura), em MB"""
+    total = processo.memory_info().rss
+    for filho in processo.children(recursive=True):
+        try:
+            total += filho.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / 1024 ** 2
+
+def cpu_segundos(processo: psutil.Process) -> float:
+    """CPU usada pelo processo e pelos filhos já encerrados (usuário + sistema)"""
+    t = processo.cpu_times()
+    return t.user + t.system + t.children_user + t.children_system
+
+def memoria_frame_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+class _MonitorRSS:
+    """Amostra o RSS em uma thread enquanto a etapa roda e guarda o maior valor"""
+
+    def __init__(self, processo: psutil.Process):
+        self.processo = processo
+        self.pico = rss_mb(processo)
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+
+    def _amostrar(self):
+        while not self._parar.wait(INTERVALO_AMOSTRA_RSS):
+            try:
+                self.pico = max(self.pico, rss_mb(self.processo))
+            except psutil.Error:
+                pass
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._thread.join()
+        self.pico = max(self.pico, rss_mb(self.processo))
+
+class MedidorEtapas:
+    """Registra as métricas de cada etapa; perfilar=True (ou lista de nomes) grava um cProfile por etapa.
+
+    Uso sequencial, como as seções numeradas: iniciar() abre uma etapa e encerra
+    a anterior; encerrar() fecha a última. Para um bloco isolado, use etapa().
+    """
+
+    def __init__(self, perfilar=False, pasta_perfis: Path = None):
+        self.processo = psutil.Process()
+        self.perfilar = perfilar
+        self.pasta_perfis = pasta_perfis
+        self.etapas = []
+        self.inicio = datetime.datetime.now()
+        self._t_inicio = time.perf_counter()
+        self._aberta = None
+
+    def _deve_perfilar(self, nome) -> bool:
+        if isinstance(self.perfilar, bool):
+            return self.perfilar
+        return nome in self.perfilar
+
+    def iniciar(self, nome: str, linhas_entrada=None) -> dict:
+        """Abre uma etapa (encerrando a anterior); o registro recebe a saída com registrar_saida"""
+        self.encerrar()
+        registro = {
+            "etapa": nome,
+            "linhas_entrada": linhas_entrada,
+            "linhas_saida": None,
+            "memoria_frame_mb": None,
+        }
+        perfil = cProfile.Profile() if self._deve_perfilar(nome) else None
+        monitor = _MonitorRSS(self.processo).__enter__()
+        self._aberta = {
+            "registro": registro,
+            "perfil": perfil,
+            "monitor": monitor,
+            "cpu_inicio": cpu_segundos(self.processo),
+            "rss_inicio": rss_mb(self.processo),
+            "t_inicio": time.perf_counter(),
+        }
+        if perfil is not None:
+            perfil.enable()
+        return registro
+
+    def encerrar(self):
+        """Fecha a etapa aberta (se houver) e guarda suas métricas"""
+        if self._aberta is None:
+            return
+        aberta, self._aberta = self._aberta, None
+        registro, perfil, monitor = aberta["registro"], aberta["perfil"], aberta["monitor"]
+        if perfil is not None:
+            perfil.disable()
+        monitor.__exit__(None, None, None)
+
+        registro["tempo_s"] = round(time.perf_counter() - aberta["t_inicio"], 3)
+        registro["cpu_s"] = round(cpu_segundos(self.processo) - aberta["cpu_inicio"], 3)
+        registro["rss_inicio_mb"] = round(aberta["rss_inicio"], 1)
+        registro["rss_fim_mb"] = round(rss_mb(self.processo), 1)
+        registro["rss_pico_mb"] = round(monitor.pico, 1)
+
+        if perfil is not None and self.pasta_perfis is not None:
+            self.pasta_perfis.mkdir(parents=True, exist_ok=True)
+            nome_arquivo = re.sub(r"\W+", "_", registro["etapa"]).strip("_").lower()
+            caminho = self.pasta_perfis / f"{len(self.etapas) + 1:02d}_{nome_arquivo}.prof"
+            perfil.dump_stats(caminho)
+            registro["perfil"] = caminho.name
+
+        self.etapas.append(registro)
+
+    @contextmanager
+    def etapa(self, nome: str, linhas_entrada=None):
+        registro = self.iniciar(nome, linhas_entrada)
+        try:
+            yield registro
+        finally:
+            self.encerrar()
+
+    def tabela(self) -> pd.DataFrame:
+        colunas = [
+            "etapa", "tempo_s", "cpu_s", "linhas_entrada", "linhas_saida",
+            "rss_inicio_mb", "rss_fim_mb", "rss_pico_mb", "memoria_frame_mb",
+        ]
+        df = pd.DataFrame(self.etapas)
+        return df.reindex(columns=colunas + [c for c in df.columns if c not in colunas])
+
+    def salvar(self, caminho_json: Path, caminho_csv: Path, contexto=None):
+        """Grava o log da execução (JSON com contexto + etapas, CSV só com as etapas)"""
+        self.encerrar()
+        log = {
+            "inicio": self.inicio.isoformat(timespec="seconds"),
+            "fim": datetime.datetime.now().isoformat(timespec="seconds"),
+            "tempo_total_s": round(time.perf_counter() - self._t_inicio, 3),
+            "rss_pico_mb": max((e["rss_pico_mb"] for e in self.etapas), default=None),
+            **(contexto or {}),
+            "etapas": self.etapas,
+        }
+        caminho_json.write_text(json.dumps(log, indent=2, ensure_ascii=False, default=str), encoding="utf-8")
+        self.tabela().to_csv(caminho_csv, index=False, encoding="utf-8-sig")
+
+def registrar_saida(registro: dict, df: pd.DataFrame = None, linhas=None):
+    """Anota no registro da etapa as linhas de saída e a memória do DataFrame resultante"""
+    if df is not None:
+        registro["linhas_saida"] = len(df)
+        registro["memoria_frame_mb"] = round(memoria_frame_mb(df), 2)
+    if linhas is not None:
+        registro["linhas_saida"] = linhas
@@ -0,0 +1,495 @@
+import os
+import csv
+import json
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+pd.set_option("future.no_silent_downcasting", True)
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+# ==============================
+# COLUNAS DO CDR (layout Aspect, sem cabeçalho, separado por ';')
+# ==============================
+COLUNAS = [
+    "CallStartDt",
+    "SeqNum",
+    "CallId",
+    "DetectionDt",
+    "AnswerDt",
+    "WrapEndDt",
+    "CallInsertDt",
+    "CallEndDt",
+    "TimePhoneStartingRinging",
+    "DialedNum",
+    "Disp_c",
+    "Disposition_Desc",
+    "ResourceGroupDesc"
+]
+
+COLUNAS_DATETIME = [
+    "CallStartDt",
+    "DetectionDt",
+    "AnswerDt",
+    "WrapEndDt",
+    "CallInsertDt",
+    "CallEndDt",
+    "TimePhoneStartingRinging"
+]
+
+# Incrementar sempre que a leitura/tipagem mudar, para invalidar o cache antigo
+VERSAO_CACHE = 6
+
+# Política única de nulos: campos com exatamente um destes textos viram nulo.
+# Aplicada na leitura (aqui e no IMPORTADOR_BQ), nunca como replace no DataFrame.
+TOKENS_NULOS = [
+    "", " ",
+    "NULL", "null",
+    "None", "none", "NONE",
+    "NaN", "nan", "NAN",
+    "NaT", "nat", "NAT",
+    "<NA>",
+]
+
+# Mesma política para pd.read_csv (sem os nulos padrão do pandas, como "N/A")
+OPCOES_NULOS_PANDAS = {"keep_default_na": False, "na_values": TOKENS_NULOS}
+
+# Leitores disponíveis: "pandas" (motor C do pandas) ou "arrow" (pyarrow.csv, já tipado)
+LEITORES = ("pandas", "arrow")
+
+# Tipos finais da leitura Arrow (cast após a política de nulos); as demais colunas são string
+# (sem inferência: DialedNum/Disp_c não podem perder zeros à esquerda)
+TIPOS_ARROW = {col: pa.string() for col in COLUNAS}
+TIPOS_ARROW.update({col: pa.timestamp("ns") for col in COLUNAS_DATETIME})
+TIPOS_ARROW.update({"SeqNum": pa.int64(), "CallId": pa.int64()})
+
+COLUNAS_INTEIRAS = ["SeqNum", "CallId"]
+
+# Formatos aceitos nas colunas de data, em ordem de preferência: o formato é
+# detectado uma vez (sobre uma amostra) e aplicado explicitamente à coluna inteira
+FORMATOS_DATA = [
+    "ISO8601",                 # padrão do Aspect: 2025-07-29 08:08:36.867
+    "%d/%m/%Y %H:%M:%S.%f",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+]
+
+# Formatos strptime: converte só os valores distintos (e replica) quando eles são
+# no máximo esta fração das linhas. ISO8601 vai direto ao parser C do pandas, que
+# é mais rápido que qualquer memoização (~0,13s contra ~0,5s por milhão de linhas)
+LIMITE_DISTINTOS_MEMO = 0.5
+
+# Formato com fração -> formato do texto até o segundo: a memoização é sobre o
+# texto até o segundo (com milissegundos quase tudo é distinto) e a fração volta
+# somada em nanossegundos
+FORMATOS_COM_FRACAO = {
+    "%d/%m/%Y %H:%M:%S.%f": "%d/%m/%Y %H:%M:%S",
+}
+
+# Conversão Arrow -> pandas mantendo inteiros nulos e strings em memória Arrow
+MAPA_TIPOS_PANDAS = {
+    pa.int64(): pd.Int64Dtype(),
+    pa.string(): pd.StringDtype("pyarrow"),
+    pa.large_string(): pd.StringDtype("pyarrow"),
+}
+
+# ==============================
+# DATAS
+# ==============================
+def detectar_formato_data(valores, tamanho_amostra=1000) -> str:
+    """Primeiro formato de FORMATOS_DATA que converte a amostra inteira (ou o que converte mais)"""
+    amostra = pd.Series(valores).dropna().head(tamanho_amostra).astype(str).to_numpy(dtype=object)
+    if len(amostra) == 0:
+        return FORMATOS_DATA[0]
+
+    melhor, melhor_convertidos = FORMATOS_DATA[0], -1
+    for formato in FORMATOS_DATA:
+        convertidos = pd.to_datetime(amostra, format=formato, errors="coerce").notna().sum()
+        if convertidos == len(amostra):
+            return formato
+        if convertidos > melhor_convertidos:
+            melhor, melhor_convertidos = formato, convertidos
+    return melhor
+
+def _separar_fracao(serie: pd.Series):
+    """Texto até o segundo e fração em nanossegundos (pyarrow, sem laço em Python).
+
+    Retorna (prefixos, nanos, fracao_valida): fracao_valida é falso quando falta
+    o '.' ou a parte depois dele não tem de 1 a 9 dígitos.
+    """
+    texto = pa.array(serie, type=pa.string(), from_pandas=True)
+    partes = pc.extract_regex(texto, r"^(?P<prefixo>[^.]*)\.(?P<fracao>[0-9]{1,9})$")
+    fracao_valida = pc.fill_null(pc.is_valid(partes), False)
+    # sem fração válida o prefixo fica nulo e a linha sai NaT
+    prefixos = pc.struct_field(partes, "prefixo")
+    nanos = pc.cast(pc.utf8_rpad(pc.struct_field(partes, "fracao"), 9, "0"), pa.int64())
+    return prefixos, pc.fill_null(nanos, 0).to_numpy(), fracao_valida.to_numpy(zero_copy_only=False)
+
+def _converter_memo(valores: pa.Array, formato: str) -> np.ndarray:
+    """Converte cada valor distinto uma vez e replica pelos códigos (nulo -> NaT)"""
+    codificado = pc.dictionary_encode(valores)
+    codigos = pc.fill_null(codificado.indices, -1).to_numpy()
+    distintos = codificado.dictionary.to_numpy(zero_copy_only=False)
+    convertidos = pd.to_datetime(distintos, format=formato, errors="coerce")
+    # código -1 (nulo) cai no NaT acrescentado no fim
+    tabela = np.append(convertidos.to_numpy(dtype="datetime64[ns]"), np.datetime64("NaT", "ns"))
+    return tabela[codigos]
+
+def _proporcao_distintos(valores: pa.Array, tamanho_amostra=10_000) -> float:
+    amostra = pc.drop_null(valores.slice(0, tamanho_amostra))
+    return len(pc.unique(amostra)) / len(amostra) if len(amostra) else 1.0
+
+def converter_datas(serie: pd.Series, formato=None):
+    """Converte texto em datetime64[ns] com formato explícito, tolerante a valores inválidos.
+
+    Retorna (serie_convertida, formato, invalidos): invalidos traz o texto original
+    das linhas preenchidas que não converteram (índice preservado).
+    """
+    if formato is None:
+        formato = detectar_formato_data(serie)
+
+    preenchidos = serie.notna().to_numpy()
+
+    valores = None
+    if formato in FORMATOS_COM_FRACAO:
+        # Memo sobre o texto até o segundo; a fração volta por soma vetorial
+        prefixos, nanos, fracao_valida = _separar_fracao(serie)
+        if _proporcao_distintos(prefixos) <= LIMITE_DISTINTOS_MEMO:
+            valores = _converter_memo(prefixos, FORMATOS_COM_FRACAO[formato]) + nanos.astype("timedelta64[ns]")
+            valores[~fracao_valida] = np.datetime64("NaT", "ns")
+    elif formato != "ISO8601":
+        texto = pa.array(serie, type=pa.string(), from_pandas=True)
+        if _proporcao_distintos(texto) <= LIMITE_DISTINTOS_MEMO:
+            valores = _converter_memo(texto, formato)
+    if valores is None:
+        valores = pd.to_datetime(serie, format=formato, errors="coerce").to_numpy(dtype="datetime64[ns]")
+
+    convertida = pd.Series(valores, index=serie.index, name=serie.name)
+    invalidos = serie[preenchidos & np.isnat(valores)]
+    return convertida, formato, invalidos
+
+def somar_datas_invalidas(acumulado: dict, novo: dict, max_exemplos=3) -> dict:
+    """Soma os registros de datas inválidas ({coluna: {"linhas", "exemplos"}}) de dois arquivos/lotes"""
+    resultado = {col: dict(info) for col, info in acumulado.items()}
+    for col, info in novo.items():
+        atual = resultado.setdefault(col, {"linhas": 0, "exemplos": []})
+        atual["linhas"] += info["linhas"]
+        atual["exemplos"] = (atual["exemplos"] + info["exemplos"])[:max_exemplos]
+    return resultado
+
+# ==============================
+# TIPAGEM
+# ==============================
+def tipar_cdr(df: pd.DataFrame):
+    """Converte as colunas de data e os identificadores que ainda estão como texto.
+
+    Retorna (df, datas_invalidas), com datas_invalidas = {coluna: {"linhas", "exemplos"}}.
+    """
+    datas_invalidas = {}
+    formato = None
+    for col in COLUNAS_DATETIME:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            continue
+        # o formato detectado na primeira coluna vale para as demais
+        df[col], formato, invalidos = converter_datas(df[col], formato)
+        if len(invalidos):
+            datas_invalidas[col] = {"linhas": len(invalidos), "exemplos": invalidos.astype(str).head(3).tolist()}
+
+    # Identificadores inteiros (Int64 aceita nulo); valores fracionados viram nulo
+    for col in COLUNAS_INTEIRAS:
+        if pd.api.types.is_integer_dtype(df[col]):
+            continue
+        numerico = pd.to_numeric(df[col], errors="coerce")
+        df[col] = numerico.where(numerico % 1 == 0).astype("Int64")
+    return df, datas_invalidas
+
+# ==============================
+# LEITURA DE UM ARQUIVO
+# ==============================
+def _ler_csv_pandas(arquivo: Path):
+    """Leitura com o motor C do pandas (tudo string, nulos no parse, tipagem depois)"""
+    df = pd.read_csv(
+        arquivo,
+        sep=";",
+        header=None,
+        names=COLUNAS,
+        encoding="utf-8",
+        dtype=str,
+        low_memory=False,
+        on_bad_lines="skip",
+        **OPCOES_NULOS_PANDAS
+    )
+
+    df = df.dropna(how="all")
+
+    # filtra linhas sem CallStartDt
+    df = df[df["CallStartDt"].notna()]
+
+    # O pandas descarta linhas ruins e converte os nulos sem informar quantos foram
+    df, datas_invalidas = tipar_cdr(df.copy())
+    return df, {"linhas_malformadas": None, "linhas_incompletas": None, "tokens_nulos": None,
+                "datas_invalidas": datas_invalidas}
+
+def contar_tokens_nulos(tabela: pa.Table):
+    """Aplica TOKENS_NULOS a uma tabela só de texto. Retorna (tabela, ocorrências por token)"""
+    tokens = pa.array(TOKENS_NULOS)
+    contagem = dict.fromkeys(TOKENS_NULOS, 0)
+    colunas = []
+
+    for nome in tabela.column_names:
+        coluna = tabela[nome]
+        eh_nulo = pc.is_in(coluna, value_set=tokens)
+        nulos = coluna.filter(eh_nulo)
+        if len(nulos):
+            # value_counts só sobre os campos nulos: poucos valores distintos
+            for item in pc.value_counts(nulos).to_pylist():
+                contagem[item["values"]] += item["counts"]
+            coluna = pc.if_else(eh_nulo, pa.scalar(None, pa.string()), coluna)
+        colunas.append(coluna)
+
+    return pa.table(colunas, names=tabela.column_names), contagem
+
+def _linhas_curtas_em_ordem(arquivo: Path, tabela: pa.Table, curtas: list):
+    """Devolve a tabela com as linhas de campos a menos completadas com nulos, na posição do arquivo.
+
+    O invalid_row_handler não informa o número da linha: uma passada por linha
+    (sem separar campos) acha a posição de cada linha curta. Se a contagem não
+    bater com a da leitura (ex.: ';' entre aspas), as linhas curtas vão para o fim.
+    """
+    linhas = pv.read_csv(
+        arquivo,
+        read_options=pv.ReadOptions(column_names=["linha"], encoding="utf8"),
+        parse_options=pv.ParseOptions(delimiter="\x1f", quote_char=False),
+        convert_options=pv.ConvertOptions(column_types={"linha": pa.string()}, strings_can_be_null=False)
+    )["linha"]
+    campos = pc.add(pc.count_substring(linhas, ";"), 1).to_numpy()
+    mantidas = campos[campos <= len(COLUNAS)]
+    textos_curtos = linhas.filter(pa.array(campos < len(COLUNAS))).to_pylist()
+    posicoes = None
+    if len(mantidas) == tabela.num_rows + len(curtas) and len(textos_curtos) == len(curtas):
+        curtas = textos_curtos
+        eh_curta = mantidas < len(COLUNAS)
+        # concatenada = [linhas completas..., linhas curtas...] -> ordem do arquivo
+        posicoes = np.empty(len(mantidas), dtype="int64")
+        posicoes[~eh_curta] = np.arange(tabela.num_rows)
+        posicoes[eh_curta] = tabela.num_rows + np.arange(len(curtas))
+
+    # Campos como o pandas separa (com aspas); os que faltam ficam nulos
+    registros = [campos_linha + [None] * (len(COLUNAS) - len(campos_linha))
+                 for campos_linha in csv.reader(curtas, delimiter=";")]
+    tabela_curtas = pa.table(
+        [pa.array([r[i] for r in registros], type=pa.string()) for i in range(len(COLUNAS))],
+        names=COLUNAS
+    )
+    tabela = pa.concat_tables([tabela, tabela_curtas])
+    return tabela if posicoes is None else tabela.take(pa.array(posicoes))
+
+def _ler_tabela_arrow(arquivo: Path):
+    """Lê o CSV com pyarrow, tudo como texto bruto.
+
+    Como o leitor pandas, pula (e conta) linhas com campos a mais e mantém as com
+    campos a menos, completadas com nulos. Retorna (tabela, malformadas, incompletas).
+    """
+    malformadas = [0]
+    curtas = []
+
+    def tratar_linha_invalida(linha):
+        if linha.actual_columns < linha.expected_columns:
+            curtas.append(linha.text)
+        else:
+            malformadas[0] += 1
+        return "skip"
+
+    tabela = pv.read_csv(
+        arquivo,
+        read_options=pv.ReadOptions(column_names=COLUNAS, encoding="utf8"),
+        parse_options=pv.ParseOptions(delimiter=";", invalid_row_handler=tratar_linha_invalida),
+        # Nulos ficam para contar_tokens_nulos, que conta cada token
+        convert_options=pv.ConvertOptions(
+            column_types={col: pa.string() for col in COLUNAS},
+            strings_can_be_null=False
+        )
+    )
+    if curtas:
+        tabela = _linhas_curtas_em_ordem(arquivo, tabela, curtas)
+    return tabela, malformadas[0], len(curtas)
+
+def _ler_csv_arrow(arquivo: Path):
+    """Leitura com pyarrow: nulos contados no parse, datas e inteiros tipados no Arrow, strings em memória Arrow"""
+    tabela, malformadas, incompletas = _ler_tabela_arrow(arquivo)
+    tabela, tokens_nulos = contar_tokens_nulos(tabela)
+    tabela = tabela.filter(pc.is_valid(tabela["CallStartDt"]))
+
+    # Cast no Arrow coluna a coluna (o mais rápido quando tudo é ISO8601 válido);
+    # a coluna com algum valor que não converte (ex.: data inválida) fica como
+    # texto e passa pela tipagem tolerante, que anula e reporta só esses valores
+    for col in COLUNAS_DATETIME + COLUNAS_INTEIRAS:
+        try:
+            tipada = pc.cast(tabela[col], TIPOS_ARROW[col])
+        except pa.ArrowInvalid:
+            continue
+        tabela = tabela.set_column(tabela.schema.get_field_index(col), col, tipada)
+
+    df, datas_invalidas = tipar_cdr(tabela.to_pandas(types_mapper=MAPA_TIPOS_PANDAS.get))
+    return df, {"linhas_malformadas": malformadas, "linhas_incompletas": incompletas,
+                "tokens_nulos": tokens_nulos, "datas_invalidas": datas_invalidas}
+
+def ler_parquet_cdr(caminho: Path) -> pd.DataFrame:
+    """Lê um parquet do cache mantendo Int64 e strings em memória Arrow"""
+    # ignore_metadata: os metadados do pandas trariam as strings de volta como string[python]
+    return pq.read_table(caminho).to_pandas(types_mapper=MAPA_TIPOS_PANDAS.get, ignore_metadata=True)
+
+def ler_arquivo_cdr(arquivo: Path, leitor="pandas"):
+    """Lê, limpa e tipa um arquivo horário do Aspect.
+
+    Retorna (nome, df, erro, diagnostico), com diagnostico = {"linhas_malformadas",
+    "linhas_incompletas", "tokens_nulos", "datas_invalidas"}; as contagens que o leitor não informa
+    (pandas) vêm como None.
+    """
+    try:
+        if leitor == "arrow":
+            df, diagnostico = _ler_csv_arrow(arquivo)
+        else:
+            df, diagnostico = _ler_csv_pandas(arquivo)
+
+        return arquivo.name, df, None, diagnostico
+
+    except Exception as e:
+        return arquivo.name, None, str(e), None
+
+# ==============================
+# LEITURA DE VÁRIOS ARQUIVOS (pool de processos)
+# ==============================
+def ler_arquivos_cdr(arquivos, num_workers=None, leitor="pandas"):
+    """Lê os arquivos em paralelo e devolve os resultados de ler_arquivo_cdr na ordem de entrada"""
+    arquivos = list(arquivos)
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    num_workers = max(1, min(num_workers, len(arquivos)))
+
+    leitores = [leitor] * len(arquivos)
+
+    # Sem ganho em abrir processos para um único arquivo/worker
+    if num_workers == 1:
+        yield from map(ler_arquivo_cdr, arquivos, leitores)
+        return
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        # Janela limitada de leituras adiantadas: executor.map submeteria todos os
+        # arquivos de uma vez e os resultados prontos ficariam acumulados em memória
+        # enquanto o consumidor ainda trata os primeiros (importa no modo streaming).
+        # A fila preserva a ordem dos arquivos, independente de qual termina antes.
+        pendentes = deque()
+        for arquivo, leitor_arquivo in zip(arquivos, leitores):
+            pendentes.append(executor.submit(ler_arquivo_cdr, arquivo, leitor_arquivo))
+            if len(pendentes) >= num_workers * 2:
+                yield pendentes.popleft().result()
+        while pendentes:
+            yield pendentes.popleft().result()
+
+# ==============================
+# LEITURA INCREMENTAL (manifesto + cache parquet por arquivo)
+# ==============================
+def hash_arquivo(arquivo: Path, bloco=1024 * 1024) -> str:
+    """Hash do conteúdo do arquivo (sha256)"""
+    h = hashlib.sha256()
+    with open(arquivo, "rb") as f:
+        while True:
+            dados = f.read(bloco)
+            if not dados:
+                break
+            h.update(dados)
+    return h.hexdigest()
+
+def carregar_manifesto(caminho: Path) -> dict:
+    """Carrega o manifesto; versão diferente (ou arquivo corrompido) descarta o cache"""
+    try:
+        manifesto = json.loads(caminho.read_text(encoding="utf-8"))
+        if manifesto.get("versao") == VERSAO_CACHE:
+            return manifesto
+    except (FileNotFoundError, ValueError):
+        pass
+    return {"versao": VERSAO_CACHE, "arquivos": {}}
+
+def salvar_manifesto(manifesto: dict, caminho: Path):
+    """Grava o manifesto de forma atômica"""
+    temp = caminho.with_suffix(".tmp")
+    temp.write_text(json.dumps(manifesto, indent=2, ensure_ascii=False), encoding="utf-8")
+    os.replace(temp, caminho)
+
+def ler_arquivos_incremental(arquivos, pasta_cache: Path, num_workers=None, leitor="pandas"):
+    """Lê só arquivos novos/alterados e reaproveita o cache dos demais.
+
+    Devolve (nome, df, erro, diagnostico, origem) na ordem de entrada,
+    com origem "cache" ou "leitura".
+    """
+    arquivos = list(arquivos)
+    pasta_cache.mkdir(parents=True, exist_ok=True)
+    caminho_manifesto = pasta_cache / "manifesto.json"
+    manifesto = carregar_manifesto(caminho_manifesto)
+    entradas = manifesto["arquivos"]
+
+    # Classifica cada arquivo: tamanho+mtime iguais dispensam o hash;
+    # se mudaram, o hash decide (ex.: arquivo copiado de novo com o mesmo conteúdo)
+    info = {}
+    para_ler = []
+    for arquivo in arquivos:
+        chave = str(arquivo.resolve())
+        stat = arquivo.stat()
+        entrada = entradas.get(chave)
+        cache_ok = (
+            entrada is not None
+            and entrada.get("leitor") == leitor
+            and (pasta_cache / entrada["cache"]).exists()
+        )
+
+        if cache_ok and entrada["tamanho"] == stat.st_size and entrada["mtime"] == stat.st_mtime:
+            info[chave] = (entrada, True)
+            continue
+
+        conteudo_hash = hash_arquivo(arquivo)
+        if cache_ok and entrada["hash"] == conteudo_hash:
+            entrada.update(tamanho=stat.st_size, mtime=stat.st_mtime)
+            info[chave] = (entrada, True)
+            continue
+
+        info[chave] = ({"tamanho": stat.st_size, "mtime": stat.st_mtime, "hash": conteudo_hash, "leitor": leitor}, False)
+        para_ler.append(arquivo)
+
+    # Arquivos que saíram da pasta deixam de fazer parte do manifesto
+    novas_entradas = {}
+    resultados = ler_arquivos_cdr(para_ler, num_workers=num_workers, leitor=leitor) if para_ler else iter(())
+
+    for arquivo in arquivos:
+        chave = str(arquivo.resolve())
+        entrada, do_cache = info[chave]
+
+        if do_cache:
+            df = ler_parquet_cdr(pasta_cache / entrada["cache"])
+            novas_entradas[chave] = entrada
+            yield arquivo.name, df, None, entrada["diagnostico"], "cache"
+            continue
+
+        nome, df, erro, diagnostico = next(resultados)
+        if erro is None:
+            entrada["cache"] = f"{entrada['hash']}_{leitor}.parquet"
+            entrada["registros"] = len(df)
+            entrada["diagnostico"] = diagnostico
+            df.to_parquet(pasta_cache / entrada["cache"], index=False)
+            novas_entradas[chave] = entrada
+        yield nome, df, erro, diagnostico, "leitura"
+
+    # Remove parquets que nenhum arquivo atual referencia
+    em_uso = {e["cache"] for e in novas_entradas.values()}
+    for parquet in pasta_cache.glob("*.parquet"):
+        if parquet.name not in em_uso:
+            parquet.unlink()
+
+    manifesto["arquivos"] = novas_entradas
+    salvar_manifesto(manifesto, caminho_manifesto)
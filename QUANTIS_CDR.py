@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+from AGREGACAO_CDR import TEMPOS_CUBO
+
+# ==============================
+# SKETCH DE QUANTIS (hora × grupo)
+# ==============================
+# Histograma em escala logarítmica (no estilo DDSketch): cada valor > 0 cai no
+# balde ceil(log(valor) / log(GAMA)), e o quantil devolvido tem erro relativo de
+# no máximo ERRO_RELATIVO. Como o cubo, o sketch só guarda contagens, então
+# sketches de arquivos ou dias diferentes se juntam somando (somar_sketches),
+# sem voltar aos valores.
+CHAVES_SKETCH = ["hora", "ResourceGroupDesc"]
+
+ERRO_RELATIVO = 0.01
+GAMA = (1 + ERRO_RELATIVO) / (1 - ERRO_RELATIVO)
+LOG_GAMA = np.log(GAMA)
+
+# balde dos valores iguais a zero (ex.: ring time de atendimento imediato)
+BALDE_ZERO = np.iinfo("int16").min
+
+QUANTIS_PADRAO = (0.50, 0.90, 0.95, 0.99)
+
+def baldes(valores: np.ndarray) -> np.ndarray:
+    """Índice do balde de cada valor (>= 0)"""
+    with np.errstate(divide="ignore"):
+        indices = np.ceil(np.log(valores) / LOG_GAMA)
+    return np.where(valores > 0, indices, BALDE_ZERO).astype("int16")
+
+def valor_balde(indices: np.ndarray) -> np.ndarray:
+    """Valor representativo do balde (erro relativo <= ERRO_RELATIVO para qualquer valor do balde)"""
+    indices = np.asarray(indices, dtype="float64")
+    return np.where(indices == BALDE_ZERO, 0.0, 2 * GAMA ** indices / (GAMA + 1))
+
+def montar_sketch(cdr: pd.DataFrame) -> pd.DataFrame:
+    """Contagem por hora × grupo × métrica × balde dos tempos válidos do cdr"""
+    agrupador = cdr.groupby(CHAVES_SKETCH, observed=True, dropna=False, sort=True)
+    codigos = agrupador.ngroup().to_numpy()
+    chaves = agrupador.size().index.to_frame(index=False)
+
+    partes = []
+    for prefixo, metrica in TEMPOS_CUBO.items():
+        valores = cdr[metrica].to_numpy(dtype="float64", na_value=np.nan)
+        validos = ~np.isnan(valores)
+        contagem = (
+            pd.DataFrame({"codigo": codigos[validos], "balde": baldes(valores[validos])})
+              .groupby(["codigo", "balde"], sort=False)
+              .size()
+              .rename("qtd")
+              .reset_index()
+        )
+        contagem["metrica"] = prefixo
+        partes.append(contagem)
+
+    sketch = pd.concat(partes, ignore_index=True)
+    sketch = chaves.iloc[sketch["codigo"]].reset_index(drop=True).join(sketch.drop(columns="codigo"))
+    return sketch[CHAVES_SKETCH + ["metrica", "balde", "qtd"]]
+
+def somar_sketches(sketches) -> pd.DataFrame:
+    """Junta sketches parciais (ex.: um por arquivo ou por dia) em um só"""
+    sketches = [s for s in sketches if s is not None]
+    if len(sketches) == 1:
+        return sketches[0]
+    return (
+        pd.concat(sketches, ignore_index=True)
+          .groupby(CHAVES_SKETCH + ["metrica", "balde"], observed=True, dropna=False, sort=False)["qtd"]
+          .sum()
+          .reset_index()
+    )
+
+def quantis_sketch(sketch: pd.DataFrame, chaves, quantis=QUANTIS_PADRAO) -> pd.DataFrame:
+    """Percentis de cada métrica nas chaves pedidas: colunas <prefixo>_p50, <prefixo>_p90..."""
+    chaves = list(chaves)
+    if not chaves:
+        # total geral: uma chave constante para reaproveitar o mesmo cálculo
+        sketch, chaves = sketch.assign(_total=0), ["_total"]
+    grupo = chaves + ["metrica"]
+    hist = (
+        sketch.groupby(grupo + ["balde"], observed=True, dropna=False)["qtd"]
+              .sum()
+              .reset_index()
+              .sort_values(grupo + ["balde"], kind="stable")
+    )
+    por_grupo = hist.groupby(grupo, observed=True, dropna=False, sort=False)["qtd"]
+    acumulado = por_grupo.cumsum()
+    total = por_grupo.transform("sum")
+
+    colunas = []
+    for q in quantis:
+        # posição (0-based) do quantil na amostra ordenada: primeiro balde que a alcança
+        alcancou = acumulado > np.floor(q * (total - 1))
+        nome = f"p{round(q * 100):02d}"
+        colunas.append(
+            hist[alcancou].groupby(grupo, observed=True, dropna=False, sort=False)["balde"]
+                          .first()
+                          .pipe(lambda b: pd.Series(valor_balde(b.to_numpy()), index=b.index, name=nome))
+        )
+
+    largo = pd.concat(colunas, axis=1).unstack("metrica")
+    largo.columns = [f"{prefixo}_{p}" for p, prefixo in largo.columns]
+    ordem = [f"{prefixo}_p{round(q * 100):02d}" for prefixo in TEMPOS_CUBO for q in quantis]
+    largo = largo.reindex(columns=ordem).round(2).reset_index()
+    return largo.drop(columns="_total") if chaves == ["_total"] else largo
@@ -0,0 +1,131 @@
+import datetime
+from pathlib import Path
+
+import pandas as pd
+
+# ==============================
+# RELATÓRIO EXCEL (xlsxwriter)
+# ==============================
+# Toda a formatação é definida na escrita: formato por coluna (alinhamento e
+# percentuais) e formatação condicional no intervalo de dados (bordas, zebra e
+# cores de status). Nenhuma célula é estilizada individualmente e o arquivo não
+# é reaberto depois de salvo, então o custo não cresce com o nº de linhas.
+LARGURA_MAXIMA = 55
+ALTURA_CABECALHO = 22
+
+COR_BORDA = "#D9D9D9"
+COR_ZEBRA = "#F2F2F2"
+
+# valor da célula (comparação do Excel, sem diferenciar maiúsculas) -> cor da fonte
+CORES_STATUS = {
+    "#C00000": ["CRÍTICO", "CRITICO", "✗"],
+    "#FF6600": ["ALERTA", "⚠"],
+    "#008000": ["OK", "✓"],
+}
+
+COLUNAS_TAXA = ("taxa_atendimento", "sla15_rate", "sla30_rate")
+
+def abrir_writer_excel(caminho_base: Path):
+    """ExcelWriter (xlsxwriter); se o arquivo estiver aberto em outro programa, grava com sufixo de horário"""
+    caminho = caminho_base
+    try:
+        # o xlsxwriter só cria o arquivo no fechamento: testa o acesso antes
+        with open(caminho_base, "ab"):
+            pass
+    except PermissionError:
+        timestamp = datetime.datetime.now().strftime("%H%M%S")
+        caminho = caminho_base.parent / (caminho_base.stem + f"_{timestamp}" + caminho_base.suffix)
+        print(f"   ⚠️  Arquivo em uso! Salvando como: {caminho.name}")
+    return pd.ExcelWriter(caminho, engine="xlsxwriter"), caminho
+
+def eh_coluna_taxa(nome) -> bool:
+    nome = str(nome).strip().lower()
+    return nome.endswith("_rate") or nome in COLUNAS_TAXA
+
+def larguras_colunas(df: pd.DataFrame):
+    """Largura de cada coluna a partir do DataFrame (maior texto entre cabeçalho e valores)"""
+    larguras = []
+    for col in df.columns:
+        valores = df[col].dropna()
+        maior = int(valores.astype(str).str.len().max()) if len(valores) else 0
+        larguras.append(min(max(maior, len(str(col))) + 2, LARGURA_MAXIMA))
+    return larguras
+
+def escrever_aba(writer, df: pd.DataFrame, nome_aba: str, cor_cabecalho: str):
+    """Escreve o DataFrame em uma aba já formatada (cabeçalho, zebra, status, larguras e taxas)"""
+    book = writer.book
+    df.to_excel(writer, sheet_name=nome_aba, index=False, header=False, startrow=1)
+    ws = writer.sheets[nome_aba]
+
+    fmt_cabecalho = book.add_format({
+        "bold": True, "font_color": "#000000", "bg_color": f"#{cor_cabecalho}",
+        "align": "center", "valign": "vcenter", "text_wrap": True,
+        "border": 1, "border_color": COR_BORDA,
+    })
+    fmt_coluna = book.add_format({"valign": "vcenter", "text_wrap": True})
+    fmt_taxa = book.add_format({"valign": "vcenter", "text_wrap": True, "align": "right", "num_format": "0.0%"})
+
+    ws.write_row(0, 0, [str(c) for c in df.columns], fmt_cabecalho)
+    ws.set_row(0, ALTURA_CABECALHO)
+
+    for i, (col, largura) in enumerate(zip(df.columns, larguras_colunas(df))):
+        ws.set_column(i, i, largura, fmt_taxa if eh_coluna_taxa(col) else fmt_coluna)
+
+    n_linhas, n_colunas = df.shape
+    ws.freeze_panes(1, 0)
+    ws.autofilter(0, 0, n_linhas, max(n_colunas - 1, 0))
+    if n_linhas == 0 or n_colunas == 0:
+        return
+
+    # Intervalo de dados: borda em tudo, zebra nas linhas ímpares e fonte colorida nos status
+    intervalo = (1, 0, n_linhas, n_colunas - 1)
+    ws.conditional_format(*intervalo, {
+        "type": "formula", "criteria": "TRUE",
+        "format": book.add_format({"border": 1, "border_color": COR_BORDA}),
+    })
+    ws.conditional_format(*intervalo, {
+        "type": "formula", "criteria": "=MOD(ROW(),2)=1",
+        "format": book.add_format({"bg_color": COR_ZEBRA}),
+    })
+    for cor, valores in CORES_STATUS.items():
+        fmt_status = book.add_format({"bold": True, "font_color": cor})
+        for valor in valores:
+            ws.conditional_format(*intervalo, {
+                "type": "cell", "criteria": "==", "value": f'"{valor}"', "format": fmt_status,
+            })
+
+def criar_dashboard(writer, nomes_abas):
+    """Aba de navegação com um link para cada aba do relatório (deve ser a primeira criada)"""
+    book = writer.book
+    ws = book.add_worksheet("Dashboard")
+    writer.sheets["Dashboard"] = ws
+
+    ws.merge_range("A1:D1", "Dashboard - Navegação", book.add_format({
+        "font_size": 16, "bold": True, "font_color": "#000000", "bg_color": "#BDD7EE",
+        "align": "center", "valign": "vcenter",
+    }))
+    ws.set_row(0, 28)
+    ws.write("A3", "Clique para abrir:", book.add_format({"bold": True, "font_color": "#1F4E79"}))
+
+    fmt_botao = book.add_format({
+        "bold": True, "font_color": "#1F4E79", "bg_color": "#E2EFDA", "underline": 1,
+        "align": "center", "valign": "vcenter", "border": 1, "border_color": "#A6A6A6",
+    })
+    linha = 4
+    for aba in nomes_abas:
+        ws.merge_range(linha, 0, linha, 2, "", fmt_botao)
+        ws.write_url(linha, 0, f"internal:'{aba}'!A1", fmt_botao, f"📄 {aba}")
+        ws.set_row(linha, 22)
+        linha += 2
+
+    ws.set_column("A:A", 35)
+    ws.freeze_panes(4, 0)
+
+def salvar_relatorio_excel(caminho_base: Path, abas) -> Path:
+    """Grava o relatório consolidado: Dashboard + uma aba por (nome, DataFrame, cor do cabeçalho)"""
+    writer, caminho_final = abrir_writer_excel(caminho_base)
+    with writer:
+        criar_dashboard(writer, [nome for nome, _, _ in abas])
+        for nome, df, cor in abas:
+            escrever_aba(writer, df, nome, cor)
+    return caminho_final
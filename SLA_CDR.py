@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+# ==============================
+# HISTOGRAMA DE RING TIME E CURVA DE SLA (hora × grupo)
+# ==============================
+# Uma contagem por segundo de ring (ceil do ring time) das chamadas atendidas,
+# montada uma vez por hora × grupo. Como SLA ≤ T segundos (T inteiro) equivale
+# a ceil(ring) ≤ T, a soma acumulada do histograma dá o SLA exato de qualquer
+# limite sem nova passada pelas linhas; os histogramas são somáveis entre
+# arquivos e dias, como o cubo.
+CHAVES_HISTOGRAMA = ["hora", "ResourceGroupDesc"]
+
+MAX_SEGUNDOS_RING = 600
+SEGUNDO_ACIMA = MAX_SEGUNDOS_RING + 1   # ring acima de MAX_SEGUNDOS_RING
+SEGUNDO_SEM_RING = -1                   # atendida sem ring válido (conta só no denominador)
+
+LIMITES_SLA_PADRAO = [10, 15, 20, 30, 45, 60]
+
+def montar_histograma_ring(cdr: pd.DataFrame) -> pd.DataFrame:
+    """Atendidas por hora × grupo × segundo de ring (ceil), com SEGUNDO_SEM_RING e SEGUNDO_ACIMA"""
+    atendidas = cdr["atendida"].to_numpy() == 1
+    agrupador = cdr[atendidas].groupby(CHAVES_HISTOGRAMA, observed=True, dropna=False, sort=True)
+    codigos = agrupador.ngroup().to_numpy()
+    chaves = agrupador.size().index.to_frame(index=False)
+
+    ring = cdr["ring_time_sec"].to_numpy(dtype="float64", na_value=np.nan)[atendidas]
+    segundos = np.where(
+        np.isnan(ring),
+        SEGUNDO_SEM_RING,
+        np.clip(np.ceil(np.nan_to_num(ring)), 0, SEGUNDO_ACIMA),
+    ).astype("int16")
+
+    contagem = (
+        pd.DataFrame({"codigo": codigos, "segundo": segundos})
+          .groupby(["codigo", "segundo"], sort=True)
+          .size()
+          .rename("qtd")
+          .reset_index()
+    )
+    hist = chaves.iloc[contagem["codigo"]].reset_index(drop=True).join(contagem.drop(columns="codigo"))
+    return hist[CHAVES_HISTOGRAMA + ["segundo", "qtd"]]
+
+def somar_histogramas(histogramas) -> pd.DataFrame:
+    """Junta histogramas parciais (ex.: um por arquivo ou por dia) em um só"""
+    histogramas = [h for h in histogramas if h is not None]
+    if len(histogramas) == 1:
+        return histogramas[0]
+    return (
+        pd.concat(histogramas, ignore_index=True)
+          .groupby(CHAVES_HISTOGRAMA + ["segundo"], observed=True, dropna=False, sort=False)["qtd"]
+          .sum()
+          .reset_index()
+    )
+
+def _acumulado(hist: pd.DataFrame, chaves):
+    """(chaves únicas, atendidas por chave, matriz chaves × segundo 0..MAX com as atendidas até o segundo)"""
+    chaves = list(chaves)
+    if chaves:
+        agrupador = hist.groupby(chaves, observed=True, dropna=False, sort=True)
+        codigos = agrupador.ngroup().to_numpy()
+        indice = agrupador.size().index.to_frame(index=False)
+    else:
+        codigos = np.zeros(len(hist), dtype="int64")
+        indice = pd.DataFrame(index=[0])
+
+    matriz = np.zeros((len(indice), SEGUNDO_ACIMA + 2), dtype="int64")
+    # coluna 0 = sem ring válido, coluna s + 1 = segundo s
+    np.add.at(matriz, (codigos, hist["segundo"].to_numpy().astype("int64") + 1), hist["qtd"].to_numpy())
+    atendidas = matriz.sum(axis=1)
+    acumulado = np.cumsum(matriz[:, 1:SEGUNDO_ACIMA + 1], axis=1)
+    return indice, atendidas, acumulado
+
+def _validar_limite(limite):
+    """Limite acima de MAX_SEGUNDOS_RING cairia no balde SEGUNDO_ACIMA, que o histograma não separa"""
+    if limite > MAX_SEGUNDOS_RING:
+        raise ValueError(f"Limite de SLA de {limite}s acima de MAX_SEGUNDOS_RING ({MAX_SEGUNDOS_RING}s)")
+
+def taxas_sla(hist: pd.DataFrame, chaves, limites=LIMITES_SLA_PADRAO) -> pd.DataFrame:
+    """Atendidas dentro de cada limite (sla_<T>) e taxa sobre as atendidas (sla<T>_rate)"""
+    limites = [int(t) for t in limites]
+    _validar_limite(max(limites, default=0))
+    indice, atendidas, acumulado = _acumulado(hist, chaves)
+    resultado = indice.copy()
+    for t in limites:
+        resultado[f"sla_{t}"] = acumulado[:, t]
+    for t in limites:
+        resultado[f"sla{t}_rate"] = np.where(atendidas > 0, resultado[f"sla_{t}"] / np.maximum(atendidas, 1), np.nan)
+    return resultado
+
+def curva_sla(hist: pd.DataFrame, chaves, ate_segundo=MAX_SEGUNDOS_RING) -> pd.DataFrame:
+    """Curva completa de SLA (formato longo): taxa de atendidas com ring ≤ cada segundo"""
+    _validar_limite(ate_segundo)
+    indice, atendidas, acumulado = _acumulado(hist, chaves)
+    segundos = np.arange(int(ate_segundo) + 1)
+    curva = indice.loc[indice.index.repeat(len(segundos))].reset_index(drop=True)
+    curva["limite_seg"] = np.tile(segundos, len(indice))
+    curva["atendidas"] = np.repeat(atendidas, len(segundos))
+    curva["atendidas_no_limite"] = acumulado[:, segundos].ravel()
+    curva["sla_rate"] = np.where(
+        curva["atendidas"] > 0, curva["atendidas_no_limite"] / curva["atendidas"].clip(lower=1), np.nan
+    )
+    return curva
@@ -0,0 +1,318 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from CHAVE_CDR import BITS_SEQNUM, SENTINELA_CALLID
+
+# ==============================
+# CADEIAS DE TENTATIVAS (rediscagens por CallId e por DialedNum)
+# ==============================
+# O discador gera várias linhas por CallId (SeqNum) e por número discado. Uma
+# cadeia são as tentativas da mesma chave (CallId ou DialedNum) sem intervalo
+# maior que a janela do nível entre uma tentativa e a seguinte (em CallStartDt):
+# passado esse tempo, a próxima tentativa abre outra cadeia. A regra é a mesma na
+# leitura em memória e no streaming, então os dois modos dão as mesmas cadeias.
+#
+# Cada cadeia é reduzida a um segmento de tamanho fixo: tentativas, primeira/última
+# tentativa, início da primeira e da última na ordem da cadeia (CallId, SeqNum,
+# CallStartDt ou DialedNum, CallStartDt), maior intervalo e primeira atendida.
+# Dois segmentos da mesma cadeia se juntam sem voltar às linhas (o intervalo
+# entre eles é início da primeira do seguinte - início da última do anterior),
+# então o streaming guarda só um segmento por cadeia aberta, não as tentativas.
+# Cada lote só toca as cadeias abertas das chaves que aparecem nele; cadeia cuja
+# última tentativa ficou mais de uma janela atrás da mais recente já lida não
+# recebe mais tentativas e é gravada em disco. Isso é exato quando os arquivos
+# chegam em ordem cronológica; se lotes diferentes intercalarem tentativas da
+# mesma cadeia, os segmentos entram na ordem da primeira tentativa de cada um.
+#
+# Tudo é vetorizado: uma ordenação dos segmentos (lexsort) e operações por
+# cadeia (reduceat) sobre os arrays ordenados, sem groupby-apply em Python.
+# DialedNum é agrupado pelo texto (como na leitura: zeros à esquerda e valores
+# não numéricos distinguem números diferentes).
+INICIO_AUSENTE = np.iinfo("int64").min   # NaT em int64 (e "sem intervalo/atendimento" nos segmentos)
+
+# nível -> coluna da cadeia nas saídas e no resumo
+NIVEIS_CADEIA = {"callid": "CallId", "numero": "DialedNum"}
+
+# faixas de quantidade de tentativas no resumo (a última é "ou mais")
+FAIXAS_TENTATIVAS = [1, 2, 3, 4, 5, 10]
+
+NS_POR_SEGUNDO = 1_000_000_000
+
+COLUNAS_SEGMENTO = ["cadeia", "ordem", "desempate", "tentativas", "primeira", "ultima",
+                    "inicio_primeira", "inicio_ultima", "intervalo_max", "ate_atender", "inicio_atendida"]
+
+def _segmentos_unitarios(cadeia, ordem, desempate, inicio, atendida) -> pd.DataFrame:
+    """Um segmento por tentativa (ordem/desempate posicionam a tentativa dentro da cadeia)"""
+    return pd.DataFrame({
+        "cadeia": cadeia,
+        "ordem": ordem,
+        "desempate": desempate,
+        "tentativas": np.ones(len(inicio), dtype="int64"),
+        "primeira": inicio,
+        "ultima": inicio,
+        "inicio_primeira": inicio,
+        "inicio_ultima": inicio,
+        "intervalo_max": np.full(len(inicio), INICIO_AUSENTE, dtype="int64"),
+        "ate_atender": atendida.astype("int64"),
+        "inicio_atendida": np.where(atendida == 1, inicio, INICIO_AUSENTE),
+    })
+
+def combinar_segmentos(segmentos: pd.DataFrame, grupos: np.ndarray = None) -> pd.DataFrame:
+    """Junta os segmentos da mesma cadeia, na ordem da primeira tentativa de cada um, em um só.
+
+    grupos (um código por segmento) separa cadeias da mesma chave; sem ele, a
+    chave é a cadeia. A saída sai na ordem dos códigos (de aparição, sem grupos).
+    """
+    n = len(segmentos)
+    if n == 0:
+        return segmentos
+    codigos = pd.factorize(segmentos["cadeia"])[0] if grupos is None else grupos
+    ordem = np.lexsort((segmentos["desempate"].to_numpy(), segmentos["ordem"].to_numpy(), codigos))
+    s = {c: segmentos[c].to_numpy()[ordem] for c in COLUNAS_SEGMENTO[1:]}
+
+    codigos = codigos[ordem]
+    inicios = np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1]])
+    tamanhos = np.diff(np.r_[inicios, n])
+    if len(inicios) == n:
+        return segmentos.iloc[ordem].reset_index(drop=True)
+    fins = np.r_[inicios[1:], n] - 1
+
+    # intervalo entre segmentos consecutivos da mesma cadeia (não existe antes do primeiro)
+    salto = np.r_[INICIO_AUSENTE, s["inicio_primeira"][1:] - s["inicio_ultima"][:-1]]
+    salto[inicios] = INICIO_AUSENTE
+
+    # a primeira atendida da cadeia está no primeiro segmento atendido: soma as tentativas anteriores
+    antes = np.cumsum(s["tentativas"]) - s["tentativas"]
+    antes -= np.repeat(antes[inicios], tamanhos)
+    posicao = np.arange(n)
+    primeiro_atendido = np.minimum.reduceat(np.where(s["ate_atender"] > 0, posicao, n), inicios)
+    atendeu = primeiro_atendido < n
+    k = np.where(atendeu, primeiro_atendido, inicios)
+
+    return pd.DataFrame({
+        "cadeia": segmentos["cadeia"].to_numpy()[ordem][inicios],
+        "ordem": s["ordem"][inicios],
+        "desempate": s["desempate"][inicios],
+        "tentativas": np.add.reduceat(s["tentativas"], inicios),
+        "primeira": np.minimum.reduceat(s["primeira"], inicios),
+        "ultima": np.maximum.reduceat(s["ultima"], inicios),
+        "inicio_primeira": s["inicio_primeira"][inicios],
+        "inicio_ultima": s["inicio_ultima"][fins],
+        "intervalo_max": np.maximum.reduceat(np.maximum(s["intervalo_max"], salto), inicios),
+        "ate_atender": np.where(atendeu, antes[k] + s["ate_atender"][k], 0),
+        "inicio_atendida": np.where(atendeu, s["inicio_atendida"][k], INICIO_AUSENTE),
+    })
+
+def _sessoes(chaves: np.ndarray, inicio: np.ndarray, janela_s: int) -> np.ndarray:
+    """Código da cadeia de cada tentativa: nova cadeia quando a chave muda ou o intervalo
+    para a tentativa anterior da chave (em CallStartDt) passa de janela_s"""
+    codigos = pd.factorize(chaves)[0]
+    ordem = np.lexsort((inicio, codigos))
+    c, t = codigos[ordem], inicio[ordem]
+    nova = np.r_[True, (c[1:] != c[:-1]) | (np.diff(t) > janela_s * NS_POR_SEGUNDO)]
+    sessoes = np.empty(len(ordem), dtype="int64")
+    sessoes[ordem] = np.cumsum(nova) - 1
+    return sessoes
+
+def montar_segmentos(cdr: pd.DataFrame, janelas_s: dict) -> dict:
+    """Cadeias do cdr tratado, por nível ({"callid": ..., "numero": ...}), uma linha por cadeia;
+    as cadeias da mesma chave ficam juntas, em ordem cronológica"""
+    chave = cdr["chave_unica"].to_numpy(dtype="int64")
+    inicio = cdr["CallStartDt"].to_numpy(dtype="datetime64[ns]").astype("int64")
+    atendida = cdr["atendida"].to_numpy(dtype="int8")
+    com_inicio = inicio != INICIO_AUSENTE
+
+    # chave larga (negativa) não guarda o CallId: fica fora das cadeias por CallId.
+    # Ordem (CallId, SeqNum, CallStartDt): a chave empacotada já ordena por CallId e SeqNum
+    v = com_inicio & (chave >= 0) & ((chave >> BITS_SEQNUM) != SENTINELA_CALLID)
+    callid = _segmentos_unitarios(chave[v] >> BITS_SEQNUM, chave[v], inicio[v], inicio[v], atendida[v])
+
+    # ordem (DialedNum, CallStartDt), com a chave como desempate
+    v = com_inicio & cdr["DialedNum"].notna().to_numpy()
+    numero = _segmentos_unitarios(cdr["DialedNum"].to_numpy(dtype=object)[v], inicio[v], chave[v], inicio[v], atendida[v])
+
+    return {
+        nivel: combinar_segmentos(unitarios, _sessoes(unitarios["cadeia"].to_numpy(), unitarios["primeira"].to_numpy(), janelas_s[nivel]))
+        for nivel, unitarios in (("callid", callid), ("numero", numero))
+    }
+
+# ------------------------------
+# ESTADO DAS CADEIAS (memória e streaming)
+# ------------------------------
+def novas_cadeias() -> dict:
+    """Cadeias abertas por nível + cadeias já fechadas (partes gravadas e seu resumo) e a tentativa mais recente lida"""
+    return {
+        "callid": None, "numero": None,
+        "partes": {nivel: [] for nivel in NIVEIS_CADEIA},
+        "resumo": dict.fromkeys(NIVEIS_CADEIA),
+        "mais_recente": INICIO_AUSENTE,
+    }
+
+def _juntar_lote(abertas: pd.DataFrame, lote: pd.DataFrame, janela_s: int):
+    """Junta as cadeias de um lote às abertas do nível. Retorna (abertas, fechadas).
+
+    Só as abertas das chaves do lote são tocadas: a primeira cadeia da chave no
+    lote continua a aberta se começa até janela_s depois da última tentativa dela;
+    senão a aberta fecha. Fora a última de cada chave, as cadeias do lote já saem fechadas.
+    """
+    if abertas is None:
+        abertas = lote.iloc[:0]
+    chaves = lote["cadeia"]
+    primeira = ~chaves.duplicated(keep="first").to_numpy()
+    ultima = ~chaves.duplicated(keep="last").to_numpy()
+
+    posicao = pd.Index(abertas["cadeia"]).get_indexer(chaves) if len(abertas) else np.full(len(lote), -1)
+    tem_aberta = posicao >= 0
+    ultima_aberta = abertas["ultima"].to_numpy()[np.maximum(posicao, 0)] if len(abertas) else np.zeros(len(lote), dtype="int64")
+    continua = primeira & tem_aberta & (lote["primeira"].to_numpy() - ultima_aberta <= janela_s * NS_POR_SEGUNDO)
+
+    tocadas = np.zeros(len(abertas), dtype=bool)
+    tocadas[posicao[tem_aberta]] = True
+    continuadas = np.zeros(len(abertas), dtype=bool)
+    continuadas[posicao[continua]] = True
+
+    if continua.any():
+        # aberta + primeira cadeia do lote, por chave (cada chave aparece duas vezes, na mesma ordem)
+        juntas = combinar_segmentos(pd.concat([abertas.iloc[posicao[continua]], lote[continua]], ignore_index=True))
+        colunas = {}
+        for coluna in COLUNAS_SEGMENTO:
+            valores = lote[coluna].to_numpy().copy()
+            valores[continua] = juntas[coluna].to_numpy()
+            colunas[coluna] = valores
+        lote = pd.DataFrame(colunas)
+
+    fechadas = pd.concat([abertas[tocadas & ~continuadas], lote[~ultima]], ignore_index=True)
+    abertas = pd.concat([abertas[~tocadas], lote[ultima]], ignore_index=True)
+    return abertas, fechadas
+
+def _gravar_parte(cadeias: dict, nivel: str, segmentos: pd.DataFrame, pasta: Path):
+    """Grava cadeias fechadas do nível numa parte e soma-as ao resumo do nível"""
+    saida = cadeias_de_segmentos(segmentos, nivel)
+    pasta.mkdir(parents=True, exist_ok=True)
+    destino = pasta / f"{nivel}-{len(cadeias['partes'][nivel]) + 1:05d}.parquet"
+    saida.to_parquet(destino, index=False)
+    cadeias["partes"][nivel].append(destino)
+    cadeias["resumo"][nivel] = somar_resumos([cadeias["resumo"][nivel], resumo_parcial(saida)])
+
+def somar_cadeias(cadeias: dict, segmentos: dict, janelas_s: dict, pasta: Path) -> dict:
+    """Junta as cadeias de um lote às abertas e grava em pasta as que fecharam: as
+    interrompidas no lote e as sem tentativa há mais de uma janela (em relação à mais recente lida)"""
+    for nivel in NIVEIS_CADEIA:
+        lote = segmentos[nivel]
+        if len(lote):
+            cadeias["mais_recente"] = max(cadeias["mais_recente"], int(lote["ultima"].max()))
+    for nivel in NIVEIS_CADEIA:
+        abertas, fechadas = _juntar_lote(cadeias[nivel], segmentos[nivel], janelas_s[nivel])
+        # nenhuma tentativa futura (arquivos em ordem cronológica) fica a até uma janela delas
+        antigas = abertas["ultima"].to_numpy() < cadeias["mais_recente"] - janelas_s[nivel] * NS_POR_SEGUNDO
+        if antigas.any():
+            fechadas = pd.concat([fechadas, abertas[antigas]], ignore_index=True)
+            abertas = abertas[~antigas].reset_index(drop=True)
+        if len(fechadas):
+            _gravar_parte(cadeias, nivel, fechadas, pasta)
+        cadeias[nivel] = abertas
+    return cadeias
+
+def cadeias_de_segmentos(segmentos: pd.DataFrame, nivel: str) -> pd.DataFrame:
+    """Uma linha por cadeia: tentativas, intervalos, atendimento e tentativas até atender"""
+    tentativas = segmentos["tentativas"].to_numpy()
+    multiplas = tentativas > 1
+    atendeu = segmentos["ate_atender"].to_numpy() > 0
+    inicio_primeira = segmentos["inicio_primeira"].to_numpy()
+    ate_atender = pd.array(segmentos["ate_atender"].to_numpy(), dtype="Int64")
+    ate_atender[~atendeu] = pd.NA
+
+    return pd.DataFrame({
+        NIVEIS_CADEIA[nivel]: segmentos["cadeia"].to_numpy(),
+        "tentativas": tentativas,
+        "primeira_tentativa": pd.to_datetime(segmentos["primeira"].to_numpy()),
+        "ultima_tentativa": pd.to_datetime(segmentos["ultima"].to_numpy()),
+        "intervalo_medio_s": np.where(
+            multiplas, (segmentos["inicio_ultima"].to_numpy() - inicio_primeira) / NS_POR_SEGUNDO / np.maximum(tentativas - 1, 1), np.nan
+        ),
+        "intervalo_max_s": np.where(multiplas, segmentos["intervalo_max"].to_numpy() / NS_POR_SEGUNDO, np.nan),
+        "atendida": atendeu.astype("int8"),
+        "tentativas_ate_atender": ate_atender,
+        "tempo_ate_atender_s": np.where(
+            atendeu, (segmentos["inicio_atendida"].to_numpy() - inicio_primeira) / NS_POR_SEGUNDO, np.nan
+        ),
+    })
+
+def gravar_cadeias(cadeias: dict, nivel: str, arquivo: Path) -> pd.DataFrame:
+    """Grava todas as cadeias do nível (partes fechadas + abertas) e devolve o resumo parcial completo"""
+    abertas = cadeias_de_segmentos(cadeias[nivel], nivel)
+    partes = cadeias["partes"][nivel]
+    resumo = somar_resumos([cadeias["resumo"][nivel], resumo_parcial(abertas)])
+
+    if not partes:
+        abertas.to_parquet(arquivo, index=False)
+        return resumo
+    # uma parte por vez: o arquivo final não passa inteiro pela memória
+    tabela = pa.Table.from_pandas(abertas, preserve_index=False)
+    with pq.ParquetWriter(arquivo, tabela.schema) as escritor:
+        for parte in partes:
+            escritor.write_table(pq.read_table(parte).cast(tabela.schema))
+        escritor.write_table(tabela)
+    return resumo
+
+# ------------------------------
+# RESUMO POR FAIXA DE TENTATIVAS (somável)
+# ------------------------------
+def resumo_parcial(cadeias: pd.DataFrame) -> pd.DataFrame:
+    """Somas e contagens por faixa de tentativas (somáveis entre partes de cadeias)"""
+    bordas = FAIXAS_TENTATIVAS + [np.inf]
+    rotulos = [
+        str(a) if b - a == 1 else (f"{a}+" if b == np.inf else f"{a}-{int(b) - 1}")
+        for a, b in zip(bordas[:-1], bordas[1:])
+    ]
+    faixa = pd.cut(cadeias["tentativas"], bins=bordas, labels=rotulos, right=False)
+    ate_atender = cadeias["tentativas_ate_atender"].astype("float64")
+
+    return (
+        cadeias.assign(
+            faixa_tentativas=faixa,
+            atendida=cadeias["atendida"].astype("int64"),
+            intervalo=cadeias["intervalo_medio_s"], n_intervalo=cadeias["intervalo_medio_s"].notna(),
+            ate=ate_atender, n_ate=ate_atender.notna(),
+            tempo=cadeias["tempo_ate_atender_s"], n_tempo=cadeias["tempo_ate_atender_s"].notna(),
+        )
+        .groupby("faixa_tentativas", observed=False)
+        .agg(
+            cadeias=("tentativas", "size"),
+            tentativas=("tentativas", "sum"),
+            atendidas=("atendida", "sum"),
+            soma_intervalo=("intervalo", "sum"), n_intervalo=("n_intervalo", "sum"),
+            soma_ate=("ate", "sum"), n_ate=("n_ate", "sum"),
+            soma_tempo=("tempo", "sum"), n_tempo=("n_tempo", "sum"),
+        )
+    )
+
+def somar_resumos(resumos) -> pd.DataFrame:
+    """Soma resumos parciais (None = vazio)"""
+    resumos = [r for r in resumos if r is not None]
+    soma = resumos[0]
+    for resumo in resumos[1:]:
+        soma = soma.add(resumo, fill_value=0)
+    return soma
+
+def fechar_resumo(parcial: pd.DataFrame, nivel: str) -> pd.DataFrame:
+    """Cadeias por faixa de quantidade de tentativas: volume, taxa de atendimento e intervalos"""
+    def media(soma, n):
+        return np.where(parcial[n] > 0, parcial[soma] / parcial[n].clip(lower=1), np.nan)
+
+    resumo = pd.DataFrame({
+        "faixa_tentativas": parcial.index,
+        "cadeias": parcial["cadeias"].astype("int64").to_numpy(),
+        "tentativas": parcial["tentativas"].astype("int64").to_numpy(),
+        "atendidas": parcial["atendidas"].astype("int64").to_numpy(),
+        "intervalo_medio_s": media("soma_intervalo", "n_intervalo"),
+        "tentativas_ate_atender_media": media("soma_ate", "n_ate"),
+        "tempo_ate_atender_medio_s": media("soma_tempo", "n_tempo"),
+    })
+    resumo["taxa_atendimento"] = np.where(resumo["cadeias"] > 0, resumo["atendidas"] / resumo["cadeias"].clip(lower=1), np.nan)
+    resumo.insert(0, "nivel", NIVEIS_CADEIA[nivel])
+    return resumo.round(3)
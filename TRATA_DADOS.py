@@ -1,21 +1,40 @@
+import argparse
 import pandas as pd
 pd.set_option("future.no_silent_downcasting", True)
 from pathlib import Path
 from tqdm import tqdm
 import time
 import numpy as np
-import datetime
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
 from pathlib import Path
-
-inicio = time.time()
+import os
+import shutil
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Colunas do CDR e leitura dos arquivos ficam em LEITURA_CDR (importável pelos workers)
+from LEITURA_CDR import (
+    COLUNAS, COLUNAS_DATETIME, ler_arquivos_cdr, ler_arquivos_incremental,
+    detectar_formato_data, somar_datas_invalidas
+)
+from CHAVE_CDR import empacotar_chave, chave_para_texto, chave_larga
+from AGREGACAO_CDR import montar_cubo, somar_cubos, consolidar_cubo
+from QUANTIS_CDR import montar_sketch, somar_sketches, quantis_sketch
+from SLA_CDR import montar_histograma_ring, somar_histogramas, taxas_sla, curva_sla
+from CONCORRENCIA_CDR import montar_eventos_concorrencia, somar_eventos, total_eventos, curva_concorrencia, ocupacao_por_hora
+from TENTATIVAS_CDR import (
+    NIVEIS_CADEIA, montar_segmentos, novas_cadeias, somar_cadeias, gravar_cadeias, fechar_resumo,
+)
+from RELATORIO_EXCEL import salvar_relatorio_excel
+from INSTRUMENTACAO import MedidorEtapas, registrar_saida
+from BASELINE_CDR import observacoes_diarias, carregar_baseline, pontuar_observacoes, atualizar_baseline
+from INDICE_CHAVES import IndiceChaves
+from INDICE_CSV import caminho_metadados, ler_metadados_csv, salvar_metadados_csv
 
 # ==============================
 # CONFIGURAÇÕES
 # ==============================
-BASE_DIR = Path(__file__).resolve().parent
+# CDR_BASE_DIR permite rodar o pipeline sobre outra pasta (usado pelo BENCHMARK_CDR)
+BASE_DIR = Path(os.environ.get("CDR_BASE_DIR") or Path(__file__).resolve().parent)
 
 # ATENÇÃO: Os arquivos em .csv extaídos do Aspect devem estar nesta pasta:
 PASTA_BASE = BASE_DIR / "BASES_RAW"
@@ -29,215 +48,534 @@ PASTA_SAIDA.mkdir(exist_ok=True)
 ARQUIVO_TRATADO = PASTA_SAIDA / "base_tratada.csv"
 ARQUIVO_CONSOLIDADO = PASTA_SAIDA / "relatorio_completo.xlsx"
 
-# ==============================
-# COLUNAS
-# ==============================
-COLUNAS = [
-    "CallStartDt",
-    "SeqNum",
-    "CallId",
-    "DetectionDt",
-    "AnswerDt",
-    "WrapEndDt",
-    "CallInsertDt",
-    "CallEndDt",
-    "TimePhoneStartingRinging",
-    "DialedNum",
-    "Disp_c",
-    "Disposition_Desc",
-    "ResourceGroupDesc"
-]
+# Saída em parquet (tipada, particionada por data/hora) gravada junto com o CSV
+SALVAR_PARQUET = True
+PASTA_PARQUET = PASTA_SAIDA / "base_tratada_parquet"
+LINHAS_POR_ROW_GROUP = 250_000
+
+# Quantidade de processos usados na leitura dos arquivos (1 = leitura sequencial)
+NUM_WORKERS_LEITURA = os.cpu_count() or 1
+
+# Leitura incremental: só relê arquivos novos/alterados; os demais vêm do cache (parquet já tipado)
+LEITURA_INCREMENTAL = True
+PASTA_CACHE = BASE_DIR / "cache_cdr"
+
+# Leitor dos CSVs: "pandas" ou "arrow" (pyarrow: datas/inteiros tipados no parse e contagem de linhas malformadas)
+LEITOR_CSV = "arrow"
+
+# Modo streaming (multi-dias): cada arquivo é tratado, exportado e somado ao cubo
+# de agregação e descartado em seguida, sem manter o cdr inteiro em memória
+MODO_STREAMING = os.environ.get("CDR_MODO_STREAMING", "0") == "1"
+
+# Modo monitoramento (python TRATA_DADOS.py --monitorar): varre a PASTA_BASE a cada
+# INTERVALO_MONITORAMENTO_S e trata só os arquivos novos, somando-os ao estado do
+# streaming; arquivo alterado ou removido reconstrói o estado (com o cache da leitura)
+INTERVALO_MONITORAMENTO_S = 15
+# arquivo sem alteração há esse tempo = cópia do Aspect concluída
+ESPERA_ARQUIVO_ESTAVEL_S = 5
+
+# Percentis (p50/p90/p95/p99) de ring/talk/wrap/duração por hora × grupo, a partir
+# de sketches somáveis (ver QUANTIS_CDR). O sketch é gravado para ser somado com o
+# de outros dias sem reler as bases.
+ARQUIVO_SKETCH_QUANTIS = PASTA_SAIDA / "quantis_sketch.parquet"
+ARQUIVO_PERCENTIS = PASTA_SAIDA / "percentis_hora_grupo.csv"
+
+# SLA (atendidas com ring ≤ T segundos) de cada limite a partir do histograma de
+# ring time por hora × grupo (ver SLA_CDR): incluir um limite aqui não exige
+# reprocessar as bases, só somar o histograma gravado
+LIMITES_SLA = [10, 15, 20, 30, 45, 60]
+# limite do resumo executivo e meta sobre as atendidas
+LIMITE_SLA_META = 15
+META_SLA = 0.80
+# aba "SLA - Curva": taxa de SLA de 0 a SEGUNDOS_CURVA_SLA por grupo
+SEGUNDOS_CURVA_SLA = 120
+ARQUIVO_HISTOGRAMA_RING = PASTA_SAIDA / "histograma_ring.parquet"
+
+# Chamadas simultâneas tocando / em conversa / em pós-atendimento por grupo, pela
+# varredura dos eventos de início e fim (ver CONCORRENCIA_CDR). A curva sai em
+# janelas de RESOLUCAO_CONCORRENCIA_S (1 = por segundo, 60 = por minuto; divisor
+# de 3600) e o pico/média por hora vai para a aba "Concorrência - Hora×Grupo"
+RESOLUCAO_CONCORRENCIA_S = 60
+ARQUIVO_CONCORRENCIA = PASTA_SAIDA / "concorrencia_grupo.parquet"
+
+# Cadeias de tentativas (rediscagens) por CallId e por DialedNum (ver TENTATIVAS_CDR):
+# uma linha por cadeia em parquet e o resumo por faixa de tentativas na aba
+# "Tentativas - Resumo"
+ARQUIVO_CADEIAS_CALLID = PASTA_SAIDA / "cadeias_callid.parquet"
+ARQUIVO_CADEIAS_NUMERO = PASTA_SAIDA / "cadeias_dialednum.parquet"
+# Tentativas da mesma chave com mais que a janela do nível entre uma e a seguinte
+# são cadeias diferentes (nos dois modos). No streaming só as cadeias abertas ficam
+# em memória (um segmento por cadeia, não as tentativas): cadeia sem tentativa há
+# mais de uma janela (em relação à mais recente já lida) é gravada em
+# PASTA_CADEIAS_PARTES e sai da memória
+JANELA_CADEIA_CALLID_S = 24 * 3600
+JANELA_CADEIA_NUMERO_S = 24 * 3600
+JANELAS_CADEIA_S = {"callid": JANELA_CADEIA_CALLID_S, "numero": JANELA_CADEIA_NUMERO_S}
+PASTA_CADEIAS_PARTES = PASTA_SAIDA / "cadeias_partes"
+# unicidade da chave no streaming: índice temporário em disco das chaves já vistas
+PASTA_CHAVES_STREAMING = PASTA_SAIDA / "chaves_streaming"
+
+# Instrumentação por etapa (tempo, CPU, linhas, pico de RSS e memória do frame):
+# log da execução em JSON/CSV e aba "Execução - Etapas" no relatório
+ARQUIVO_LOG_EXECUCAO = PASTA_SAIDA / "log_execucao.json"
+ARQUIVO_LOG_ETAPAS = PASTA_SAIDA / "log_execucao_etapas.csv"
+
+# cProfile por etapa: False, True (todas) ou lista de etapas, ex.: ["1. leitura", "14. excel"]
+PERFILAR_ETAPAS = False
+PASTA_PERFIS = PASTA_SAIDA / "perfis"
+
+# Baseline histórico das anomalias (dia da semana × hora × grupo, ver BASELINE_CDR).
+# Só dias fechados (anteriores à data da execução) entram no baseline.
+ATUALIZAR_BASELINE = True
+PASTA_BASELINE = BASE_DIR / "baseline_cdr"
+
+# Índice persistente das chaves (CallId + SeqNum) dos arquivos já processados em
+# execuções anteriores (ver INDICE_CHAVES). Chave de arquivo novo/alterado que já
+# está no índice é marcada (qualidade + chaves_repetidas.csv) ou, com
+# DESCARTAR_CHAVES_REPETIDAS, removida antes do tratamento e das saídas.
+USAR_INDICE_CHAVES = True
+PASTA_INDICE_CHAVES = BASE_DIR / "indice_chaves"
+DESCARTAR_CHAVES_REPETIDAS = False
+ARQUIVO_CHAVES_REPETIDAS = PASTA_SAIDA / "chaves_repetidas.csv"
+
+# Layout compacto do cdr tratado (ver compactar_cdr)
+COLUNAS_CATEGORICAS = ["ResourceGroupDesc", "Disposition_Desc", "Disp_c"]
+COLUNAS_TEMPO_SEC = ["ring_time_sec", "talk_time_sec", "call_duration_sec", "wrap_time_sec"]
 
 # ==============================
-# 1. LEITURA E UNIFICAÇÃO
+# FUNÇÕES AUXILIARES
 # ==============================
-arquivos = sorted(PASTA_BASE.glob("*.csv"))
-dfs = []
-
-print(f"Iniciando leitura de {len(arquivos)} arquivos...")
-
-for arquivo in tqdm(arquivos, desc="📂 Lendo arquivos", unit="arquivo"):
-    try:
-        df = pd.read_csv(
-            arquivo,
-            sep=";",
-            header=None,
-            names=COLUNAS,
-            encoding="utf-8",
-            dtype=str,
-            low_memory=False,
-            on_bad_lines="skip"
-        )
-
-        df = df.dropna(how="all")
-
-        # normaliza nulos logo na origem também
-        df = df.replace({"NULL": pd.NA, "null": pd.NA, "": pd.NA, " ": pd.NA})
-        df = df.infer_objects(copy=False)
-
-        # filtra linhas sem CallStartDt
-        df = df[df["CallStartDt"].notna()]
-
-        dfs.append(df)
-        print(f"  ✓ {arquivo.name}: {len(df)} registros válidos")
-
-    except Exception as e:
-        print(f"  ✗ ERRO ao ler {arquivo.name}: {e}")
-        continue
-
-if not dfs:
-    raise ValueError("❌ Nenhum arquivo foi carregado com sucesso!")
-
-cdr = pd.concat(dfs, ignore_index=True)
-print(f"\n✅ Total de registros carregados: {len(cdr)}")
-
-# ==============================
-# 2. ANÁLISE DE TIPAGEM (ANTES DA CONVERSÃO)
-# ==============================
-log_tipagem = []
-amostra_size = min(10000, len(cdr))
-amostra = cdr.sample(n=amostra_size, random_state=42)
-
-for coluna in COLUNAS:
-    valores_unicos = amostra[coluna].nunique(dropna=True)
-    valores_nulos = amostra[coluna].isna().sum()
-    valores_preenchidos = amostra_size - valores_nulos
-
-    tipo_detectado = "string"
-    valores_validos = amostra[coluna].dropna()
-
-    if len(valores_validos) > 0:
-        try:
-            pd.to_numeric(valores_validos, errors="raise")
-            tipo_detectado = "numeric"
-        except:
+def analisar_tipagem(amostra: pd.DataFrame) -> pd.DataFrame:
+    """Tipo detectado, preenchimento e exemplos de cada coluna do CDR (sobre uma amostra)"""
+    log_tipagem = []
+    amostra_size = len(amostra)
+
+    for coluna in COLUNAS:
+        valores_unicos = amostra[coluna].nunique(dropna=True)
+        valores_nulos = amostra[coluna].isna().sum()
+        valores_preenchidos = amostra_size - valores_nulos
+
+        tipo_detectado = "string"
+        valores_validos = amostra[coluna].dropna()
+
+        if len(valores_validos) > 0 and pd.api.types.is_datetime64_any_dtype(valores_validos):
+            tipo_detectado = "datetime"
+        elif len(valores_validos) > 0:
             try:
-                with pd.option_context("mode.chained_assignment", None):
-                    converted = pd.to_datetime(valores_validos, errors="coerce", format="mixed")
-                if converted.notna().sum() / len(valores_validos) > 0.8:
-                    tipo_detectado = "datetime"
+                pd.to_numeric(valores_validos, errors="raise")
+                tipo_detectado = "numeric"
             except:
-                pass
-
-    exemplos = valores_validos.head(3).tolist()
-    exemplos_str = " | ".join([str(x)[:30] for x in exemplos])
-
-    log_tipagem.append({
-        "coluna": coluna,
-        "tipo_detectado": tipo_detectado,
-        "valores_unicos": valores_unicos,
-        "valores_nulos": valores_nulos,
-        "valores_preenchidos": valores_preenchidos,
-        "perc_preenchimento": round(valores_preenchidos / amostra_size * 100, 2),
-        "exemplos": exemplos_str
-    })
-
-df_tipagem = pd.DataFrame(log_tipagem)
-
-# ==============================
-# 3. NORMALIZA NULOS (geral)
-# ==============================
-print("\n🔄 Normalizando valores NULL...")
-cdr = cdr.replace({"NULL": pd.NA, "null": pd.NA, "": pd.NA, " ": pd.NA})
-cdr = cdr.infer_objects(copy=False)
-
-# ==============================
-# 4. TIPAGEM DE DADOS
-# ==============================
-colunas_datetime = [
-    "CallStartDt",
-    "DetectionDt",
-    "AnswerDt",
-    "WrapEndDt",
-    "CallInsertDt",
-    "CallEndDt",
-    "TimePhoneStartingRinging"
-]
-
-# Conversão de datas
-for col in colunas_datetime:
-    print(f"  → {col}...", end=" ")
-    cdr[col] = pd.to_datetime(cdr[col], errors="coerce")
-    nulls = cdr[col].isna().sum()
-    validos = len(cdr) - nulls
-    print(f"{validos:,} válidos, {nulls:,} nulos")
-
-# Numéricos
-cdr["SeqNum"] = pd.to_numeric(cdr["SeqNum"], errors="coerce")
-cdr["CallId"] = pd.to_numeric(cdr["CallId"], errors="coerce")
-
-# ==============================
-# 5. VERIFICAÇÃO DE QUALIDADE PRÉ-CÁLCULO
-# ==============================
-print("\n🔍 Verificando dados antes dos cálculos...")
-print(f"  CallStartDt válidos: {cdr['CallStartDt'].notna().sum():,}")
-print(f"  AnswerDt válidos: {cdr['AnswerDt'].notna().sum():,}")
-print(f"  WrapEndDt válidos: {cdr['WrapEndDt'].notna().sum():,}")
-print(f"  TimePhoneStartingRinging válidos: {cdr['TimePhoneStartingRinging'].notna().sum():,}")
-
-# ==============================
-# 6. MÉTRICAS DE TEMPO
-# ==============================
-cdr["ring_time_sec"] = (cdr["AnswerDt"] - cdr["TimePhoneStartingRinging"]).dt.total_seconds()
-cdr["talk_time_sec"] = (cdr["WrapEndDt"] - cdr["AnswerDt"]).dt.total_seconds()
-cdr["call_duration_sec"] = (cdr["CallEndDt"] - cdr["CallStartDt"]).dt.total_seconds()
-cdr["wrap_time_sec"] = (cdr["WrapEndDt"] - cdr["CallEndDt"]).dt.total_seconds()
-
-# invalida negativos
-for col in ["ring_time_sec", "talk_time_sec", "call_duration_sec", "wrap_time_sec"]:
-    cdr.loc[cdr[col] < 0, col] = pd.NA
-
-# ==============================
-# 7. FLAGS DE NEGÓCIO (SLA 0/1 garantido)
-# ==============================
-cdr["atendida"] = cdr["AnswerDt"].notna().astype("int8")
-
-# ring válido: existe, não é NA e >=0
-ring_valido = cdr["ring_time_sec"].notna()
-
-# SLA: somente se atendida e ring_valido e dentro do limite
-cdr["sla_15s"] = ((cdr["atendida"] == 1) & ring_valido & (cdr["ring_time_sec"] <= 15)).astype("int8")
-cdr["sla_30s"] = ((cdr["atendida"] == 1) & ring_valido & (cdr["ring_time_sec"] <= 30)).astype("int8")
+                try:
+                    formato = detectar_formato_data(valores_validos)
+                    converted = pd.to_datetime(valores_validos, errors="coerce", format=formato)
+                    if converted.notna().sum() / len(valores_validos) > 0.8:
+                        tipo_detectado = "datetime"
+                except:
+                    pass
+
+        exemplos = valores_validos.head(3).tolist()
+        exemplos_str = " | ".join([str(x)[:30] for x in exemplos])
+
+        log_tipagem.append({
+            "coluna": coluna,
+            "tipo_detectado": tipo_detectado,
+            "valores_unicos": valores_unicos,
+            "valores_nulos": valores_nulos,
+            "valores_preenchidos": valores_preenchidos,
+            "perc_preenchimento": round(valores_preenchidos / amostra_size * 100, 2),
+            "exemplos": exemplos_str
+        })
+
+    return pd.DataFrame(log_tipagem)
+
+def tratar_cdr(cdr: pd.DataFrame) -> pd.DataFrame:
+    """Métricas de tempo, flags de SLA, hora/data, normalização de grupo/disposition e chave única"""
+    # ==============================
+    # 6. MÉTRICAS DE TEMPO
+    # ==============================
+    cdr["ring_time_sec"] = (cdr["AnswerDt"] - cdr["TimePhoneStartingRinging"]).dt.total_seconds()
+    cdr["talk_time_sec"] = (cdr["WrapEndDt"] - cdr["AnswerDt"]).dt.total_seconds()
+    cdr["call_duration_sec"] = (cdr["CallEndDt"] - cdr["CallStartDt"]).dt.total_seconds()
+    cdr["wrap_time_sec"] = (cdr["WrapEndDt"] - cdr["CallEndDt"]).dt.total_seconds()
+
+    # invalida negativos
+    for col in COLUNAS_TEMPO_SEC:
+        cdr.loc[cdr[col] < 0, col] = pd.NA
+
+    # ==============================
+    # 7. FLAGS DE NEGÓCIO (SLA 0/1 garantido)
+    # ==============================
+    cdr["atendida"] = cdr["AnswerDt"].notna().astype("int8")
+
+    # ring válido: existe, não é NA e >=0
+    ring_valido = cdr["ring_time_sec"].notna()
+
+    # SLA: somente se atendida e ring_valido e dentro do limite
+    # (flags mantidas na base tratada/BigQuery; os relatórios usam o histograma do SLA_CDR)
+    cdr["sla_15s"] = ((cdr["atendida"] == 1) & ring_valido & (cdr["ring_time_sec"] <= 15)).astype("int8")
+    cdr["sla_30s"] = ((cdr["atendida"] == 1) & ring_valido & (cdr["ring_time_sec"] <= 30)).astype("int8")
+
+    # SLA nunca pode ser 1 se não atendida
+    cdr.loc[cdr["atendida"] == 0, ["sla_15s", "sla_30s"]] = 0
+
+    # hora/data direto do datetime (sem criar objetos date do Python)
+    cdr["hora"] = cdr["CallStartDt"].dt.hour.astype("Int8")
+    cdr["data"] = cdr["CallStartDt"].dt.normalize().astype("date32[pyarrow]")
+
+    # ==============================
+    # 7.1 NORMALIZA GRUPO DE RECURSOS E DISPOSITION
+    # ==============================
+    cdr["ResourceGroupDesc"] = cdr["ResourceGroupDesc"].fillna("SEM_GRUPO").astype(str).str.strip()
+    cdr.loc[cdr["ResourceGroupDesc"].eq(""), "ResourceGroupDesc"] = "SEM_GRUPO"
+
+    cdr["Disposition_Desc"] = cdr["Disposition_Desc"].fillna("SEM_DISPOSITION").astype(str).str.strip()
+    cdr.loc[cdr["Disposition_Desc"].eq(""), "Disposition_Desc"] = "SEM_DISPOSITION"
+
+    # ==============================
+    # 8 CHAVE ÚNICA (evita 'nan_nan')
+    # ==============================
+    # CallId + SeqNum empacotados em int64 (ver CHAVE_CDR), com sentinela para parte
+    # ausente; unicidade, duplicidade e contagens rodam sobre o inteiro e o texto
+    # 'CallId_SeqNum' só é gerado na exportação do CSV.
+    cdr["chave_unica"] = empacotar_chave(cdr["CallId"], cdr["SeqNum"])
+    # CallId/SeqNum fora da faixa do layout: chave larga (hash), contada na qualidade
+    largas = chave_larga(cdr["chave_unica"])
+    if largas.any():
+        exemplo = cdr.loc[largas, ["CallId", "SeqNum"]].iloc[0]
+        print(f"   ⚠️ {int(largas.sum()):,} registro(s) com CallId/SeqNum fora da faixa da chave empacotada "
+              f"(chave larga), ex.: CallId={exemplo['CallId']}, SeqNum={exemplo['SeqNum']}")
+
+    cols = cdr.columns.tolist()
+    cols = ["chave_unica"] + [col for col in cols if col != "chave_unica"]
+    cdr = cdr[cols]
+    return cdr
+
+def compactar_cdr(cdr: pd.DataFrame) -> pd.DataFrame:
+    """Converte o cdr tratado para tipos compactos (categorias, strings Arrow, float32)"""
+    for col in COLUNAS_CATEGORICAS:
+        cdr[col] = cdr[col].astype("category")
+
+    # Alta cardinalidade: string em memória Arrow em vez de objeto Python
+    cdr["DialedNum"] = cdr["DialedNum"].astype("string[pyarrow]")
+
+    # float32 tem precisão de milissegundos para durações de até ~2h
+    for col in COLUNAS_TEMPO_SEC:
+        cdr[col] = cdr[col].astype("float32")
+
+    cdr["hora"] = cdr["hora"].astype("Int8")
+    cdr["data"] = cdr["data"].astype("date32[pyarrow]")
+    return cdr
+
+def blocos_exportacao(cdr: pd.DataFrame, linhas_por_bloco=1_000_000):
+    """Fatia o cdr para exportação, convertendo a chave int64 para texto só no bloco"""
+    for inicio_bloco in range(0, len(cdr), linhas_por_bloco):
+        bloco = cdr.iloc[inicio_bloco:inicio_bloco + linhas_por_bloco]
+        yield inicio_bloco, bloco.assign(chave_unica=chave_para_texto(bloco["chave_unica"], bloco["CallId"], bloco["SeqNum"]))
+
+def salvar_csv_tratado(cdr: pd.DataFrame, caminho: Path, linhas_por_bloco=1_000_000, anexar=False):
+    """Grava o CSV tratado em blocos (anexar=True continua um arquivo já iniciado)
+
+    Atualiza os metadados ao lado do CSV (<arquivo>.meta.json) com a contagem de
+    registros, usada pelo IMPORTADOR_BQ para dimensionar os chunks sem varrer o arquivo.
+    """
+    registros_anteriores = 0
+    if anexar:
+        metadados = ler_metadados_csv(caminho)
+        registros_anteriores = metadados["registros"] if metadados else None
+
+    for inicio_bloco, bloco in blocos_exportacao(cdr, linhas_por_bloco):
+        novo_arquivo = inicio_bloco == 0 and not anexar
+        bloco.to_csv(
+            caminho,
+            index=False,
+            encoding="utf-8-sig" if novo_arquivo else "utf-8",
+            mode="w" if novo_arquivo else "a",
+            header=novo_arquivo
+        )
 
-# SLA nunca pode ser 1 se não atendida
-cdr.loc[cdr["atendida"] == 0, ["sla_15s", "sla_30s"]] = 0
+    if registros_anteriores is not None and caminho.exists():
+        salvar_metadados_csv(caminho, registros_anteriores + len(cdr), cdr.columns)
+    else:
+        # contagem anterior ausente ou desatualizada: o importador volta a varrer o arquivo
+        caminho_metadados(caminho).unlink(missing_ok=True)
+
+def salvar_parquet_tratado(cdr: pd.DataFrame, pasta: Path, linhas_por_bloco=1_000_000, prefixo="parte", limpar=True):
+    """Grava o cdr tratado em parquet particionado (hive) por data/hora, mantendo os tipos"""
+    # Reescrita completa: partições de execuções anteriores não podem sobrar
+    if limpar and pasta.exists():
+        shutil.rmtree(pasta)
+
+    for inicio_bloco, bloco in blocos_exportacao(cdr, linhas_por_bloco):
+        tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+        pq.write_to_dataset(
+            tabela,
+            pasta,
+            partition_cols=["data", "hora"],
+            basename_template=f"{prefixo}-{inicio_bloco // linhas_por_bloco:05d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            row_group_size=LINHAS_POR_ROW_GROUP,
+            compression="snappy",
+            write_statistics=True
+        )
 
-cdr["hora"] = cdr["CallStartDt"].dt.hour
-cdr["data"] = cdr["CallStartDt"].dt.date
+def contar_qualidade(cdr: pd.DataFrame) -> dict:
+    """Contagens aditivas de qualidade (podem ser somadas entre lotes)"""
+    return {
+        "total_registros": len(cdr),
+        "callid_nulo": int(cdr["CallId"].isna().sum()),
+        "callstartdt_nulo": int(cdr["CallStartDt"].isna().sum()),
+        "chaves_largas": int(chave_larga(cdr["chave_unica"]).sum()),
+    }
 
-# ==============================
-# 7.1 NORMALIZA GRUPO DE RECURSOS
-# ==============================
-cdr["ResourceGroupDesc"] = cdr["ResourceGroupDesc"].fillna("SEM_GRUPO").astype(str).str.strip()
-cdr.loc[cdr["ResourceGroupDesc"].eq(""), "ResourceGroupDesc"] = "SEM_GRUPO"
+def somar_contadores(acumulado: dict, novo: dict) -> dict:
+    return {k: acumulado.get(k, 0) + v for k, v in novo.items()}
+
+# ------------------------------
+# MODO STREAMING
+# ------------------------------
+def montar_agregados(cdr: pd.DataFrame) -> dict:
+    """Estruturas somáveis do cdr tratado: cubo, sketch de quantis, histograma de ring e eventos de concorrência"""
+    return {
+        "cubo": montar_cubo(cdr),
+        "sketch": montar_sketch(cdr),
+        "histograma_ring": montar_histograma_ring(cdr),
+        "eventos_concorrencia": montar_eventos_concorrencia(cdr),
+    }
 
-# ==============================
-# 8 CHAVE ÚNICA (evita 'nan_nan')
-# ==============================
-print("\n🔑 Criando chave única...")
+def somar_agregados(acumulado, novo: dict) -> dict:
+    """Soma os agregados de um lote aos já acumulados (None = nenhum lote ainda)"""
+    if acumulado is None:
+        return novo
+    return {
+        "cubo": somar_cubos([acumulado["cubo"], novo["cubo"]]),
+        "sketch": somar_sketches([acumulado["sketch"], novo["sketch"]]),
+        "histograma_ring": somar_histogramas([acumulado["histograma_ring"], novo["histograma_ring"]]),
+        "eventos_concorrencia": somar_eventos(acumulado["eventos_concorrencia"], novo["eventos_concorrencia"]),
+    }
 
-cdr["CallId_int"] = cdr["CallId"].astype("Int64")
-cdr["SeqNum_int"] = cdr["SeqNum"].astype("Int64")
+def novo_estado_streaming(tamanho_amostra=10000):
+    """Estado acumulado entre lotes: agregados somáveis, contadores, cadeias abertas, chaves vistas e amostra para a tipagem"""
+    return {
+        "lotes": 0,
+        "agregados": None,
+        "contadores": {},
+        "cadeias": novas_cadeias(),
+        "chaves": None,
+        "chaves_unicas": 0,
+        "amostra": None,
+        "tamanho_amostra": tamanho_amostra,
+        "rng": np.random.default_rng(42),
+    }
 
-cdr["chave_unica"] = (
-    cdr["CallId_int"].astype(str).replace("<NA>", "SEM_CALLID")
-    + "_"
-    + cdr["SeqNum_int"].astype(str).replace("<NA>", "SEM_SEQNUM")
-)
+def amostrar_lote(estado: dict, df: pd.DataFrame):
+    """Amostra uniforme sobre todos os lotes: mantém as linhas de menor prioridade aleatória"""
+    n = estado["tamanho_amostra"]
+    prioridade = estado["rng"].random(len(df))
+    if len(df) > n:
+        menores = np.argpartition(prioridade, n)[:n]
+        df, prioridade = df.iloc[menores], prioridade[menores]
+
+    lote = df.assign(_prioridade=prioridade)
+    if estado["amostra"] is not None:
+        lote = pd.concat([estado["amostra"], lote], ignore_index=True)
+    estado["amostra"] = lote.nsmallest(n, "_prioridade")
+
+def acumular_lote(estado: dict, df: pd.DataFrame):
+    """Trata um lote, grava a saída incrementalmente e soma suas estatísticas ao estado"""
+    amostrar_lote(estado, df)
+
+    df = compactar_cdr(tratar_cdr(df))
+    primeiro = estado["lotes"] == 0
+    if primeiro:
+        # intermediários do streaming anterior (cadeias fechadas e chaves vistas)
+        shutil.rmtree(PASTA_CADEIAS_PARTES, ignore_errors=True)
+        shutil.rmtree(PASTA_CHAVES_STREAMING, ignore_errors=True)
+        estado["chaves"] = IndiceChaves(PASTA_CHAVES_STREAMING)
+
+    salvar_csv_tratado(df, ARQUIVO_TRATADO, anexar=not primeiro)
+    if SALVAR_PARQUET:
+        salvar_parquet_tratado(df, PASTA_PARQUET, prefixo=f"lote-{estado['lotes']:05d}", limpar=primeiro)
+
+    estado["agregados"] = somar_agregados(estado["agregados"], montar_agregados(df))
+    estado["contadores"] = somar_contadores(estado["contadores"], contar_qualidade(df))
+    somar_cadeias(estado["cadeias"], montar_segmentos(df, JANELAS_CADEIA_S), JANELAS_CADEIA_S, PASTA_CADEIAS_PARTES)
+    contar_chaves_lote(estado, df)
+    estado["lotes"] += 1
+
+def contar_chaves_lote(estado: dict, df: pd.DataFrame):
+    """Soma as chaves do lote ainda não vistas (o conjunto das já vistas fica no índice em disco)"""
+    chaves = np.unique(df["chave_unica"].to_numpy(dtype="int64"))
+    novas = chaves[~estado["chaves"].contem(chaves)]
+    estado["chaves"].adicionar(f"lote-{estado['lotes']:05d}", None, novas)
+    estado["chaves"].salvar()
+    estado["chaves_unicas"] += len(novas)
+
+def finalizar_estado(estado: dict):
+    """Fecha o estado do streaming: (agregados com as cadeias, contadores com unicidade, amostra)"""
+    contadores = dict(estado["contadores"])
+    contadores["chaves_unicas"] = estado["chaves_unicas"]
+    contadores["duplicatas_chave_unica"] = contadores["total_registros"] - estado["chaves_unicas"]
+    amostra = estado["amostra"].drop(columns="_prioridade")
+    return {**estado["agregados"], "cadeias": estado["cadeias"]}, contadores, amostra
+
+def novo_resumo_leitura():
+    """Diagnóstico acumulado da leitura (None = leitor não informa linhas descartadas / tokens nulos, ex.: pandas)"""
+    return {"linhas_malformadas": None, "linhas_incompletas": None, "tokens_nulos": None, "datas_invalidas": {}, "registros_lidos": 0,
+            "chaves_ja_processadas": None, "chaves_repetidas": []}
+
+def registrar_leitura(leitura: dict, nome: str, df: pd.DataFrame, diagnostico: dict, origem: str):
+    """Mostra o resultado da leitura de um arquivo e soma seu diagnóstico ao resumo"""
+    malformadas = diagnostico["linhas_malformadas"]
+    incompletas = diagnostico.get("linhas_incompletas")
+    detalhe = " (cache)" if origem == "cache" else ""
+    if malformadas:
+        detalhe += f", {malformadas} linha(s) malformada(s) descartada(s)"
+    if incompletas:
+        detalhe += f", {incompletas} linha(s) com campos a menos completada(s) com nulo"
+    print(f"  ✓ {nome}: {len(df)} registros válidos{detalhe}")
+    for col, info in diagnostico["datas_invalidas"].items():
+        print(f"    ⚠️ {col}: {info['linhas']} data(s) inválida(s) anulada(s), ex.: {' | '.join(info['exemplos'])}")
+
+    if malformadas is not None:
+        leitura["linhas_malformadas"] = (leitura["linhas_malformadas"] or 0) + malformadas
+    if incompletas is not None:
+        leitura["linhas_incompletas"] = (leitura["linhas_incompletas"] or 0) + incompletas
+    if diagnostico["tokens_nulos"] is not None:
+        leitura["tokens_nulos"] = somar_contadores(leitura["tokens_nulos"] or {}, diagnostico["tokens_nulos"])
+    leitura["datas_invalidas"] = somar_datas_invalidas(leitura["datas_invalidas"], diagnostico["datas_invalidas"])
+    leitura["registros_lidos"] += len(df)
+
+def conferir_chaves_historicas(indice, leitura: dict, nome: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Confere as chaves de um arquivo novo/alterado no índice persistente: marca ou descarta as já processadas"""
+    if indice is None:
+        return df
+    leitura["chaves_ja_processadas"] = leitura["chaves_ja_processadas"] or 0
+    versao = indice.versao_arquivo(PASTA_BASE / nome)
+    if indice.arquivo_incorporado(nome, versao):
+        return df
+
+    # as chaves da versão anterior do próprio arquivo (se alterado) não contam como repetidas
+    chaves = empacotar_chave(df["CallId"], df["SeqNum"]).to_numpy()
+    vistas = indice.contem(chaves, ignorar=nome)
+    indice.adicionar(nome, versao, chaves)
+    repetidas = int(vistas.sum())
+    if repetidas == 0:
+        return df
+
+    leitura["chaves_ja_processadas"] += repetidas
+    leitura["chaves_repetidas"].append((nome, chaves[vistas]))
+    acao = "descartada(s)" if DESCARTAR_CHAVES_REPETIDAS else "marcada(s)"
+    print(f"    ⚠️ {repetidas:,} chave(s) já processada(s) em execução anterior {acao}")
+    return df[~vistas].reset_index(drop=True) if DESCARTAR_CHAVES_REPETIDAS else df
+
+def salvar_indice_chaves(indice, medidor: MedidorEtapas):
+    """Incorpora ao índice as chaves dos arquivos novos/alterados desta execução"""
+    if indice is None:
+        return
+    medidor.iniciar("16. índice de chaves")
+    novas = indice.salvar()
+    medidor.encerrar()
+    print(f"   ✓ Índice de chaves: +{novas:,} chave(s), {indice.total_chaves:,} no total "
+          f"({len(indice.segmentos)} segmento(s))")
+
+# ------------------------------
+# MODO MONITORAMENTO
+# ------------------------------
+def arquivos_estaveis(espera_s: float) -> dict:
+    """Arquivos da PASTA_BASE sem alteração há pelo menos espera_s -> (tamanho, mtime)"""
+    agora = time.time()
+    estaveis = {}
+    for arquivo in sorted(PASTA_BASE.glob("*.csv")):
+        try:
+            stat = arquivo.stat()
+        except FileNotFoundError:
+            continue
+        if agora - stat.st_mtime >= espera_s:
+            estaveis[arquivo] = (stat.st_size, stat.st_mtime)
+    return estaveis
+
+def acumular_leituras(estado: dict, leitura: dict, resultados, indice=None):
+    """Trata e soma ao estado cada arquivo lido (mesmo fluxo do MODO_STREAMING)"""
+    for nome, df, erro, diagnostico, origem in resultados:
+        if erro is not None:
+            print(f"  ✗ ERRO ao ler {nome}: {erro}")
+            continue
+        registrar_leitura(leitura, nome, df, diagnostico, origem)
+        df = conferir_chaves_historicas(indice, leitura, nome, df)
+        acumular_lote(estado, df)
 
-# remove colunas auxiliares
-cdr.drop(columns=["CallId_int", "SeqNum_int"], inplace=True)
+def monitorar_bases(intervalo_s=INTERVALO_MONITORAMENTO_S, espera_s=ESPERA_ARQUIVO_ESTAVEL_S):
+    """Laço do modo monitoramento: a cada arquivo novo, atualiza saídas, anomalias e relatório"""
+    print(f"👀 Monitorando {PASTA_BASE} a cada {intervalo_s}s (Ctrl+C para encerrar)...")
+    processados = {}
+    estado = leitura = None
+    indice = IndiceChaves(PASTA_INDICE_CHAVES) if USAR_INDICE_CHAVES else None
 
-cols = cdr.columns.tolist()
-cols = ["chave_unica"] + [col for col in cols if col != "chave_unica"]
-cdr = cdr[cols]
+    try:
+        while True:
+            estaveis = arquivos_estaveis(espera_s)
+            existentes = set(PASTA_BASE.glob("*.csv"))
+            alterados = [
+                a for a, assinatura in processados.items()
+                if a not in existentes or estaveis.get(a, assinatura) != assinatura
+            ]
+            novos = [a for a in estaveis if a not in processados]
+
+            if not novos and not alterados:
+                time.sleep(intervalo_s)
+                continue
 
-print(f"   ✓ Chave única criada: {cdr['chave_unica'].nunique():,} registros únicos")
+            t_inicio = time.perf_counter()
+            medidor = MedidorEtapas()
+
+            if estado is None or alterados:
+                # reconstrução: arquivos sem alteração vêm do cache da leitura incremental
+                if alterados:
+                    print(f"\n♻️  Arquivo(s) alterado(s)/removido(s): {', '.join(a.name for a in alterados)}. Reconstruindo estado...")
+                arquivos = sorted(estaveis)
+                estado, leitura, processados = novo_estado_streaming(), novo_resumo_leitura(), {}
+                if LEITURA_INCREMENTAL:
+                    resultados = ler_arquivos_incremental(arquivos, PASTA_CACHE, num_workers=NUM_WORKERS_LEITURA, leitor=LEITOR_CSV)
+                else:
+                    resultados = ((*r, "leitura") for r in ler_arquivos_cdr(arquivos, num_workers=NUM_WORKERS_LEITURA, leitor=LEITOR_CSV))
+            else:
+                arquivos = novos
+                print(f"\n📥 Novo(s) arquivo(s): {', '.join(a.name for a in novos)}")
+                resultados = ((*r, "leitura") for r in ler_arquivos_cdr(arquivos, num_workers=1, leitor=LEITOR_CSV))
+
+            etapa = medidor.iniciar("1. leitura + tratamento (monitoramento)")
+            acumular_leituras(estado, leitura, resultados, indice)
+            processados.update({a: estaveis[a] for a in arquivos})
+            registrar_saida(etapa, linhas=leitura["registros_lidos"])
+
+            if estado["lotes"] == 0:
+                medidor.encerrar()
+                print("   ⏳ Nenhum arquivo válido ainda; aguardando...")
+                time.sleep(intervalo_s)
+                continue
 
-# ==============================
-# 9 DETECÇÃO DE ANOMALIAS
-# ==============================
-print("\n🚨 Detectando anomalias (hora e grupo)...")
+            etapa = medidor.iniciar("1.1 finalização do streaming", leitura["registros_lidos"])
+            agregados, contadores, amostra = finalizar_estado(estado)
+            df_tipagem = analisar_tipagem(amostra)
+            registrar_saida(etapa, agregados["cubo"])
+
+            caminho = gerar_relatorios(agregados, contadores, df_tipagem, leitura, medidor)
+            salvar_indice_chaves(indice, medidor)
+            medidor.salvar(ARQUIVO_LOG_EXECUCAO, ARQUIVO_LOG_ETAPAS, contexto={
+                "modo_monitoramento": True,
+                "leitor_csv": LEITOR_CSV,
+                "arquivos": len(processados),
+                "registros": contadores["total_registros"],
+            })
+            print(f"\n🔄 KPIs atualizados em {time.perf_counter() - t_inicio:.1f}s: "
+                  f"{len(processados)} arquivo(s), {contadores['total_registros']:,} registros ({caminho.name})")
+            time.sleep(intervalo_s)
+    except KeyboardInterrupt:
+        print("\n⏹ Monitoramento encerrado")
+
+def memoria_por_coluna(df: pd.DataFrame) -> pd.Series:
+    """Memória (MB) ocupada por coluna, incluindo o conteúdo das strings"""
+    return df.memory_usage(deep=True, index=False) / 1024 / 1024
 
 def zscore(series: pd.Series) -> pd.Series:
     s = pd.to_numeric(series, errors="coerce")
@@ -247,479 +585,704 @@ def zscore(series: pd.Series) -> pd.Series:
         return pd.Series([0] * len(s), index=s.index)
     return (s - mean) / std
 
-# ---------- (A) Anomalias por HORA ----------
-agg_hora = (
-    cdr.groupby("hora", dropna=False)
-       .agg(
-           total_chamadas=("chave_unica", "count"),
-           atendidas=("atendida", "sum"),
-           sla_15=("sla_15s", "sum"),
-           sla_30=("sla_30s", "sum"),
-           ring_medio=("ring_time_sec", "mean"),
-           talk_medio=("talk_time_sec", "mean"),
-       )
-       .reset_index()
-)
-
-agg_hora["taxa_atendimento"] = np.where(
-    agg_hora["total_chamadas"] > 0,
-    agg_hora["atendidas"] / agg_hora["total_chamadas"],
-    np.nan
-)
-
-agg_hora["sla15_rate"] = np.where(
-    agg_hora["atendidas"] > 0,
-    agg_hora["sla_15"] / agg_hora["atendidas"],
-    np.nan
-)
+def juntar_sla(agg: pd.DataFrame, sla: pd.DataFrame, chaves) -> pd.DataFrame:
+    """Acrescenta sla_<T>/sla<T>_rate ao agregado (chave sem atendidas: contagem 0 e taxa NaN)"""
+    agg = agg.merge(sla, on=chaves, how="left")
+    contagens = [c for c in sla.columns if c.startswith("sla_")]
+    agg[contagens] = agg[contagens].fillna(0).astype("int64")
+    return agg
+
+def processar_em_memoria(dfs, medidor: MedidorEtapas):
+    """Modo padrão: concatena todos os arquivos e trata o cdr inteiro (seções 2 a 8.1)"""
+    if not dfs:
+        raise ValueError("❌ Nenhum arquivo foi carregado com sucesso!")
+
+    etapa = medidor.iniciar("1.1 concatenação", sum(len(df) for df in dfs))
+    cdr = pd.concat(dfs, ignore_index=True)
+    dfs.clear()
+    registrar_saida(etapa, cdr)
+    print(f"\n✅ Total de registros carregados: {len(cdr)}")
+
+    # ==============================
+    # 2. ANÁLISE DE TIPAGEM
+    # ==============================
+    # Datas e identificadores já chegam tipados da leitura (por arquivo, ver LEITURA_CDR);
+    # para essas colunas o tipo vem do dtype, as demais seguem a detecção pelos valores.
+    etapa = medidor.iniciar("2. tipagem", len(cdr))
+    df_tipagem = analisar_tipagem(cdr.sample(n=min(10000, len(cdr)), random_state=42))
+    registrar_saida(etapa, df_tipagem)
+
+    # ==============================
+    # 3. NORMALIZA NULOS (geral)
+    # ==============================
+    # Feita no parse de cada arquivo com a política única TOKENS_NULOS (LEITURA_CDR);
+    # as ocorrências de cada token entram no relatório de qualidade.
+
+    # ==============================
+    # 4. TIPAGEM DE DADOS
+    # ==============================
+    # A conversão é feita por arquivo na leitura (tipar_cdr), o que permite guardar
+    # cada arquivo já tipado no cache; aqui só reporta o resultado.
+    etapa = medidor.iniciar("4-5. verificação pré-cálculo", len(cdr))
+    for col in COLUNAS_DATETIME:
+        print(f"  → {col}...", end=" ")
+        nulls = cdr[col].isna().sum()
+        validos = len(cdr) - nulls
+        print(f"{validos:,} válidos, {nulls:,} nulos")
+
+    # ==============================
+    # 5. VERIFICAÇÃO DE QUALIDADE PRÉ-CÁLCULO
+    # ==============================
+    print("\n🔍 Verificando dados antes dos cálculos...")
+    print(f"  CallStartDt válidos: {cdr['CallStartDt'].notna().sum():,}")
+    print(f"  AnswerDt válidos: {cdr['AnswerDt'].notna().sum():,}")
+    print(f"  WrapEndDt válidos: {cdr['WrapEndDt'].notna().sum():,}")
+    print(f"  TimePhoneStartingRinging válidos: {cdr['TimePhoneStartingRinging'].notna().sum():,}")
+
+    # ==============================
+    # 6-8. MÉTRICAS, FLAGS, NORMALIZAÇÃO E CHAVE ÚNICA (ver tratar_cdr)
+    # ==============================
+    print("\n🔑 Calculando métricas e criando chave única...")
+    etapa = medidor.iniciar("6-8. métricas, flags e chave única", len(cdr))
+    cdr = tratar_cdr(cdr)
+    registrar_saida(etapa, cdr)
+
+    print(f"   ✓ Chave única criada: {cdr['chave_unica'].nunique():,} registros únicos")
+
+    # ==============================
+    # 8.1 LAYOUT COMPACTO EM MEMÓRIA
+    # ==============================
+    print("\n🗜️ Compactando tipos do cdr tratado...")
+    etapa = medidor.iniciar("8.1 compactação", len(cdr))
+    memoria_antes = memoria_por_coluna(cdr)
+    tipos_antes = cdr.dtypes.astype(str)
+
+    cdr = compactar_cdr(cdr)
+    registrar_saida(etapa, cdr)
+
+    memoria_depois = memoria_por_coluna(cdr)
+    df_memoria = pd.DataFrame({
+        "tipo_antes": tipos_antes,
+        "mb_antes": memoria_antes.round(2),
+        "tipo_depois": cdr.dtypes.astype(str),
+        "mb_depois": memoria_depois.round(2),
+    })
+    alteradas = df_memoria[df_memoria["tipo_antes"] != df_memoria["tipo_depois"]]
+    for col, row in alteradas.iterrows():
+        print(f"   • {col}: {row['tipo_antes']} {row['mb_antes']:,.2f} MB → {row['tipo_depois']} {row['mb_depois']:,.2f} MB")
+    print(f"   ✓ Memória total: {memoria_antes.sum():,.2f} MB → {memoria_depois.sum():,.2f} MB")
+
+    etapa = medidor.iniciar("9. cubo de agregação", len(cdr))
+    agregados = montar_agregados(cdr)
+    # em memória todas as cadeias ficam abertas (mesma regra de janela do streaming)
+    agregados["cadeias"] = {**novas_cadeias(), **montar_segmentos(cdr, JANELAS_CADEIA_S)}
+    contadores = contar_qualidade(cdr)
+    contadores["chaves_unicas"] = int(cdr["chave_unica"].nunique())
+    contadores["duplicatas_chave_unica"] = int(cdr["chave_unica"].duplicated().sum())
+    registrar_saida(etapa, agregados["cubo"])
+
+    # ==============================
+    # 12. SALVAR CSV TRATADO
+    # ==============================
+    print("\n💾 Salvando CSV tratado...")
+    etapa = medidor.iniciar("12. csv tratado", len(cdr))
+    salvar_csv_tratado(cdr, ARQUIVO_TRATADO)
+    registrar_saida(etapa, linhas=len(cdr))
+    print(f"   ✓ CDR tratado salvo: {ARQUIVO_TRATADO.name}")
+
+    if SALVAR_PARQUET:
+        print("\n💾 Salvando parquet tratado (particionado por data/hora)...")
+        etapa = medidor.iniciar("12. parquet tratado", len(cdr))
+        salvar_parquet_tratado(cdr, PASTA_PARQUET)
+        registrar_saida(etapa, linhas=len(cdr))
+        print(f"   ✓ Parquet salvo em: {PASTA_PARQUET.name}/")
+
+    medidor.encerrar()
+    return agregados, contadores, df_tipagem
+
+def gerar_relatorios(agregados: dict, contadores: dict, df_tipagem: pd.DataFrame,
+                     leitura: dict, medidor: MedidorEtapas) -> Path:
+    """Seções 9 a 15 a partir dos agregados (cubo, sketch de quantis, histograma de ring, eventos
+    de concorrência, cadeias de tentativas) e dos contadores (anomalias, percentis, SLA, concorrência,
+    tentativas, disposition, qualidade, resumo, Excel e baseline). Retorna o caminho do Excel gravado"""
+    cubo = agregados["cubo"]
+    sketch = agregados["sketch"]
+    histograma_ring = agregados["histograma_ring"]
+    eventos_concorrencia = agregados["eventos_concorrencia"]
+    cadeias = agregados["cadeias"]
+    linhas_malformadas = leitura["linhas_malformadas"]
+    linhas_incompletas = leitura["linhas_incompletas"]
+    tokens_nulos = leitura["tokens_nulos"]
+    datas_invalidas = leitura["datas_invalidas"]
+
+    # ==============================
+    # 9 DETECÇÃO DE ANOMALIAS
+    # ==============================
+    print("\n🚨 Detectando anomalias (hora e grupo)...")
+    etapa = medidor.iniciar("9. anomalias", len(cubo))
+
+    # Cubo hora × grupo × disposition com contagens e somas (uma passada sobre o
+    # cdr, ou a soma dos cubos de cada arquivo no streaming). Todas as tabelas das
+    # seções 9, 10 e 13 saem de consolidações do cubo.
+    colunas_agg = ["total_chamadas", "atendidas", "ring_medio", "talk_medio"]
+
+    # ---------- (A) Anomalias por HORA ----------
+    agg_hora = consolidar_cubo(cubo, ["hora"])[["hora"] + colunas_agg]
+
+    agg_hora["taxa_atendimento"] = np.where(
+        agg_hora["total_chamadas"] > 0,
+        agg_hora["atendidas"] / agg_hora["total_chamadas"],
+        np.nan
+    )
 
-agg_hora["sla30_rate"] = np.where(
-    agg_hora["atendidas"] > 0,
-    agg_hora["sla_30"] / agg_hora["atendidas"],
-    np.nan
-)
+    agg_hora = juntar_sla(agg_hora, taxas_sla(histograma_ring, ["hora"], LIMITES_SLA), ["hora"])
 
-agg_hora["z_volume"] = zscore(agg_hora["total_chamadas"])
-agg_hora["z_taxa_atendimento"] = zscore(agg_hora["taxa_atendimento"])
-
-VOLUME_K = 1.5
-TAXA_Z = -2.0
-
-if agg_hora["total_chamadas"].count() < 8:
-    print("⚠️ Poucos pontos horários para z-score confiável. Flags de anomalia por HORA serão False.")
-    agg_hora["anomalia_volume"] = False
-    agg_hora["anomalia_taxa_atendimento"] = False
-else:
-    agg_hora["anomalia_volume"] = agg_hora["z_volume"].abs() >= VOLUME_K
-    agg_hora["anomalia_taxa_atendimento"] = agg_hora["z_taxa_atendimento"] <= TAXA_Z
-
-agg_hora["flag_anomalia"] = agg_hora["anomalia_volume"] | agg_hora["anomalia_taxa_atendimento"]
-
-agg_hora["motivo_anomalia"] = ""
-agg_hora.loc[agg_hora["anomalia_volume"], "motivo_anomalia"] += "VOLUME_FORA_PADRAO; "
-agg_hora.loc[agg_hora["anomalia_taxa_atendimento"], "motivo_anomalia"] += "TAXA_ATENDIMENTO_BAIXA; "
-agg_hora["motivo_anomalia"] = agg_hora["motivo_anomalia"].str.strip()
-
-# ---------- (B) Anomalias por GRUPO ----------
-agg_grupo = (
-    cdr.groupby("ResourceGroupDesc", dropna=False)
-       .agg(
-           total_chamadas=("chave_unica", "count"),
-           atendidas=("atendida", "sum"),
-           sla_15=("sla_15s", "sum"),
-           sla_30=("sla_30s", "sum"),
-           ring_medio=("ring_time_sec", "mean"),
-           talk_medio=("talk_time_sec", "mean"),
-       )
-       .reset_index()
-)
+    agg_hora["z_volume"] = zscore(agg_hora["total_chamadas"])
+    agg_hora["z_taxa_atendimento"] = zscore(agg_hora["taxa_atendimento"])
 
-agg_grupo["taxa_atendimento"] = np.where(
-    agg_grupo["total_chamadas"] > 0,
-    agg_grupo["atendidas"] / agg_grupo["total_chamadas"],
-    np.nan
-)
+    VOLUME_K = 1.5
+    TAXA_Z = -2.0
 
-agg_grupo["sla15_rate"] = np.where(
-    agg_grupo["atendidas"] > 0,
-    agg_grupo["sla_15"] / agg_grupo["atendidas"],
-    np.nan
-)
+    # Cada data da execução contra o baseline histórico do mesmo dia da semana,
+    # antes de incorporar os dias desta execução (ver seção 15)
+    observacoes = observacoes_diarias(cubo)
+    baseline, _ = carregar_baseline(PASTA_BASELINE)
+    df_historico = pontuar_observacoes(observacoes, baseline, VOLUME_K, TAXA_Z)
 
-agg_grupo["sla30_rate"] = np.where(
-    agg_grupo["atendidas"] > 0,
-    agg_grupo["sla_30"] / agg_grupo["atendidas"],
-    np.nan
-)
+    def anomalias_historicas(nivel, chave):
+        """Flag do histórico por valor da chave (qualquer data da execução)"""
+        flags = df_historico[df_historico["nivel"] == nivel].groupby(chave)["flag_anomalia_hist"].any()
+        return flags.rename("anomalia_historica")
 
-agg_grupo["z_volume"] = zscore(agg_grupo["total_chamadas"])
-agg_grupo["z_taxa_atendimento"] = zscore(agg_grupo["taxa_atendimento"])
+    if agg_hora["total_chamadas"].count() < 8:
+        print("⚠️ Poucos pontos horários para z-score confiável. Flags de anomalia por HORA vêm só do histórico.")
+        agg_hora["anomalia_volume"] = False
+        agg_hora["anomalia_taxa_atendimento"] = False
+    else:
+        agg_hora["anomalia_volume"] = agg_hora["z_volume"].abs() >= VOLUME_K
+        agg_hora["anomalia_taxa_atendimento"] = agg_hora["z_taxa_atendimento"] <= TAXA_Z
 
-agg_grupo["anomalia_volume"] = agg_grupo["z_volume"].abs() >= VOLUME_K
-agg_grupo["anomalia_taxa_atendimento"] = agg_grupo["z_taxa_atendimento"] <= TAXA_Z
-agg_grupo["flag_anomalia"] = agg_grupo["anomalia_volume"] | agg_grupo["anomalia_taxa_atendimento"]
+    historico_hora = anomalias_historicas("hora", "hora")
+    # hora nula (CallStartDt inválido) não tem histórico
+    agg_hora["anomalia_historica"] = agg_hora["hora"].astype("Int64").map(historico_hora).fillna(False).astype(bool)
 
-agg_grupo["motivo_anomalia"] = ""
-agg_grupo.loc[agg_grupo["anomalia_volume"], "motivo_anomalia"] += "VOLUME_FORA_PADRAO; "
-agg_grupo.loc[agg_grupo["anomalia_taxa_atendimento"], "motivo_anomalia"] += "TAXA_ATENDIMENTO_BAIXA; "
-agg_grupo["motivo_anomalia"] = agg_grupo["motivo_anomalia"].str.strip()
+    agg_hora["flag_anomalia"] = (
+        agg_hora["anomalia_volume"] | agg_hora["anomalia_taxa_atendimento"] | agg_hora["anomalia_historica"]
+    )
 
-# ---------- (C) Anomalias por HORA×GRUPO ----------
-agg_hora_grupo = (
-    cdr.groupby(["hora", "ResourceGroupDesc"], dropna=False)
-       .agg(total_chamadas=("chave_unica", "count"), atendidas=("atendida", "sum"))
-       .reset_index()
-)
+    agg_hora["motivo_anomalia"] = ""
+    agg_hora.loc[agg_hora["anomalia_volume"], "motivo_anomalia"] += "VOLUME_FORA_PADRAO; "
+    agg_hora.loc[agg_hora["anomalia_taxa_atendimento"], "motivo_anomalia"] += "TAXA_ATENDIMENTO_BAIXA; "
+    agg_hora.loc[agg_hora["anomalia_historica"], "motivo_anomalia"] += "FORA_DO_HISTORICO; "
+    agg_hora["motivo_anomalia"] = agg_hora["motivo_anomalia"].str.strip()
 
-agg_hora_grupo["taxa_atendimento"] = np.where(
-    agg_hora_grupo["total_chamadas"] > 0,
-    agg_hora_grupo["atendidas"] / agg_hora_grupo["total_chamadas"],
-    np.nan
-)
+    # ---------- (B) Anomalias por GRUPO ----------
+    agg_grupo = consolidar_cubo(cubo, ["ResourceGroupDesc"])[["ResourceGroupDesc"] + colunas_agg]
 
-MIN_CHAMADAS_PARA_ANALISE = 30
-base_hg = agg_hora_grupo[agg_hora_grupo["total_chamadas"] >= MIN_CHAMADAS_PARA_ANALISE].copy()
+    agg_grupo["taxa_atendimento"] = np.where(
+        agg_grupo["total_chamadas"] > 0,
+        agg_grupo["atendidas"] / agg_grupo["total_chamadas"],
+        np.nan
+    )
 
-base_hg["z_taxa_atendimento_no_grupo"] = (
-    base_hg.groupby("ResourceGroupDesc")["taxa_atendimento"].transform(lambda s: zscore(s))
-)
+    agg_grupo = juntar_sla(agg_grupo, taxas_sla(histograma_ring, ["ResourceGroupDesc"], LIMITES_SLA), ["ResourceGroupDesc"])
 
-base_hg["anomalia_taxa_no_grupo"] = base_hg["z_taxa_atendimento_no_grupo"] <= TAXA_Z
+    agg_grupo["z_volume"] = zscore(agg_grupo["total_chamadas"])
+    agg_grupo["z_taxa_atendimento"] = zscore(agg_grupo["taxa_atendimento"])
 
-print(f"   ✓ Horas com anomalia: {int(agg_hora['flag_anomalia'].sum())}")
-print(f"   ✓ Grupos com anomalia: {int(agg_grupo['flag_anomalia'].sum())}")
+    agg_grupo["anomalia_volume"] = agg_grupo["z_volume"].abs() >= VOLUME_K
+    agg_grupo["anomalia_taxa_atendimento"] = agg_grupo["z_taxa_atendimento"] <= TAXA_Z
 
-# ==============================
-# 10. DISTRIBUIÇÃO POR DISPOSITION
-# ==============================
-cdr["Disposition_Desc"] = cdr["Disposition_Desc"].fillna("SEM_DISPOSITION").astype(str).str.strip()
-cdr.loc[cdr["Disposition_Desc"].eq(""), "Disposition_Desc"] = "SEM_DISPOSITION"
-
-df_disp = (
-    cdr.groupby("Disposition_Desc", dropna=False)
-       .size()
-       .reset_index(name="total_chamadas")
-       .sort_values("total_chamadas", ascending=False)
-)
-
-df_disp["perc_total"] = (df_disp["total_chamadas"] / len(cdr) * 100).round(2)
-
-df_disp_hora = (
-    cdr.groupby(["hora", "Disposition_Desc"], dropna=False)
-       .size()
-       .reset_index(name="total_chamadas")
-       .sort_values(["hora", "total_chamadas"], ascending=[True, False])
-)
+    historico_grupo = anomalias_historicas("grupo", "ResourceGroupDesc")
+    agg_grupo["anomalia_historica"] = (
+        agg_grupo["ResourceGroupDesc"].astype(str).map(historico_grupo).fillna(False).astype(bool)
+    )
+    agg_grupo["flag_anomalia"] = (
+        agg_grupo["anomalia_volume"] | agg_grupo["anomalia_taxa_atendimento"] | agg_grupo["anomalia_historica"]
+    )
 
-total_por_hora = cdr.groupby("hora").size().reset_index(name="total_hora")
-df_disp_hora = df_disp_hora.merge(total_por_hora, on="hora", how="left")
-df_disp_hora["perc_na_hora"] = (df_disp_hora["total_chamadas"] / df_disp_hora["total_hora"] * 100).round(2)
+    agg_grupo["motivo_anomalia"] = ""
+    agg_grupo.loc[agg_grupo["anomalia_volume"], "motivo_anomalia"] += "VOLUME_FORA_PADRAO; "
+    agg_grupo.loc[agg_grupo["anomalia_taxa_atendimento"], "motivo_anomalia"] += "TAXA_ATENDIMENTO_BAIXA; "
+    agg_grupo.loc[agg_grupo["anomalia_historica"], "motivo_anomalia"] += "FORA_DO_HISTORICO; "
+    agg_grupo["motivo_anomalia"] = agg_grupo["motivo_anomalia"].str.strip()
+
+    # ---------- (C) Anomalias por HORA×GRUPO ----------
+    agg_hora_grupo = consolidar_cubo(cubo, ["hora", "ResourceGroupDesc"])[
+        ["hora", "ResourceGroupDesc", "total_chamadas", "atendidas"]
+    ]
+
+    agg_hora_grupo["taxa_atendimento"] = np.where(
+        agg_hora_grupo["total_chamadas"] > 0,
+        agg_hora_grupo["atendidas"] / agg_hora_grupo["total_chamadas"],
+        np.nan
+    )
 
-# ==============================
-# 11. QUALIDADE DE DADOS
-# ==============================
-resumo_dados = []
-log_qualidade = []
+    MIN_CHAMADAS_PARA_ANALISE = 30
+    base_hg = agg_hora_grupo[agg_hora_grupo["total_chamadas"] >= MIN_CHAMADAS_PARA_ANALISE].copy()
 
-wrap_medio = cdr["wrap_time_sec"].dropna().mean()
+    base_hg["z_taxa_atendimento_no_grupo"] = (
+        base_hg.groupby("ResourceGroupDesc", observed=True)["taxa_atendimento"].transform(lambda s: zscore(s))
+    )
 
-def registrar(categoria, metrica, valor, percentual=None, severidade="INFO"):
-    reg = {
-        "categoria": categoria,
-        "metrica": metrica,
-        "valor": int(valor) if pd.notna(valor) else 0,
-        "severidade": severidade
+    base_hg["anomalia_taxa_no_grupo"] = base_hg["z_taxa_atendimento_no_grupo"] <= TAXA_Z
+
+    historico_hg = anomalias_historicas("hora×grupo", ["hora", "ResourceGroupDesc"])
+    chaves_hg = pd.MultiIndex.from_arrays([base_hg["hora"].astype("int64"), base_hg["ResourceGroupDesc"].astype(str)])
+    base_hg["anomalia_historica"] = historico_hg.reindex(chaves_hg, fill_value=False).to_numpy(dtype=bool)
+
+    dias_com_historico = int((df_historico.loc[df_historico["nivel"] == "dia", "dias_historico"] > 0).sum())
+    datas_incompletas = sorted(df_historico.loc[df_historico["motivo_anomalia"].str.contains("DIA_INCOMPLETO"), "data"].unique())
+    if datas_incompletas:
+        print(f"   ⚠️ Data(s) incompleta(s) em relação ao histórico: {', '.join(map(str, datas_incompletas))} "
+              f"(níveis grupo e dia sem comparação com o histórico)")
+    print(f"   ✓ Horas com anomalia: {int(agg_hora['flag_anomalia'].sum())}")
+    print(f"   ✓ Grupos com anomalia: {int(agg_grupo['flag_anomalia'].sum())}")
+    print(f"   ✓ Anomalias contra o histórico: {int(df_historico['flag_anomalia_hist'].sum())} "
+          f"({dias_com_historico}/{df_historico['data'].nunique()} data(s) com baseline)")
+
+    # ==============================
+    # 9.1 PERCENTIS DOS TEMPOS (sketch)
+    # ==============================
+    # A média esconde a cauda que estoura o SLA: p50/p90/p95/p99 saem do sketch
+    # somado (todos os arquivos/dias), com erro relativo de até 1%
+    registrar_saida(etapa, linhas=len(agg_hora) + len(agg_grupo) + len(base_hg) + len(df_historico))
+    print("\n📐 Calculando percentis dos tempos (hora × grupo)...")
+    etapa = medidor.iniciar("9.1 percentis", len(sketch))
+
+    df_percentis = quantis_sketch(sketch, ["hora", "ResourceGroupDesc"])
+    colunas_ring = [c for c in df_percentis.columns if c.startswith("ring_p")]
+    for chave in ("hora", "ResourceGroupDesc"):
+        percentis_ring = quantis_sketch(sketch, [chave])[[chave] + colunas_ring]
+        if chave == "hora":
+            agg_hora = agg_hora.merge(percentis_ring, on=chave, how="left")
+        else:
+            agg_grupo = agg_grupo.merge(percentis_ring, on=chave, how="left")
+
+    sketch.to_parquet(ARQUIVO_SKETCH_QUANTIS, index=False)
+    df_percentis.to_csv(ARQUIVO_PERCENTIS, index=False, encoding="utf-8-sig")
+    print(f"   ✓ Percentis salvos em: {ARQUIVO_PERCENTIS.name} (sketch: {ARQUIVO_SKETCH_QUANTIS.name})")
+
+    # ==============================
+    # 9.2 CURVA DE SLA (histograma de ring)
+    # ==============================
+    # Taxa de SLA de cada segundo de 0 a SEGUNDOS_CURVA_SLA, por grupo e no total,
+    # pela soma acumulada do histograma (sem passada extra pelas linhas)
+    registrar_saida(etapa, df_percentis)
+    print("\n⏱️  Calculando curva de SLA (ring time)...")
+    etapa = medidor.iniciar("9.2 curva de sla", len(histograma_ring))
+
+    df_curva_sla = pd.concat([
+        curva_sla(histograma_ring, [], SEGUNDOS_CURVA_SLA).assign(ResourceGroupDesc="(TODOS)"),
+        curva_sla(histograma_ring, ["ResourceGroupDesc"], SEGUNDOS_CURVA_SLA),
+    ], ignore_index=True)[["ResourceGroupDesc", "limite_seg", "atendidas", "atendidas_no_limite", "sla_rate"]]
+
+    histograma_ring.to_parquet(ARQUIVO_HISTOGRAMA_RING, index=False)
+    print(f"   ✓ Curva de SLA até {SEGUNDOS_CURVA_SLA}s (histograma: {ARQUIVO_HISTOGRAMA_RING.name})")
+
+    # ==============================
+    # 9.3 CONCORRÊNCIA E OCUPAÇÃO (varredura de intervalos)
+    # ==============================
+    # Chamadas simultâneas por grupo em cada janela (pico e média), e o resumo por
+    # hora usado no dimensionamento (ocupado = em conversa + em pós-atendimento)
+    registrar_saida(etapa, df_curva_sla)
+    print("\n📶 Calculando concorrência e ocupação (grupo × janela)...")
+    etapa = medidor.iniciar("9.3 concorrência", total_eventos(eventos_concorrencia))
+
+    df_concorrencia = curva_concorrencia(eventos_concorrencia, RESOLUCAO_CONCORRENCIA_S)
+    df_ocupacao_hora = ocupacao_por_hora(df_concorrencia)
+    df_concorrencia.to_parquet(ARQUIVO_CONCORRENCIA, index=False)
+
+    ocupado_total = df_ocupacao_hora[df_ocupacao_hora["ResourceGroupDesc"] == "(TODOS)"]
+    if len(ocupado_total) > 0:
+        pico = ocupado_total.loc[ocupado_total["pico_ocupado"].idxmax()]
+        print(f"   • Pico de chamadas em atendimento simultâneas: {int(pico['pico_ocupado'])} "
+              f"({pico['data']} {int(pico['hora']):02d}h)")
+    print(f"   ✓ Curva de concorrência ({RESOLUCAO_CONCORRENCIA_S}s) salva em: {ARQUIVO_CONCORRENCIA.name}")
+
+    # ==============================
+    # 9.4 CADEIAS DE TENTATIVAS (rediscagens)
+    # ==============================
+    # Cadeias abertas (um segmento por CallId / DialedNum) + partes já fechadas no
+    # streaming: tentativas, intervalo entre elas e tentativas até atender
+    registrar_saida(etapa, df_concorrencia)
+    print("\n🔁 Analisando cadeias de tentativas (CallId e DialedNum)...")
+    etapa = medidor.iniciar("9.4 tentativas", len(cadeias["callid"]) + len(cadeias["numero"]))
+
+    resumos = {
+        "callid": gravar_cadeias(cadeias, "callid", ARQUIVO_CADEIAS_CALLID),
+        "numero": gravar_cadeias(cadeias, "numero", ARQUIVO_CADEIAS_NUMERO),
     }
-    if percentual is not None:
-        reg["percentual"] = round(percentual, 2)
-    log_qualidade.append(reg)
-
-total = len(cdr)
-
-registrar("VALORES_AUSENTES", "total_registros", total, severidade="INFO")
-registrar("VALORES_AUSENTES", "callid_nulo", cdr["CallId"].isna().sum(),
-          (cdr["CallId"].isna().sum() / total * 100),
-          "CRÍTICO" if cdr["CallId"].isna().sum() > 0 else "OK")
-registrar("VALORES_AUSENTES", "callstartdt_nulo", cdr["CallStartDt"].isna().sum(),
-          (cdr["CallStartDt"].isna().sum() / total * 100),
-          "CRÍTICO" if cdr["CallStartDt"].isna().sum() > 0 else "OK")
-registrar("TEMPOS", "wrap_time_nulo", cdr["wrap_time_sec"].isna().sum(),
-          (cdr["wrap_time_sec"].isna().sum()/total*100), "ALERTA")
-
-duplicatas_chave_unica = cdr["chave_unica"].duplicated().sum()
-registrar("DUPLICIDADE", "duplicatas_chave_unica", duplicatas_chave_unica,
-          (duplicatas_chave_unica / total * 100),
-          "CRÍTICO" if duplicatas_chave_unica > total * 0.01 else "ALERTA" if duplicatas_chave_unica > 0 else "OK")
-
-df_qualidade = pd.DataFrame(log_qualidade)
-
-# ==============================
-# 12. SALVAR CSV TRATADO
-# ==============================
-print("\n💾 Salvando CSV tratado...")
-cdr.to_csv(ARQUIVO_TRATADO, index=False, encoding="utf-8-sig")
-print(f"   ✓ CDR tratado salvo: {ARQUIVO_TRATADO.name}")
-
-# ==============================
-# 13. RESUMO EXECUTIVO
-# ==============================
-print("\n📊 Gerando resumo executivo...")
-
-print("\n" + "=" * 50)
-print("📈 RESUMO EXECUTIVO (CONSOLE)")
-print("=" * 50)
-
-total = len(cdr)
-unicos = cdr["chave_unica"].nunique() if "chave_unica" in cdr.columns else 0
+    df_tentativas = pd.concat([fechar_resumo(parcial, nivel) for nivel, parcial in resumos.items()], ignore_index=True)
+
+    for nivel, parcial in resumos.items():
+        total = parcial.sum()
+        if total["cadeias"] > 0:
+            print(f"   • {NIVEIS_CADEIA[nivel]}: {int(total['cadeias']):,} cadeias, "
+                  f"{total['tentativas'] / total['cadeias']:.2f} tentativas em média, "
+                  f"{total['atendidas'] / total['cadeias'] * 100:.1f}% atendidas "
+                  f"(média de {total['soma_ate'] / total['n_ate'] if total['n_ate'] else float('nan'):.2f} tentativas até atender)")
+    print(f"   ✓ Cadeias salvas em: {ARQUIVO_CADEIAS_CALLID.name} / {ARQUIVO_CADEIAS_NUMERO.name}")
+
+    # ==============================
+    # 10. DISTRIBUIÇÃO POR DISPOSITION
+    # ==============================
+    registrar_saida(etapa, df_tentativas)
+    etapa = medidor.iniciar("10. disposition", len(cubo))
+    df_disp = (
+        consolidar_cubo(cubo, ["Disposition_Desc"])[["Disposition_Desc", "total_chamadas"]]
+           .sort_values("total_chamadas", ascending=False)
+    )
 
-atendidas = int(cdr["atendida"].sum()) if "atendida" in cdr.columns else 0
-nao_atendidas = total - atendidas
-taxa_at = (atendidas / total) if total else 0
+    df_disp["perc_total"] = (df_disp["total_chamadas"] / contadores["total_registros"] * 100).round(2)
 
-print(f"   • Total de chamadas: {total:,}")
-print(f"   • Registros únicos (chave_unica): {unicos:,} ({(unicos/total*100 if total else 0):.1f}%)")
-print(f"   • Chamadas atendidas: {atendidas:,} ({taxa_at*100:.1f}%)")
-print(f"   • Chamadas não atendidas: {nao_atendidas:,} ({(nao_atendidas/total*100 if total else 0):.1f}%)")
+    df_disp_hora = (
+        consolidar_cubo(cubo, ["hora", "Disposition_Desc"])[["hora", "Disposition_Desc", "total_chamadas"]]
+           .sort_values(["hora", "total_chamadas"], ascending=[True, False])
+    )
 
-if atendidas > 0:
-    sla_15 = int(cdr["sla_15s"].sum()) if "sla_15s" in cdr.columns else 0
-    sla_30 = int(cdr["sla_30s"].sum()) if "sla_30s" in cdr.columns else 0
+    total_por_hora = (
+        consolidar_cubo(cubo, ["hora"], dropna=True)[["hora", "total_chamadas"]]
+           .rename(columns={"total_chamadas": "total_hora"})
+    )
+    df_disp_hora = df_disp_hora.merge(total_por_hora, on="hora", how="left")
+    df_disp_hora["perc_na_hora"] = (df_disp_hora["total_chamadas"] / df_disp_hora["total_hora"] * 100).round(2)
+
+    # ==============================
+    # 11. QUALIDADE DE DADOS
+    # ==============================
+    registrar_saida(etapa, linhas=len(df_disp) + len(df_disp_hora))
+    etapa = medidor.iniciar("11. qualidade", len(cubo))
+    resumo_dados = []
+    log_qualidade = []
+
+    # Totais do dia (consolidação completa do cubo)
+    geral = consolidar_cubo(cubo, []).iloc[0]
+    wrap_medio = geral["wrap_medio"]
+
+    def registrar(categoria, metrica, valor, percentual=None, severidade="INFO"):
+        reg = {
+            "categoria": categoria,
+            "metrica": metrica,
+            "valor": int(valor) if pd.notna(valor) else 0,
+            "severidade": severidade
+        }
+        if percentual is not None:
+            reg["percentual"] = round(percentual, 2)
+        log_qualidade.append(reg)
+
+    total = contadores["total_registros"]
+    callid_nulo = contadores["callid_nulo"]
+    callstartdt_nulo = contadores["callstartdt_nulo"]
+
+    registrar("VALORES_AUSENTES", "total_registros", total, severidade="INFO")
+    registrar("VALORES_AUSENTES", "callid_nulo", callid_nulo,
+              (callid_nulo / total * 100),
+              "CRÍTICO" if callid_nulo > 0 else "OK")
+    registrar("VALORES_AUSENTES", "callstartdt_nulo", callstartdt_nulo,
+              (callstartdt_nulo / total * 100),
+              "CRÍTICO" if callstartdt_nulo > 0 else "OK")
+    if linhas_malformadas is not None:
+        registrar("ESTRUTURA", "linhas_malformadas", linhas_malformadas,
+                  (linhas_malformadas / (total + linhas_malformadas) * 100),
+                  "ALERTA" if linhas_malformadas > 0 else "OK")
+    if linhas_incompletas is not None:
+        # Linhas com campos a menos: mantidas com os campos ausentes nulos (como no leitor pandas)
+        registrar("ESTRUTURA", "linhas_incompletas", linhas_incompletas,
+                  (linhas_incompletas / total * 100) if total else 0,
+                  "ALERTA" if linhas_incompletas > 0 else "OK")
+    if tokens_nulos is not None:
+        # Campos convertidos em nulo na leitura, por token da política TOKENS_NULOS
+        for token, ocorrencias in tokens_nulos.items():
+            if ocorrencias > 0:
+                registrar("VALORES_AUSENTES", f"token_nulo[{token!r}]", ocorrencias, severidade="INFO")
+    # Datas preenchidas que não converteram no formato detectado (viraram nulo)
+    for col, info in datas_invalidas.items():
+        registrar("TIPAGEM", f"data_invalida[{col}]", info["linhas"],
+                  (info["linhas"] / total * 100), "ALERTA")
+    wrap_time_nulo = total - int(geral["wrap_qtd"])
+    registrar("TEMPOS", "wrap_time_nulo", wrap_time_nulo,
+              (wrap_time_nulo/total*100), "ALERTA")
+
+    duplicatas_chave_unica = contadores["duplicatas_chave_unica"]
+    registrar("DUPLICIDADE", "duplicatas_chave_unica", duplicatas_chave_unica,
+              (duplicatas_chave_unica / total * 100),
+              "CRÍTICO" if duplicatas_chave_unica > total * 0.01 else "ALERTA" if duplicatas_chave_unica > 0 else "OK")
+
+    # CallId/SeqNum fora da faixa do layout empacotado (chave larga por hash)
+    chaves_largas = contadores.get("chaves_largas", 0)
+    registrar("DUPLICIDADE", "chaves_largas", chaves_largas,
+              (chaves_largas / total * 100) if total else 0,
+              "ALERTA" if chaves_largas > 0 else "OK")
+
+    # Chaves que já vieram em arquivos de execuções anteriores (índice persistente)
+    chaves_ja_processadas = leitura["chaves_ja_processadas"]
+    if chaves_ja_processadas is not None:
+        registros_lidos = leitura["registros_lidos"]
+        registrar("DUPLICIDADE", "chaves_ja_processadas", chaves_ja_processadas,
+                  (chaves_ja_processadas / registros_lidos * 100) if registros_lidos else 0,
+                  "ALERTA" if chaves_ja_processadas > 0 else "OK")
+        pd.DataFrame({
+            "arquivo": [nome for nome, chaves in leitura["chaves_repetidas"] for _ in range(len(chaves))],
+            "chave_unica": chave_para_texto(pd.Series(
+                np.concatenate([chaves for _, chaves in leitura["chaves_repetidas"]] or [np.array([], dtype="int64")])
+            )),
+            "acao": "descartada" if DESCARTAR_CHAVES_REPETIDAS else "marcada",
+        }).to_csv(ARQUIVO_CHAVES_REPETIDAS, index=False, encoding="utf-8-sig")
+
+    df_qualidade = pd.DataFrame(log_qualidade)
+    registrar_saida(etapa, df_qualidade)
+
+    # ==============================
+    # 12. SALVAR CSV TRATADO
+    # ==============================
+    # Feito em processar_em_memoria; no streaming cada arquivo já foi gravado em acumular_lote
+    if MODO_STREAMING:
+        print(f"\n💾 CDR tratado gravado por arquivo em streaming: {ARQUIVO_TRATADO.name}")
+
+    # ==============================
+    # 13. RESUMO EXECUTIVO
+    # ==============================
+    print("\n📊 Gerando resumo executivo...")
+    etapa = medidor.iniciar("13. resumo executivo", len(cubo))
+
+    print("\n" + "=" * 50)
+    print("📈 RESUMO EXECUTIVO (CONSOLE)")
+    print("=" * 50)
+
+    unicos = contadores["chaves_unicas"]
+
+    atendidas = int(geral["atendidas"])
+    nao_atendidas = total - atendidas
+    taxa_at = (atendidas / total) if total else 0
+
+    print(f"   • Total de chamadas: {total:,}")
+    print(f"   • Registros únicos (chave_unica): {unicos:,} ({(unicos/total*100 if total else 0):.1f}%)")
+    print(f"   • Chamadas atendidas: {atendidas:,} ({taxa_at*100:.1f}%)")
+    print(f"   • Chamadas não atendidas: {nao_atendidas:,} ({(nao_atendidas/total*100 if total else 0):.1f}%)")
+
+    # SLA geral de cada limite (histograma somado de todas as horas e grupos)
+    limites_resumo = sorted(set(LIMITES_SLA) | {LIMITE_SLA_META})
+    sla_geral = taxas_sla(histograma_ring, [], limites_resumo).iloc[0]
+
+    if atendidas > 0:
+        for t in limites_resumo:
+            sla_t = int(sla_geral[f"sla_{t}"])
+            print(f"   • SLA {t}s: {sla_t:,} ({(sla_t/atendidas*100):.1f}% das atendidas)")
+
+        if geral["ring_qtd"] > 0:
+            print(f"   • Ring time médio: {geral['ring_medio']:.1f}s")
+
+        if geral["talk_qtd"] > 0:
+            print(f"   • Talk time médio: {geral['talk_medio']:.1f}s")
+
+        if geral["wrap_qtd"] > 0:
+            print(f"   • Wrap time médio: {geral['wrap_medio']:.1f}s")
+    else:
+        print("   ⚠️  ATENÇÃO: Nenhuma chamada atendida detectada!")
+
+    if isinstance(df_qualidade, pd.DataFrame) and "severidade" in df_qualidade.columns:
+        criticos = df_qualidade[df_qualidade["severidade"] == "CRÍTICO"]
+        alertas = df_qualidade[df_qualidade["severidade"] == "ALERTA"]
+
+        print("\n⚠️  ALERTAS DE QUALIDADE:")
+        if len(criticos) > 0:
+            print(f"   🔴 {len(criticos)} problemas CRÍTICOS detectados:")
+            for _, row in criticos.iterrows():
+                print(f"      • {row.get('metrica','-')}: {int(row.get('valor',0)):,} ocorrências")
+        else:
+            print("   ✅ Nenhum problema crítico detectado")
+
+        if len(alertas) > 0:
+            print(f"   🟡 {len(alertas)} alertas detectados:")
+            for _, row in alertas.iterrows():
+                print(f"      • {row.get('metrica','-')}: {int(row.get('valor',0)):,} ocorrências")
+        else:
+            print("   ✅ Nenhum alerta detectado")
+
+    print("=" * 50)
+
+    # Salva no Dataframe
+    resumo_dados.append({
+        "Categoria": "GERAL",
+        "Métrica": "Total de chamadas",
+        "Valor": total,
+        "Percentual": "100.00%",
+        "Status": "✓"
+    })
 
-    print(f"   • SLA 15s: {sla_15:,} ({(sla_15/atendidas*100):.1f}% das atendidas)")
-    print(f"   • SLA 30s: {sla_30:,} ({(sla_30/atendidas*100):.1f}% das atendidas)")
+    chamadas_atendidas = int(geral["atendidas"])
+    perc_atendidas = (chamadas_atendidas / total * 100) if total else 0
 
-    if "ring_time_sec" in cdr.columns and cdr["ring_time_sec"].notna().any():
-        print(f"   • Ring time médio: {cdr['ring_time_sec'].dropna().mean():.1f}s")
+    resumo_dados.append({
+        "Categoria": "GERAL",
+        "Métrica": "Chamadas atendidas",
+        "Valor": chamadas_atendidas,
+        "Percentual": f"{perc_atendidas:.1f}%",
+        "Status": "✓" if perc_atendidas > 20 else "⚠"
+    })
 
-    if "talk_time_sec" in cdr.columns and cdr["talk_time_sec"].notna().any():
-        print(f"   • Talk time médio: {cdr['talk_time_sec'].dropna().mean():.1f}s")
+    resumo_dados.append({
+        "Categoria": "TEMPOS",
+        "Métrica": "Wrap médio (s)",
+        "Valor": round(wrap_medio, 2) if pd.notna(wrap_medio) else None,
+        "Percentual": "",
+        "Status": "✓"
+    })
 
-    if "wrap_time_sec" in cdr.columns and cdr["wrap_time_sec"].notna().any():
-        print(f"   • Wrap time médio: {cdr['wrap_time_sec'].dropna().mean():.1f}s")
-else:
-    print("   ⚠️  ATENÇÃO: Nenhuma chamada atendida detectada!")
+    if chamadas_atendidas > 0:
+        for t in limites_resumo:
+            sla_t = int(sla_geral[f"sla_{t}"])
+            perc_sla_t = (sla_t / chamadas_atendidas * 100)
+
+            # só o limite da meta recebe status
+            status = ""
+            if t == LIMITE_SLA_META:
+                status = "✓" if perc_sla_t >= META_SLA * 100 else "⚠"
+
+            resumo_dados.append({
+                "Categoria": "SLA",
+                "Métrica": f"SLA {t}s (das atendidas)",
+                "Valor": sla_t,
+                "Percentual": f"{perc_sla_t:.1f}%",
+                "Status": status
+            })
+
+    df_resumo = pd.DataFrame(resumo_dados)
+    registrar_saida(etapa, df_resumo)
+
+    # ==============================
+    # 14. RESUMO DA ANÁLISE (EXCEL)
+    # ==============================
+    print("\n💾 Gerando Excel consolidado (1 arquivo)...")
+    etapa = medidor.iniciar("14. excel")
+    # A aba de execução traz as etapas até a 13; a própria escrita do Excel fica só no log JSON/CSV
+    df_etapas = medidor.tabela()
+
+    # Formatação aplicada na escrita (ver RELATORIO_EXCEL), sem reabrir o arquivo
+    caminho_consolidado_final = salvar_relatorio_excel(ARQUIVO_CONSOLIDADO, [
+        ("Resumo Executivo", df_resumo, "1F4E79"),
+        ("Qualidade de Dados", df_qualidade, "C00000"),
+        ("Tipagem de Colunas", df_tipagem, "70AD47"),
+        ("Anomalias - Hora", agg_hora.sort_values("hora"), "305496"),
+        ("Anomalias - Grupo", agg_grupo.sort_values("total_chamadas", ascending=False), "548235"),
+        ("Anomalias - Hora×Grupo", base_hg.sort_values(["ResourceGroupDesc", "hora"]), "BF8F00"),
+        ("Percentis - Hora×Grupo", df_percentis, "BF8F00"),
+        ("SLA - Curva", df_curva_sla, "BF8F00"),
+        ("Concorrência - Hora×Grupo", df_ocupacao_hora, "BF8F00"),
+        ("Tentativas - Resumo", df_tentativas, "BF8F00"),
+        ("Anomalias - Histórico", df_historico.sort_values(["data", "nivel", "ResourceGroupDesc", "hora"]), "BF8F00"),
+        ("Disposition - Geral", df_disp, "5B9BD5"),
+        ("Disposition - Hora", df_disp_hora, "5B9BD5"),
+        ("Execução - Etapas", df_etapas, "7F7F7F"),
+    ])
+    medidor.encerrar()
+    print(f"   ✓ Relatório consolidado salvo em: {caminho_consolidado_final.name}")
+
+    # ==============================
+    # 15. ATUALIZA BASELINE HISTÓRICO
+    # ==============================
+    if ATUALIZAR_BASELINE:
+        etapa = medidor.iniciar("15. baseline histórico", len(observacoes))
+        # dia corrente ainda incompleto não entra; cada dia entra uma única vez
+        incorporadas = atualizar_baseline(PASTA_BASELINE, observacoes, ate_data=pd.Timestamp.now().normalize())
+        medidor.encerrar()
+        if incorporadas:
+            print(f"   ✓ Baseline histórico atualizado com: {', '.join(incorporadas)}")
+        else:
+            print("   ✓ Baseline histórico: nenhum dia novo para incorporar")
+
+    return caminho_consolidado_final
+
+def main():
+    inicio = time.time()
+    medidor = MedidorEtapas(perfilar=PERFILAR_ETAPAS, pasta_perfis=PASTA_PERFIS)
+
+    # ==============================
+    # 1. LEITURA E UNIFICAÇÃO
+    # ==============================
+    arquivos = sorted(PASTA_BASE.glob("*.csv"))
+    dfs = []
+    estado = novo_estado_streaming() if MODO_STREAMING else None
+    indice = IndiceChaves(PASTA_INDICE_CHAVES) if USAR_INDICE_CHAVES else None
+
+    print(f"Iniciando leitura de {len(arquivos)} arquivos ({NUM_WORKERS_LEITURA} worker(s))...")
+
+    if LEITURA_INCREMENTAL:
+        resultados = ler_arquivos_incremental(arquivos, PASTA_CACHE, num_workers=NUM_WORKERS_LEITURA, leitor=LEITOR_CSV)
+    else:
+        resultados = (
+            (*resultado, "leitura")
+            for resultado in ler_arquivos_cdr(arquivos, num_workers=NUM_WORKERS_LEITURA, leitor=LEITOR_CSV)
+        )
 
-if "df_qualidade" in globals() and isinstance(df_qualidade, pd.DataFrame) and "severidade" in df_qualidade.columns:
-    criticos = df_qualidade[df_qualidade["severidade"] == "CRÍTICO"]
-    alertas = df_qualidade[df_qualidade["severidade"] == "ALERTA"]
+    leitura = novo_resumo_leitura()
 
-    print("\n⚠️  ALERTAS DE QUALIDADE:")
-    if len(criticos) > 0:
-        print(f"   🔴 {len(criticos)} problemas CRÍTICOS detectados:")
-        for _, row in criticos.iterrows():
-            print(f"      • {row.get('metrica','-')}: {int(row.get('valor',0)):,} ocorrências")
-    else:
-        print("   ✅ Nenhum problema crítico detectado")
+    etapa = medidor.iniciar("1. leitura + tratamento (streaming)" if MODO_STREAMING else "1. leitura")
+    for nome, df, erro, diagnostico, origem in tqdm(resultados, total=len(arquivos), desc="📂 Lendo arquivos", unit="arquivo"):
+        if erro is not None:
+            print(f"  ✗ ERRO ao ler {nome}: {erro}")
+            continue
 
-    if len(alertas) > 0:
-        print(f"   🟡 {len(alertas)} alertas detectados:")
-        for _, row in alertas.iterrows():
-            print(f"      • {row.get('metrica','-')}: {int(row.get('valor',0)):,} ocorrências")
+        registrar_leitura(leitura, nome, df, diagnostico, origem)
+        df = conferir_chaves_historicas(indice, leitura, nome, df)
+
+        if MODO_STREAMING:
+            # trata, exporta e agrega o arquivo agora; o df é descartado em seguida
+            acumular_lote(estado, df)
+        else:
+            dfs.append(df)
+
+    registros_lidos = leitura["registros_lidos"]
+    registrar_saida(etapa, linhas=registros_lidos)
+
+    if MODO_STREAMING:
+        if estado["lotes"] == 0:
+            raise ValueError("❌ Nenhum arquivo foi carregado com sucesso!")
+        etapa = medidor.iniciar("1.1 finalização do streaming", registros_lidos)
+        agregados, contadores, amostra = finalizar_estado(estado)
+        df_tipagem = analisar_tipagem(amostra)
+        registrar_saida(etapa, agregados["cubo"])
+        print(f"\n✅ Total de registros processados em streaming: {contadores['total_registros']:,}")
     else:
-        print("   ✅ Nenhum alerta detectado")
-
-print("=" * 50)
-
-# Salva no Dataframe
-resumo_dados.append({
-    "Categoria": "GERAL",
-    "Métrica": "Total de chamadas",
-    "Valor": len(cdr),
-    "Percentual": "100.00%",
-    "Status": "✓"
-})
-
-chamadas_atendidas = int(cdr["atendida"].sum())
-perc_atendidas = (chamadas_atendidas / len(cdr) * 100) if len(cdr) else 0
-
-resumo_dados.append({
-    "Categoria": "GERAL",
-    "Métrica": "Chamadas atendidas",
-    "Valor": chamadas_atendidas,
-    "Percentual": f"{perc_atendidas:.1f}%",
-    "Status": "✓" if perc_atendidas > 20 else "⚠"
-})
-
-resumo_dados.append({
-    "Categoria": "TEMPOS",
-    "Métrica": "Wrap médio (s)",
-    "Valor": round(wrap_medio, 2) if pd.notna(wrap_medio) else None,
-    "Percentual": "",
-    "Status": "✓"
-})
-
-if chamadas_atendidas > 0:
-    sla_15 = int(cdr["sla_15s"].sum())
-    perc_sla_15 = (sla_15 / chamadas_atendidas * 100)
-
-    resumo_dados.append({
-        "Categoria": "SLA",
-        "Métrica": "SLA 15s (das atendidas)",
-        "Valor": sla_15,
-        "Percentual": f"{perc_sla_15:.1f}%",
-        "Status": "✓" if perc_sla_15 >= 80 else "⚠"
+        agregados, contadores, df_tipagem = processar_em_memoria(dfs, medidor)
+
+    caminho_consolidado_final = gerar_relatorios(agregados, contadores, df_tipagem, leitura, medidor)
+    salvar_indice_chaves(indice, medidor)
+
+    print("\n" + "=" * 50)
+    print("✅ PROCESSAMENTO FINALIZADO COM SUCESSO")
+    print("=" * 50)
+    print(f"📄 Arquivo tratado (CSV): {ARQUIVO_TRATADO.name}")
+    if SALVAR_PARQUET:
+        print(f"🧱 Base tratada (Parquet): {PASTA_PARQUET.name}/")
+    print(f"📊 Relatório (Excel): {caminho_consolidado_final.name}")
+    print("=" * 50)
+
+    medidor.salvar(ARQUIVO_LOG_EXECUCAO, ARQUIVO_LOG_ETAPAS, contexto={
+        "modo_streaming": MODO_STREAMING,
+        "leitor_csv": LEITOR_CSV,
+        "num_workers_leitura": NUM_WORKERS_LEITURA,
+        "arquivos": len(arquivos),
+        "registros": contadores["total_registros"],
     })
 
-df_resumo = pd.DataFrame(resumo_dados)
-
-# ==============================
-# 14. RESUMO DA ANÁLISE (EXCEL)
-# ==============================
-def salvar_excel_consolidado_com_fallback(caminho_base: Path):
-    try:
-        writer = pd.ExcelWriter(caminho_base, engine="openpyxl")
-        return writer, caminho_base
-    except PermissionError:
-        timestamp = datetime.datetime.now().strftime("%H%M%S")
-        novo_nome = caminho_base.stem + f"_{timestamp}" + caminho_base.suffix
-        novo_caminho = caminho_base.parent / novo_nome
-        writer = pd.ExcelWriter(novo_caminho, engine="openpyxl")
-        print(f"   ⚠️  Arquivo em uso! Salvando como: {novo_caminho.name}")
-        return writer, novo_caminho
-
-def estilizar_botao(cell, fill_color="D9E1F2", font_color="1F4E79"):
-    cell.font = Font(bold=True, color=font_color)
-    cell.fill = PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid")
-    cell.alignment = Alignment(horizontal="center", vertical="center")
-    cell.border = Border(
-        left=Side(style="thin", color="A6A6A6"),
-        right=Side(style="thin", color="A6A6A6"),
-        top=Side(style="thin", color="A6A6A6"),
-        bottom=Side(style="thin", color="A6A6A6"),
-    )
-
-def aplicar_estilo_tabela(ws, header_color="2F5597"):
-    header_font = Font(bold=True, color="000000")
-    header_fill = PatternFill(start_color=header_color, end_color=header_color, fill_type="solid")
-
-    zebra1 = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
-    zebra2 = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
-    align = Alignment(vertical="center", wrap_text=True)
+    print("\n⏱ Tempo por etapa:")
+    for registro in medidor.etapas:
+        print(f"   • {registro['etapa']}: {registro['tempo_s']:.2f}s (CPU {registro['cpu_s']:.2f}s, pico RSS {registro['rss_pico_mb']:,.0f} MB)")
+    print(f"   ✓ Log da execução: {ARQUIVO_LOG_EXECUCAO.name} / {ARQUIVO_LOG_ETAPAS.name}")
 
-    border = Border(
-        left=Side(style="thin", color="D9D9D9"),
-        right=Side(style="thin", color="D9D9D9"),
-        top=Side(style="thin", color="D9D9D9"),
-        bottom=Side(style="thin", color="D9D9D9"),
-    )
+    fim = time.time()
+    print(f"\n⏱ Tempo total de execução: {round((fim - inicio) / 60, 2)} minutos")
+    print("\n🎯 Pronto para análise!")
 
-    max_row = ws.max_row
-    max_col = ws.max_column
-
-    header_row = 1
-
-    for c in range(1, max_col + 1):
-        cell = ws.cell(row=header_row, column=c)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        cell.border = border
-
-    for r in range(header_row + 1, max_row + 1):
-        fill = zebra1 if (r % 2 == 0) else zebra2
-        for c in range(1, max_col + 1):
-            cell = ws.cell(row=r, column=c)
-            cell.fill = fill
-            cell.alignment = align
-            cell.border = border
-
-            if isinstance(cell.value, str):
-                v = cell.value.strip().upper()
-                if v in ("CRÍTICO", "CRITICO", "✗"):
-                    cell.font = Font(bold=True, color="C00000")
-                elif v in ("ALERTA", "⚠"):
-                    cell.font = Font(bold=True, color="FF6600")
-                elif v in ("OK", "✓"):
-                    cell.font = Font(bold=True, color="008000")
-
-    ws.auto_filter.ref = ws.dimensions
-    ws.freeze_panes = f"A{header_row + 1}"
-    ws.row_dimensions[header_row].height = 22
-
-    for c in range(1, max_col + 1):
-        letter = get_column_letter(c)
-        max_len = 0
-        for r in range(1, max_row + 1):
-            val = ws.cell(row=r, column=c).value
-            if val is None:
-                continue
-            max_len = max(max_len, len(str(val)))
-        ws.column_dimensions[letter].width = min(max_len + 2, 55)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tratamento e análise dos arquivos CDR do Aspect")
+    parser.add_argument("--monitorar", action="store_true",
+                        help="fica rodando e atualiza saídas e anomalias a cada arquivo novo na PASTA_BASE")
+    args = parser.parse_args()
 
-    rate_cols = []
-    for c in range(1, max_col + 1):
-        v = ws.cell(row=header_row, column=c).value
-        if v is None:
-            continue
-        name = str(v).strip().lower()
-        if name.endswith("_rate") or name in ("taxa_atendimento", "sla15_rate", "sla30_rate"):
-            rate_cols.append(c)
-
-    for c in rate_cols:
-        for r in range(header_row + 1, max_row + 1):
-            cell = ws.cell(row=r, column=c)
-            if isinstance(cell.value, (int, float)):
-                cell.number_format = "0.0%"
-                cell.alignment = Alignment(horizontal="right", vertical="center", wrap_text=True)
-
-def criar_dashboard(ws, nomes_abas):
-    ws["A1"] = "Dashboard - Navegação"
-    ws["A1"].font = Font(size=16, bold=True, color="000000")
-    ws["A1"].fill = PatternFill(start_color="BDD7EE", end_color="BDD7EE", fill_type="solid")
-    ws["A1"].alignment = Alignment(horizontal="center", vertical="center")
-    ws.merge_cells("A1:D1")
-    ws.row_dimensions[1].height = 28
-
-    ws["A3"] = "Clique para abrir:"
-    ws["A3"].font = Font(bold=True, color="1F4E79")
-
-    row = 5
-    for aba in nomes_abas:
-        cell = ws[f"A{row}"]
-        cell.value = f"📄 {aba}"
-        cell.hyperlink = f"#'{aba}'!A1"
-        cell.style = "Hyperlink"
-        estilizar_botao(cell, fill_color="E2EFDA", font_color="1F4E79")
-        ws.merge_cells(f"A{row}:C{row}")
-        ws.row_dimensions[row].height = 22
-        row += 2
-
-    ws.column_dimensions["A"].width = 35
-    ws.freeze_panes = "A5"
-
-print("\n💾 Gerando Excel consolidado (1 arquivo)...")
-
-writer, caminho_consolidado_final = salvar_excel_consolidado_com_fallback(ARQUIVO_CONSOLIDADO)
-with writer:
-    df_resumo.to_excel(writer, sheet_name="Resumo Executivo", index=False)
-    df_qualidade.to_excel(writer, sheet_name="Qualidade de Dados", index=False)
-    df_tipagem.to_excel(writer, sheet_name="Tipagem de Colunas", index=False)
-    agg_hora.sort_values("hora").to_excel(writer, sheet_name="Anomalias - Hora", index=False)
-    agg_grupo.sort_values("total_chamadas", ascending=False).to_excel(writer, sheet_name="Anomalias - Grupo", index=False)
-    base_hg.sort_values(["ResourceGroupDesc", "hora"]).to_excel(writer, sheet_name="Anomalias - Hora×Grupo", index=False)
-    df_disp.to_excel(writer, sheet_name="Disposition - Geral", index=False)
-    df_disp_hora.to_excel(writer, sheet_name="Disposition - Hora", index=False)
-
-wb = load_workbook(caminho_consolidado_final)
-
-abas_para_link = [
-    "Resumo Executivo",
-    "Qualidade de Dados",
-    "Tipagem de Colunas",
-    "Anomalias - Hora",
-    "Anomalias - Grupo",
-    "Anomalias - Hora×Grupo",
-    "Disposition - Geral",
-    "Disposition - Hora",
-]
-
-ws_dash = wb.create_sheet("Dashboard", 0)
-criar_dashboard(ws_dash, abas_para_link)
-
-for nome_aba, cor in [
-    ("Resumo Executivo", "1F4E79"),
-    ("Qualidade de Dados", "C00000"),
-    ("Tipagem de Colunas", "70AD47"),
-    ("Anomalias - Hora", "305496"),
-    ("Anomalias - Grupo", "548235"),
-    ("Anomalias - Hora×Grupo", "BF8F00"),
-    ("Disposition - Geral", "5B9BD5"),
-    ("Disposition - Hora", "5B9BD5"),
-]:
-    ws = wb[nome_aba]
-    aplicar_estilo_tabela(ws, cor)
-
-ws_dash.column_dimensions["A"].width = 35
-wb.save(caminho_consolidado_final)
-print(f"   ✓ Relatório consolidado salvo em: {caminho_consolidado_final.name}")
-
-print("\n" + "=" * 50)
-print("✅ PROCESSAMENTO FINALIZADO COM SUCESSO")
-print("=" * 50)
-print(f"📄 Arquivo tratado (CSV): {ARQUIVO_TRATADO.name}")
-print(f"📊 Relatório (Excel): {caminho_consolidado_final.name}")
-print("=" * 50)
-
-fim = time.time()
-print(f"\n⏱ Tempo total de execução: {round((fim - inicio) / 60, 2)} minutos")
-print("\n🎯 Pronto para análise!")
+    if args.monitorar:
+        monitorar_bases()
+    else:
+        main()
@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from CONCORRENCIA_CDR import montar_eventos_concorrencia, somar_eventos, curva_concorrencia, ocupacao_por_hora
+
+# ==============================
+# TESTES DA CONCORRÊNCIA (eventos esparsos)
+# ==============================
+
+def cdr_sintetico(n, semente, inicio="2025-07-29 23:30:00"):
+    """Chamadas curtas e longas em torno da meia-noite, com atendidas e não atendidas"""
+    rng = np.random.default_rng(semente)
+    ms = lambda valores: pd.to_timedelta(valores, unit="ms")
+    ring = pd.Timestamp(inicio) + ms(rng.integers(0, 3_600_000, n))
+    atendida = rng.random(n) < 0.5
+    resposta = ring + ms(rng.integers(0, 30_000, n))
+    fim = pd.Series(np.where(atendida, resposta + ms(rng.integers(0, 600_000, n)), ring + ms(rng.integers(0, 40_000, n))))
+    return pd.DataFrame({
+        "ResourceGroupDesc": rng.choice(["A", "B", None], n),
+        "TimePhoneStartingRinging": ring,
+        "AnswerDt": pd.Series(resposta).where(atendida),
+        "CallEndDt": fim,
+        "WrapEndDt": (fim + ms(rng.integers(0, 60_000, n))).where(atendida),
+    })
+
+def nivel_por_segundo(cdr, grupo, inicio_col, fim_cols, t0, t1):
+    """Chamadas em andamento em cada segundo [t0, t1), contadas uma a uma"""
+    cdr = cdr[cdr["ResourceGroupDesc"].notna()] if grupo is None else cdr[cdr["ResourceGroupDesc"] == grupo]
+    fim = cdr[fim_cols[0]]
+    for coluna in fim_cols[1:]:
+        fim = fim.fillna(cdr[coluna])
+    teto = lambda datas: np.ceil(datas.astype("int64") / 1e9).astype("int64")
+    validos = cdr[inicio_col].notna() & fim.notna()
+    inicio, fim = teto(cdr[inicio_col][validos]).to_numpy(), teto(fim[validos]).to_numpy()
+    segundos = np.arange(t0, t1)
+    return ((inicio[:, None] <= segundos) & (segundos < fim[:, None])).sum(axis=0)
+
+def test_curva_igual_a_contagem_por_segundo_com_lotes():
+    cdr = cdr_sintetico(400, semente=1)
+    eventos = montar_eventos_concorrencia(cdr.iloc[:150])
+    for de, ate in [(150, 170), (170, 400)]:
+        somar_eventos(eventos, montar_eventos_concorrencia(cdr.iloc[de:ate]))
+    curva = curva_concorrencia(eventos, resolucao_s=60)
+
+    t0 = int(curva["inicio"].min().timestamp())
+    t1 = int(curva["inicio"].max().timestamp()) + 60
+    for grupo, estado, inicio_col, fim_cols in [
+        ("A", "ring", "TimePhoneStartingRinging", ["AnswerDt", "CallEndDt"]),
+        ("B", "talk", "AnswerDt", ["CallEndDt"]),
+        (None, "wrap", "CallEndDt", ["WrapEndDt"]),
+    ]:
+        nivel = nivel_por_segundo(cdr, grupo, inicio_col, fim_cols, t0, t1).reshape(-1, 60)
+        serie = curva[(curva["ResourceGroupDesc"] == (grupo or "(TODOS)")) & (curva["estado"] == estado)]
+        assert serie["pico"].tolist() == nivel.max(axis=1).tolist()
+        assert np.allclose(serie["media"], nivel.mean(axis=1).round(3))
+
+def test_curva_sem_intervalo_valido_sai_vazia():
+    cdr = cdr_sintetico(10, semente=2)
+    cdr["CallEndDt"] = pd.NaT
+    cdr["AnswerDt"] = pd.NaT
+    curva = curva_concorrencia(montar_eventos_concorrencia(cdr))
+    assert curva.empty
+    assert ocupacao_por_hora(curva).empty
@@ -0,0 +1,117 @@
+import importlib
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from BIGQUERY_FALSO import ClienteBigQueryFalso
+
+# ==============================
+# TESTES DA IMPORTAÇÃO CONCORRENTE (IMPORTADOR_BQ + BIGQUERY_FALSO)
+# ==============================
+# Rodam o pipeline inteiro contra o client falso, num CSV pequeno com chunks
+# pequenos: totais de linhas e log de jobs com falhas injetadas, e o limite de
+# chunks em memória ao mesmo tempo.
+
+LINHAS_CSV = 2_600
+CHUNK_TESTE = 200
+
+@pytest.fixture
+def importador(tmp_path, monkeypatch):
+    """IMPORTADOR_BQ apontado para uma pasta temporária com um base_tratada.csv sintético"""
+    monkeypatch.setenv("CDR_BASE_DIR", str(tmp_path))
+    imp = importlib.import_module("IMPORTADOR_BQ")
+    
+    base_tratada = tmp_path / "BASE_TRATADA"
+    base_tratada.mkdir()
+    rng = np.random.default_rng(7)
+    pd.DataFrame({
+        "Call Id": np.arange(LINHAS_CSV),
+        "Grupo": rng.choice(["Cobrança", "Retenção", "Caixa Postal"], LINHAS_CSV),
+        "Duração": rng.uniform(0, 600, LINHAS_CSV).round(2),
+        "Data Hora": pd.date_range("2025-01-01", periods=LINHAS_CSV, freq="min").strftime("%Y-%m-%d %H:%M:%S"),
+    }).to_csv(base_tratada / "base_tratada.csv", index=False, encoding="utf-8")
+    
+    monkeypatch.setattr(imp, "BASE_TRATADA_DIR", base_tratada)
+    monkeypatch.setattr(imp, "CSV_PATH", base_tratada / "base_tratada.csv")
+    monkeypatch.setattr(imp, "PARQUET_TRATADO_DIR", base_tratada / "base_tratada_parquet")
+    monkeypatch.setattr(imp, "CACHE_DIR", tmp_path / "cache_chunks")
+    monkeypatch.setattr(imp, "ARQUIVO_LOG_IMPORTACAO", base_tratada / "log_importacao.json")
+    monkeypatch.setattr(imp, "ARQUIVO_LOG_IMPORTACAO_ETAPAS", base_tratada / "log_importacao_etapas.csv")
+    monkeypatch.setattr(imp, "ARQUIVO_LOG_IMPORTACAO_JOBS", base_tratada / "log_importacao_jobs.csv")
+    monkeypatch.setattr(imp, "CHUNK_SIZE", CHUNK_TESTE)
+    monkeypatch.setattr(imp, "WORKERS_PROCESSAMENTO", 2)
+    monkeypatch.setattr(imp, "MAX_CHUNKS_EM_MEMORIA", 4)
+    monkeypatch.setattr(imp, "MAX_JOBS_SIMULTANEOS", 3)
+    return imp
+
+def linhas_importadas(cliente):
+    return sum(tabela.num_rows for tabela in cliente.tabelas.values())
+
+# ==============================
+# FALHAS INJETADAS
+# ==============================
+
+@pytest.mark.parametrize("carga_parquet", [False, True], ids=["dataframe", "parquet"])
+def test_importacao_concorrente_com_falhas(importador, monkeypatch, carga_parquet):
+    # carga direta em parquet só acima de LIMITE_LINHAS_CACHE
+    monkeypatch.setattr(importador, "LIMITE_LINHAS_CACHE", LINHAS_CSV - 1 if carga_parquet else LINHAS_CSV)
+    monkeypatch.setattr(importador, "CARGA_PARQUET_DIRETA", True)
+    # job 0 é o chunk 0; os jobs 3 e 7 caem em chunks enviados com outros jobs em andamento
+    cliente = ClienteBigQueryFalso(latencia_job_s=0.02, falhar_jobs=[3, 7])
+    
+    assert importador.importar_csv_para_bigquery(cliente=cliente, notificar=False) is True
+    assert linhas_importadas(cliente) == LINHAS_CSV
+    
+    log = pd.read_csv(importador.ARQUIVO_LOG_IMPORTACAO_JOBS, encoding="utf-8-sig")
+    num_chunks = -(-LINHAS_CSV // CHUNK_TESTE)
+    assert sorted(log["chunk"]) == list(range(1, num_chunks + 1))
+    assert log["linhas"].sum() == LINHAS_CSV
+    
+    fallback = log[log["metodo"] == "fallback csv"]
+    assert len(fallback) == 2
+    assert fallback["erro"].str.contains("falha simulada").all()
+    normais = log[log["metodo"] != "fallback csv"]
+    assert set(normais["metodo"]) == {"parquet" if carga_parquet else "dataframe"}
+    assert normais["erro"].isna().all()
+    assert not list(importador.CACHE_DIR.glob("*.parquet"))
+
+# ==============================
+# LIMITE DE CHUNKS EM MEMÓRIA
+# ==============================
+
+@pytest.mark.parametrize("max_jobs", [2, 6], ids=["jobs<memoria", "jobs>memoria"])
+def test_pipeline_respeita_max_chunks_em_memoria(importador, monkeypatch, max_jobs):
+    # um chunk entra na memória quando o worker começa a ler e sai quando a barra
+    # avança (load job concluído ou chunk vazio)
+    monkeypatch.setattr(importador, "MAX_JOBS_SIMULTANEOS", max_jobs)
+    contagem = {"vivos": 0, "max": 0}
+    trava = threading.Lock()
+    ler_original = importador.ler_chunk_csv
+    
+    def ler_chunk_contando(*args, **kwargs):
+        with trava:
+            contagem["vivos"] += 1
+            contagem["max"] = max(contagem["max"], contagem["vivos"])
+        return ler_original(*args, **kwargs)
+    
+    class BarraContando(importador.tqdm):
+        def update(self, n=1):
+            with trava:
+                contagem["vivos"] -= n
+            return super().update(n)
+    
+    monkeypatch.setattr(importador, "ler_chunk_csv", ler_chunk_contando)
+    monkeypatch.setattr(importador, "tqdm", BarraContando)
+    # jobs lentos: o upload é o gargalo e a janela enche
+    cliente = ClienteBigQueryFalso(latencia_job_s=0.05)
+    
+    assert importador.importar_csv_para_bigquery(cliente=cliente, notificar=False) is True
+    assert linhas_importadas(cliente) == LINHAS_CSV
+    assert contagem["vivos"] == 0
+    assert 2 <= contagem["max"] <= importador.MAX_CHUNKS_EM_MEMORIA
@@ -0,0 +1,95 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+RAIZ = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(RAIZ))
+
+from CHAVE_CDR import empacotar_chave
+from GERADOR_CDR import gerar_bases_raw
+from TENTATIVAS_CDR import NS_POR_SEGUNDO, montar_segmentos, novas_cadeias, somar_cadeias, gravar_cadeias
+
+# ==============================
+# TESTES DAS CADEIAS DE TENTATIVAS (memória × streaming)
+# ==============================
+
+JANELAS = {"callid": 6 * 3600, "numero": 24 * 3600}
+
+def cdr_sintetico(n, semente):
+    """Tentativas espalhadas por 4 dias, com CallIds e números que voltam depois da janela
+    (o SeqNum cresce com o CallStartDt dentro do CallId, como no discador)"""
+    rng = np.random.default_rng(semente)
+    inicio = pd.Timestamp("2025-07-20") + pd.to_timedelta(np.sort(rng.integers(0, 4 * 86_400_000, n)), unit="ms")
+    callid = pd.Series(rng.integers(1, n // 4, n))
+    return pd.DataFrame({
+        "CallStartDt": inicio,
+        "chave_unica": empacotar_chave(callid, callid.groupby(callid).cumcount() + 1),
+        "atendida": (rng.random(n) < 0.3).astype("int8"),
+        "DialedNum": pd.Series(rng.integers(0, n // 5, n)).map(lambda x: f"0{x:08d}").where(rng.random(n) > 0.05),
+    })
+
+def cadeias_ordenadas(caminho, coluna):
+    return pd.read_parquet(caminho).sort_values([coluna, "primeira_tentativa"]).reset_index(drop=True)
+
+def test_streaming_igual_a_memoria_e_estado_limitado(tmp_path):
+    cdr = cdr_sintetico(6000, semente=3)
+    memoria = {**novas_cadeias(), **montar_segmentos(cdr, JANELAS)}
+
+    streaming = novas_cadeias()
+    for _, lote in cdr.groupby(cdr["CallStartDt"].dt.floor("h"), sort=True):
+        somar_cadeias(streaming, montar_segmentos(lote, JANELAS), JANELAS, tmp_path / "partes")
+        # abertas: só cadeias com tentativa a até uma janela da mais recente
+        for nivel, janela in JANELAS.items():
+            assert (streaming[nivel]["ultima"] >= streaming["mais_recente"] - janela * NS_POR_SEGUNDO).all()
+
+    for nivel, coluna in [("callid", "CallId"), ("numero", "DialedNum")]:
+        resumo_memoria = gravar_cadeias(memoria, nivel, tmp_path / f"memoria_{nivel}.parquet")
+        resumo_streaming = gravar_cadeias(streaming, nivel, tmp_path / f"streaming_{nivel}.parquet")
+        a = cadeias_ordenadas(tmp_path / f"memoria_{nivel}.parquet", coluna)
+        b = cadeias_ordenadas(tmp_path / f"streaming_{nivel}.parquet", coluna)
+        pd.testing.assert_frame_equal(a, b)
+        pd.testing.assert_frame_equal(resumo_memoria, resumo_streaming)
+        assert streaming["partes"][nivel]
+
+def test_cadeia_quebra_quando_intervalo_passa_da_janela():
+    cdr = cdr_sintetico(3000, semente=5)
+    cadeias = montar_segmentos(cdr, JANELAS)["numero"]
+
+    numeros = cdr[cdr["DialedNum"].notna()].sort_values(["DialedNum", "CallStartDt"])
+    intervalo = numeros.groupby("DialedNum")["CallStartDt"].diff()
+    esperado = numeros["DialedNum"].nunique() + int((intervalo > pd.Timedelta(seconds=JANELAS["numero"])).sum())
+    assert len(cadeias) == esperado
+    assert cadeias["tentativas"].sum() == len(numeros)
+
+# ==============================
+# TRATA_DADOS NOS DOIS MODOS
+# ==============================
+
+def rodar_trata(pasta: Path, streaming: bool):
+    ambiente = {**os.environ, "CDR_BASE_DIR": str(pasta), "CDR_MODO_STREAMING": "1" if streaming else "0"}
+    retorno = subprocess.run([sys.executable, str(RAIZ / "TRATA_DADOS.py")], cwd=RAIZ, env=ambiente,
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    assert retorno.returncode == 0, retorno.stdout[-3000:]
+    saida = pasta / "BASE_TRATADA"
+    return (
+        cadeias_ordenadas(saida / "cadeias_callid.parquet", "CallId"),
+        cadeias_ordenadas(saida / "cadeias_dialednum.parquet", "DialedNum"),
+        pd.read_excel(saida / "relatorio_completo.xlsx", sheet_name="Tentativas - Resumo"),
+    )
+
+@pytest.mark.parametrize("datas", [["2025-07-22", "2025-07-29"], ["2025-07-22", "2025-07-23"]])
+def test_trata_dados_memoria_e_streaming_dao_as_mesmas_cadeias(tmp_path, datas):
+    resultados = []
+    for modo, streaming in (("memoria", False), ("streaming", True)):
+        pasta = tmp_path / modo
+        for data in datas:
+            gerar_bases_raw(pasta / "BASES_RAW", linhas=3000, data=data, hora_inicial=8, hora_final=12)
+        resultados.append(rodar_trata(pasta, streaming))
+
+    for memoria, streaming in zip(*resultados):
+        pd.testing.assert_frame_equal(memoria, streaming)